@@ -1,76 +1,130 @@
-from sqlalchemy.orm import Session
-from model import Activity, ActivityPlan, ActivityInPlan
-from typing import List, Dict, Any
+from sqlalchemy import select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from model import ActivityPlan, ActivityInPlan
+from dashboard_service import bump_plan_version
+from catalog_cache import catalog_cache
+from fast_json import RowSerializer
+from pagination import keyset_slice
+from operator import attrgetter
+from typing import List, Dict, Any, Optional
+
+_UPSERT_INSERTS = {
+    "mysql": mysql.insert,
+    "mariadb": mysql.insert,
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert
+}
+
+# schemas.UserActivityOptionOut: ฟิลด์ของ ActivityRecord ตามด้วยสถานะใน plan ของ user
+user_activity_option_serializer = RowSerializer((
+    'activity_id', 'activity_name', 'base_time', 'base_xp', 'activity_type', 'description',
+    'is_chosen', 'in_plan_id'
+))
+
+def upsert_chosen_activities(dialect_name: str, plan_id: int, activity_ids: List[int]):
+    """
+    INSERT ... ON DUPLICATE KEY / ON CONFLICT statement that marks activities as chosen
+
+    Rows that do not exist yet are created with success_count 0; existing
+    rows (matched on the unique plan_id + activity_id constraint) only get
+    is_chose set, so their success_count is kept.
+
+    Args:
+        dialect_name: Name of the session's SQL dialect (db.get_bind().dialect.name)
+        plan_id: Activity plan ID
+        activity_ids: Activity IDs to mark as chosen, non-empty and without duplicates
+
+    Returns:
+        Executable insert statement
+    """
+    insert = _UPSERT_INSERTS.get(dialect_name)
+    if insert is None:
+        raise NotImplementedError(f"No upsert support for dialect {dialect_name!r}")
+
+    stmt = insert(ActivityInPlan).values([
+        {"plan_id": plan_id, "activity_id": activity_id, "is_chose": True, "success_count": 0}
+        for activity_id in activity_ids
+    ])
+    if dialect_name in ("mysql", "mariadb"):
+        return stmt.on_duplicate_key_update(is_chose=True)
+    return stmt.on_conflict_do_update(
+        index_elements=[ActivityInPlan.plan_id, ActivityInPlan.activity_id],
+        set_={"is_chose": True}
+    )
 
 class AllActivitiesService:
     """Service class for handling all activities business logic"""
     
     @staticmethod
-    def get_all_activities_for_user(user_id: int, db: Session) -> List[Dict[str, Any]]:
+    async def get_activity_option_rows(
+        user_id: int,
+        db: AsyncSession,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> List[tuple]:
         """
-        Get all activities with indication of which ones the user has selected
+        Catalog activities with the user's selection status, ordered by Activity.id
         
         Args:
             user_id: The ID of the user
-            db: Database session
+            db: Async database session
+            cursor: Only activities with an id greater than this (keyset pagination)
+            limit: Maximum number of activities (None = all)
             
         Returns:
-            List of activities with selection status
+            Row tuples in user_activity_option_serializer key order
         """
-        # Get user's activity plan
-        user_plan = db.query(ActivityPlan).filter(
-            ActivityPlan.user_id == user_id
-        ).first()
-        
-        # Get all activities
-        all_activities = db.query(Activity).all()
-        
-        # If user doesn't have a plan yet, return all activities as unselected
-        if not user_plan:
-            result = []
-            for activity in all_activities:
-                result.append({
-                    'activity_id': activity.id,
-                    'activity_name': activity.name,
-                    'base_time': activity.base_time,
-                    'base_xp': activity.base_xp,
-                    'activity_type': activity.activity_type.value if activity.activity_type else None,
-                    'description': activity.description,
-                    'is_chosen': False,
-                    'in_plan_id': None
-                })
-            return result
+        # Activity catalog comes from the process-local cache
+        catalog = await catalog_cache.aget(db)
+        activities = keyset_slice(catalog.activities, attrgetter('id'), cursor, limit)
+        if not activities:
+            return []
         
-        # Get activities in user's plan
-        activities_in_plan = db.query(ActivityInPlan).filter(
-            ActivityInPlan.plan_id == user_plan.id
-        ).all()
+        # Only the user's own Activity_in_plan rows are read from the database
+        user_plan_id = select(ActivityPlan.id).where(
+            ActivityPlan.user_id == user_id
+        ).limit(1).scalar_subquery()
+        query = select(
+            ActivityInPlan.id,
+            ActivityInPlan.activity_id,
+            ActivityInPlan.is_chose
+        ).where(
+            ActivityInPlan.plan_id == user_plan_id
+        )
+        if cursor is not None or limit is not None:
+            # A page only needs the plan rows within its id range
+            query = query.where(ActivityInPlan.activity_id.between(activities[0].id, activities[-1].id))
+        activities_in_plan = (await db.execute(query)).all()
         
         # Create a map of activity_id to ActivityInPlan for quick lookup
-        plan_map = {aip.activity_id: aip for aip in activities_in_plan}
+        # (empty if the user doesn't have a plan yet, so everything is unselected)
+        plan_map = {aip.activity_id: (aip.is_chose, aip.id) for aip in activities_in_plan}
         
-        # Build result with is_chosen flag
-        result = []
-        for activity in all_activities:
-            in_plan = plan_map.get(activity.id)
-            result.append({
-                'activity_id': activity.id,
-                'activity_name': activity.name,
-                'base_time': activity.base_time,
-                'base_xp': activity.base_xp,
-                'activity_type': activity.activity_type.value if activity.activity_type else None,
-                'description': activity.description,
-                'is_chosen': in_plan.is_chose if in_plan else False,
-                'in_plan_id': in_plan.id if in_plan else None
-            })
+        # Catalog record + (is_chosen, in_plan_id)
+        not_in_plan = (False, None)
+        return [activity + plan_map.get(activity.id, not_in_plan) for activity in activities]
+    
+    @staticmethod
+    async def get_all_activities_for_user(user_id: int, db: AsyncSession) -> List[Dict[str, Any]]:
+        """
+        Get all activities with indication of which ones the user has selected
         
-        return result
+        Args:
+            user_id: The ID of the user
+            db: Async database session
+            
+        Returns:
+            List of activities with selection status
+        """
+        rows = await AllActivitiesService.get_activity_option_rows(user_id, db)
+        return user_activity_option_serializer.dicts(rows)
     
     @staticmethod
-    def update_user_activity_selection(
+    async def update_user_activity_selection(
         user_id: int, 
         activity_ids: List[int], 
-        db: Session
+        db: AsyncSession
     ) -> Dict[str, Any]:
         """
         Update user's activity selection
@@ -78,52 +132,39 @@ class AllActivitiesService:
         Args:
             user_id: The ID of the user
             activity_ids: List of selected activity IDs
-            db: Database session
+            db: Async database session
             
         Returns:
             Dictionary with success message and count
         """
         # Get or create user's activity plan
-        user_plan = db.query(ActivityPlan).filter(
+        user_plan = (await db.execute(select(ActivityPlan).where(
             ActivityPlan.user_id == user_id
-        ).first()
+        ))).scalars().first()
         
         if not user_plan:
             # Create new plan for user
             user_plan = ActivityPlan(user_id=user_id)
             db.add(user_plan)
-            db.commit()
-            db.refresh(user_plan)
-        
-        # Get all activities in plan
-        existing_activities = db.query(ActivityInPlan).filter(
-            ActivityInPlan.plan_id == user_plan.id
-        ).all()
-        
-        # Create a map of existing activities
-        existing_map = {aip.activity_id: aip for aip in existing_activities}
+            await db.commit()
+            await db.refresh(user_plan)
         
-        # Update or create activities
-        for activity_id in activity_ids:
-            if activity_id in existing_map:
-                # Update existing entry
-                existing_map[activity_id].is_chose = True
-            else:
-                # Create new entry
-                new_activity = ActivityInPlan(
-                    plan_id=user_plan.id,
-                    activity_id=activity_id,
-                    is_chose=True,
-                    success_count=0
-                )
-                db.add(new_activity)
+        # ใช้ statement จำนวนคงที่ไม่ว่า catalog จะใหญ่แค่ไหน: upsert ที่เลือก + UPDATE ที่เหลือ
+        selected_ids = sorted(set(activity_ids))
+        if selected_ids:
+            await db.execute(upsert_chosen_activities(db.get_bind().dialect.name, user_plan.id, selected_ids))
         
         # Set is_chose to False for activities not in selection
-        for activity_id, aip in existing_map.items():
-            if activity_id not in activity_ids:
-                aip.is_chose = False
+        deselect = update(ActivityInPlan).where(
+            ActivityInPlan.plan_id == user_plan.id,
+            ActivityInPlan.is_chose == True
+        )
+        if selected_ids:
+            deselect = deselect.where(ActivityInPlan.activity_id.not_in(selected_ids))
+        await db.execute(deselect.values(is_chose=False).execution_options(synchronize_session=False))
         
-        db.commit()
+        await db.execute(bump_plan_version(user_plan.id))
+        await db.commit()
         
         return {
             "message": "Activity selection updated successfully",
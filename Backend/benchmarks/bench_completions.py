@@ -0,0 +1,209 @@
+"""
+Completion throughput: the original two-transaction flow vs CompletionService
+
+Both modes complete activities for the same few users from several
+threads at once, then report completions/s and how many success counts
+were lost:
+  legacy   what POST /dashboard/{user_id}/activity/{activity_id}/complete
+           did before CompletionService: an ORM read-modify-write of
+           Activity_in_plan.success_count, then of User.xp / level, each in
+           its own transaction
+  engine   CompletionService.complete_activity (one guarded User UPDATE per
+           completion; success counts go through the completion ledger,
+           whose final flush is included in the time)
+
+By default a fresh SQLite file is created in the temp folder; SQLite
+ignores SELECT ... FOR UPDATE, so the engine serializes through its
+guarded UPDATE + retry there. Pass --database-url with a scratch MySQL
+database to measure the row-lock path. Tables are created if missing,
+every run seeds its own users and activities, and nothing is dropped.
+
+Run from the Backend folder:
+    python benchmarks/bench_completions.py [--threads 8] [--per-thread 50] [--users 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def configure_environment(args) -> str:
+    """Point database.py at the bench database; must run before the app is imported"""
+    if args.database_url:
+        url = args.database_url
+    else:
+        path = os.path.join(tempfile.gettempdir(), "realworld_xp_bench_completions.db")
+        if os.path.exists(path):
+            os.remove(path)
+        url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = url
+    # ไม่ได้ใช้ async engine แต่ database.py สร้างไว้ตอน import: ชี้ไปที่ SQLite ในหน่วยความจำ
+    os.environ["ASYNC_DATABASE_URL"] = "sqlite+aiosqlite://"
+    return url
+
+
+def seed(users: int, activities: int):
+    """Fresh users, each with a plan holding the same fresh activities"""
+    from sqlalchemy import insert, select
+
+    import model
+    from database import SessionLocal
+
+    tag = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    try:
+        db.execute(insert(model.Activity), [
+            {"name": f"Bench completion {tag} {i}", "base_xp": 10 + 7 * i} for i in range(activities)
+        ])
+        activity_ids = db.execute(
+            select(model.Activity.id).where(model.Activity.name.like(f"Bench completion {tag} %"))
+        ).scalars().all()
+        db.execute(insert(model.User), [
+            {"username": f"bench_completion_{tag}_{i}", "password": "x", "xp": 0, "level": 1,
+             "day_streak": 0, "is_success": False, "stress_level": 5}
+            for i in range(users)
+        ])
+        user_ids = db.execute(
+            select(model.User.id).where(model.User.username.like(f"bench_completion_{tag}_%"))
+        ).scalars().all()
+        db.execute(insert(model.ActivityPlan), [{"user_id": user_id} for user_id in user_ids])
+        plan_ids = db.execute(select(model.ActivityPlan.id).where(model.ActivityPlan.user_id.in_(user_ids))).scalars().all()
+        db.execute(insert(model.ActivityInPlan), [
+            {"plan_id": plan_id, "activity_id": activity_id, "success_count": 0, "is_chose": True}
+            for plan_id in plan_ids
+            for activity_id in activity_ids
+        ])
+        db.commit()
+        return user_ids, activity_ids
+    finally:
+        db.close()
+
+
+def legacy_complete(db, user_id: int, activity_id: int) -> None:
+    # ขั้นตอนเดิมของ route ก่อนมี CompletionService (สองครั้ง commit, อ่าน-แก้-เขียนผ่าน ORM)
+    from model import Activity, ActivityInPlan, ActivityPlan, User
+
+    plan = db.query(ActivityPlan).filter(ActivityPlan.user_id == user_id).first()
+    activity = db.query(Activity).filter(Activity.id == activity_id).first()
+    activity_in_plan = db.query(ActivityInPlan).filter(
+        ActivityInPlan.plan_id == plan.id, ActivityInPlan.activity_id == activity_id
+    ).first()
+    activity_in_plan.success_count += 1
+    db.commit()
+
+    user = db.query(User).filter(User.id == user_id).first()
+    new_xp = user.xp + activity.base_xp
+    new_level = user.level
+    if new_xp >= 100:
+        new_level = new_xp // 100
+        new_xp = new_xp % 100
+    user.xp = new_xp
+    user.level = new_level
+    db.commit()
+
+
+def engine_complete(db, user_id: int, activity_id: int) -> None:
+    from completion_service import CompletionService
+
+    CompletionService.complete_activity(db, user_id, activity_id, require_plan=True)
+
+
+def run_mode(name: str, complete, args) -> dict:
+    from sqlalchemy import func, select
+
+    import model
+    from database import SessionLocal
+    from write_behind import completion_ledger
+
+    user_ids, activity_ids = seed(args.users, args.activities)
+    errors = []
+
+    def work(thread_index: int) -> None:
+        db = SessionLocal()
+        try:
+            for i in range(args.per_thread):
+                k = thread_index * args.per_thread + i
+                try:
+                    complete(db, user_ids[k % len(user_ids)], activity_ids[k % len(activity_ids)])
+                except Exception as e:
+                    db.rollback()
+                    errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=work, args=(t,)) for t in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    completion_ledger.flush()
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        counted = db.execute(
+            select(func.coalesce(func.sum(model.ActivityInPlan.success_count), 0))
+            .join(model.ActivityPlan, model.ActivityPlan.id == model.ActivityInPlan.plan_id)
+            .where(model.ActivityPlan.user_id.in_(user_ids))
+        ).scalar()
+    finally:
+        db.close()
+
+    attempted = args.threads * args.per_thread
+    completed = attempted - len(errors)
+    return {
+        "mode": name,
+        "completed": completed,
+        "errors": len(errors),
+        "per_second": completed / elapsed,
+        "lost_success_counts": completed - counted,
+    }
+
+
+MODES = {"legacy": legacy_complete, "engine": engine_complete}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="Sync SQLAlchemy URL of a scratch database (default: fresh SQLite file)")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--per-thread", type=int, default=50, help="Completions per thread")
+    parser.add_argument("--users", type=int, default=2, help="Users sharing the completions (fewer = more contention)")
+    parser.add_argument("--activities", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    args = parser.parse_args(argv)
+
+    url = configure_environment(args)
+
+    from sqlalchemy import event
+
+    # import Base ผ่าน model เพื่อให้ table ทั้งหมดถูกลงทะเบียนกับ Base.metadata แล้ว
+    from database import engine
+    from model import Base
+
+    if url.startswith("sqlite"):
+        @event.listens_for(engine, "connect")
+        def _busy_timeout(dbapi_connection, connection_record):
+            # ให้ thread ที่ชน lock ของ SQLite รอแทนที่จะ error ทันที
+            dbapi_connection.execute("PRAGMA busy_timeout=30000")
+
+    Base.metadata.create_all(engine)
+    print(f"database: {engine.dialect.name}, {args.threads} threads x {args.per_thread} completions, {args.users} users")
+    print(f"{'mode':>8} {'done':>6} {'errors':>7} {'per s':>9} {'lost counts':>12}")
+    for name in args.modes:
+        result = run_mode(name, MODES[name], args)
+        print(
+            f"{result['mode']:>8} {result['completed']:>6} {result['errors']:>7} "
+            f"{result['per_second']:>9.1f} {result['lost_success_counts']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Micro-benchmark: activity list rows -> JSON bytes
+
+Compares, for 100 / 1k / 10k activities:
+  legacy   dict literal per row, then jsonable_encoder + json.dumps
+           (what a route with response_model=List[Dict] did)
+  typed    dict per row validated and dumped through the pydantic schema
+           (the FAST_JSON=0 path with response_model=List[DashboardActivityOut])
+  fast     RowSerializer.dicts + fast_json.dumps (orjson), the default path
+
+Run from the Backend folder:
+    python benchmarks/bench_serialization.py [--sizes 100 1000 10000] [--repeat 7]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from typing import List, NamedTuple, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# database.py สร้าง engine ตอน import: ใช้ sqlite ในหน่วยความจำ ไม่ต้องมี MySQL
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("ASYNC_DATABASE_URL", "sqlite+aiosqlite://")
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import fast_json
+from dashboard_service import user_activity_serializer
+from model import ActivityType
+from schemas import DashboardActivityOut
+
+
+class ActivityRow(NamedTuple):
+    """Same columns, order and attribute access as the SQLAlchemy Row of get_user_activities"""
+    activity_id: int
+    activity_name: str
+    base_time: Optional[int]
+    base_xp: Optional[int]
+    activity_type: Optional[ActivityType]
+    description: Optional[str]
+    success_count: int
+    is_chose: bool
+    plan_id: int
+    user_id: int
+
+
+def make_rows(count: int) -> List[ActivityRow]:
+    return [
+        ActivityRow(
+            activity_id=i,
+            activity_name=f"กิจกรรม {i}",
+            base_time=10 + i % 50,
+            base_xp=20 + i % 30,
+            activity_type=ActivityType.INDOOR if i % 2 else ActivityType.OUTDOOR,
+            description=None if i % 7 == 0 else f"Activity {i} description, breathe and stretch",
+            success_count=i % 13,
+            is_chose=True,
+            plan_id=1,
+            user_id=1
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def _starlette_render(content) -> bytes:
+    # เหมือน JSONResponse.render ของ Starlette
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def legacy(rows) -> bytes:
+    activities = []
+    for row in rows:
+        activities.append({
+            'activity_id': row.activity_id,
+            'activity_name': row.activity_name,
+            'base_time': row.base_time,
+            'base_xp': row.base_xp,
+            'activity_type': row.activity_type.value if row.activity_type else None,
+            'description': row.description,
+            'success_count': row.success_count,
+            'is_chose': row.is_chose,
+            'plan_id': row.plan_id,
+            'user_id': row.user_id
+        })
+    return _starlette_render(jsonable_encoder(activities))
+
+
+_typed_adapter = TypeAdapter(List[DashboardActivityOut])
+
+
+def typed(rows) -> bytes:
+    validated = _typed_adapter.validate_python(user_activity_serializer.dicts(rows))
+    return _starlette_render(_typed_adapter.dump_python(validated, mode="json"))
+
+
+def fast(rows) -> bytes:
+    return fast_json.dumps(user_activity_serializer.dicts(rows))
+
+
+CANDIDATES = (("legacy", legacy), ("typed", typed), ("fast", fast))
+
+
+def best_ms(fn, rows, repeat: int) -> float:
+    timer = timeit.Timer(lambda: fn(rows))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1000
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    print(f"orjson: {'yes' if fast_json.orjson is not None else 'no (stdlib json fallback)'}")
+    print(f"{'rows':>7} " + " ".join(f"{name + ' ms':>11}" for name, _ in CANDIDATES) + f" {'speedup':>8}")
+    for size in args.sizes:
+        rows = make_rows(size)
+        expected = json.loads(legacy(rows))
+        for name, fn in CANDIDATES:
+            if json.loads(fn(rows)) != expected:
+                raise SystemExit(f"{name} output differs from legacy at {size} rows")
+        timings = {name: best_ms(fn, rows, args.repeat) for name, fn in CANDIDATES}
+        print(
+            f"{size:>7} " + " ".join(f"{timings[name]:>11.3f}" for name, _ in CANDIDATES)
+            + f" {timings['legacy'] / timings['fast']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
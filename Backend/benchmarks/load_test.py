@@ -0,0 +1,527 @@
+"""
+HTTP load test: boots main.app on a seeded stand-in database and drives a weighted route mix
+
+By default a fresh SQLite file is created in the temp folder and seeded
+with --users / --activities / --lifestyles; every bench user gets an
+activity plan with --chosen activities. Pass --database-url to use a local
+MySQL (or an existing SQLite file) instead: missing tables are created,
+bench users are seeded only if none exist, and nothing is dropped.
+
+Requests go through httpx's ASGITransport into the app in this process
+(lifespan included), or to a running server with --url. Client and app
+share one process and CPU, so compare runs with each other rather than
+reading the numbers as production capacity.
+
+Run from the Backend folder:
+    python benchmarks/load_test.py --duration 30 --concurrency 32
+    python benchmarks/load_test.py --save baseline.json
+    python benchmarks/load_test.py --compare baseline.json   # exit 1 on regression
+    python benchmarks/load_test.py --mix dashboard=1,complete=1,login=0
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BENCH_USER_PREFIX = "bench_user_"
+BENCH_PASSWORD = "bench-password"
+
+# น้ำหนักของแต่ละ scenario: dashboard polling เป็น traffic หลัก รองลงมาคือ complete activity
+DEFAULT_MIX = {
+    "dashboard": 40,
+    "complete": 15,
+    "leaderboard": 8,
+    "all_activities": 8,
+    "catalog": 6,
+    "selection": 5,
+    "login": 5,
+    "predict_rf": 7,
+    "predict_mlp": 6,
+}
+
+
+class Sample(NamedTuple):
+    route: str
+    seconds: float
+    status: int
+
+
+class BenchState:
+    """What the scenarios need to know about the seeded data"""
+
+    def __init__(self, users: List[Tuple[int, str]], activity_ids: List[int], lifestyle_ids: List[int],
+                 chosen: Dict[int, List[int]], chosen_count: int):
+        self.users = users
+        self.activity_ids = activity_ids
+        self.lifestyle_ids = lifestyle_ids
+        self.chosen = chosen
+        self.chosen_count = chosen_count
+        self.etags: Dict[int, str] = {}
+
+
+def _async_url(url: str) -> str:
+    # URL ของ engine แบบ async ที่คู่กับ URL แบบ sync
+    if url.startswith("sqlite"):
+        return "sqlite+aiosqlite" + url[url.index(":"):]
+    if url.startswith("mysql"):
+        return "mysql+aiomysql" + url[url.index(":"):]
+    raise SystemExit(f"Unsupported database URL: {url}")
+
+
+def configure_environment(args) -> str:
+    """Point database.py at the stand-in database; must run before the app is imported"""
+    if args.database_url:
+        url = args.database_url
+    else:
+        path = os.path.join(tempfile.gettempdir(), "realworld_xp_bench.db")
+        if os.path.exists(path):
+            os.remove(path)
+        url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = url
+    os.environ["ASYNC_DATABASE_URL"] = _async_url(url)
+    os.environ.setdefault("MODEL_WARMUP", args.model_warmup)
+    return url
+
+
+def seed(args) -> None:
+    """Create the schema and insert bench data unless bench users already exist"""
+    from sqlalchemy import func, insert, select
+
+    import model
+    from database import Base, SessionLocal, engine
+    from security import pwd_context
+
+    Base.metadata.create_all(engine)
+    rng = random.Random(args.seed)
+    db = SessionLocal()
+    try:
+        existing = db.execute(
+            select(func.count(model.User.id)).where(model.User.username.like(f"{BENCH_USER_PREFIX}%"))
+        ).scalar()
+        if existing:
+            print(f"Reusing {existing} existing bench users")
+            return
+
+        started = time.perf_counter()
+        lifestyle_base = (db.execute(select(func.max(model.LifestyleCate.id))).scalar() or 0) + 1
+        activity_base = (db.execute(select(func.max(model.Activity.id))).scalar() or 0) + 1
+        lifestyle_ids = list(range(lifestyle_base, lifestyle_base + args.lifestyles))
+        activity_ids = list(range(activity_base, activity_base + args.activities))
+
+        db.execute(insert(model.LifestyleCate), [{"id": i, "name": f"Bench lifestyle {i}"} for i in lifestyle_ids])
+        db.execute(insert(model.Activity), [
+            {
+                "id": i,
+                "name": f"Bench activity {i}",
+                "base_time": rng.choice((5, 10, 15, 30)),
+                "base_xp": rng.choice((10, 20, 30, 50)),
+                "activity_type": rng.choice(list(model.ActivityType)),
+                "description": f"Seeded activity {i}",
+            }
+            for i in activity_ids
+        ])
+        db.execute(insert(model.ActivityStyle), [
+            {"activity_id": activity_id, "lifestyle_id": lifestyle_id}
+            for activity_id in activity_ids
+            for lifestyle_id in rng.sample(lifestyle_ids, min(len(lifestyle_ids), rng.randint(1, 3)))
+        ])
+
+        # hash เดียวใช้กับทุก user: bcrypt ต่อ user จะทำให้ seed ช้าเป็นนาที
+        password_hash = pwd_context.hash(BENCH_PASSWORD)
+        db.execute(insert(model.User), [
+            {
+                "username": f"{BENCH_USER_PREFIX}{i}",
+                "password": password_hash,
+                "stress_level": rng.randint(0, 2),
+                "xp": rng.randint(0, 99),
+                "level": rng.randint(1, 20),
+                "day_streak": rng.randint(0, 30),
+                "is_success": False,
+            }
+            for i in range(args.users)
+        ])
+        user_ids = db.execute(
+            select(model.User.id).where(model.User.username.like(f"{BENCH_USER_PREFIX}%")).order_by(model.User.id)
+        ).scalars().all()
+        db.execute(insert(model.UserLifestyle), [
+            {"user_id": user_id, "lifestyle_id": lifestyle_id}
+            for user_id in user_ids
+            for lifestyle_id in rng.sample(lifestyle_ids, min(len(lifestyle_ids), rng.randint(1, 2)))
+        ])
+        db.execute(insert(model.ActivityPlan), [{"user_id": user_id} for user_id in user_ids])
+        plan_ids = dict(db.execute(
+            select(model.ActivityPlan.user_id, model.ActivityPlan.id).where(model.ActivityPlan.user_id.in_(user_ids))
+        ).all())
+        db.execute(insert(model.ActivityInPlan), [
+            {"plan_id": plan_ids[user_id], "activity_id": activity_id, "success_count": 0, "is_chose": True}
+            for user_id in user_ids
+            for activity_id in rng.sample(activity_ids, min(len(activity_ids), args.chosen))
+        ])
+        db.commit()
+        print(
+            f"Seeded {len(user_ids)} users, {len(activity_ids)} activities, {len(lifestyle_ids)} lifestyles "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+    finally:
+        db.close()
+
+
+def load_state(chosen_count: int) -> BenchState:
+    from sqlalchemy import select
+
+    import model
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        users = db.execute(
+            select(model.User.id, model.User.username)
+            .where(model.User.username.like(f"{BENCH_USER_PREFIX}%"))
+            .order_by(model.User.id)
+        ).all()
+        chosen: Dict[int, List[int]] = defaultdict(list)
+        for user_id, activity_id in db.execute(
+            select(model.ActivityPlan.user_id, model.ActivityInPlan.activity_id)
+            .join(model.ActivityInPlan, model.ActivityInPlan.plan_id == model.ActivityPlan.id)
+            .where(model.ActivityInPlan.is_chose == True)
+        ):
+            chosen[user_id].append(activity_id)
+        return BenchState(
+            users=[tuple(user) for user in users],
+            activity_ids=db.execute(select(model.Activity.id)).scalars().all(),
+            lifestyle_ids=db.execute(select(model.LifestyleCate.id)).scalars().all(),
+            chosen=chosen,
+            chosen_count=chosen_count,
+        )
+    finally:
+        db.close()
+
+
+# --- scenarios: each sends one request and returns the response ---
+
+async def login(client, state: BenchState, rng: random.Random):
+    _, username = rng.choice(state.users)
+    return await client.post("/api/auth/token", data={"username": username, "password": BENCH_PASSWORD})
+
+
+async def dashboard(client, state: BenchState, rng: random.Random):
+    # polling แบบ client จริง: ส่ง ETag ที่ได้ครั้งก่อน ถ้าไม่มีอะไรเปลี่ยนจะได้ 304
+    user_id, _ = rng.choice(state.users)
+    etag = state.etags.get(user_id)
+    response = await client.get(f"/api/dashboard/{user_id}", headers={"If-None-Match": etag} if etag else None)
+    if response.headers.get("etag"):
+        state.etags[user_id] = response.headers["etag"]
+    return response
+
+
+async def complete(client, state: BenchState, rng: random.Random):
+    user_id, _ = rng.choice(state.users)
+    activity_ids = state.chosen.get(user_id) or state.activity_ids
+    return await client.post(f"/api/dashboard/{user_id}/activity/{rng.choice(activity_ids)}/complete")
+
+
+async def selection(client, state: BenchState, rng: random.Random):
+    user_id, _ = rng.choice(state.users)
+    activity_ids = rng.sample(state.activity_ids, min(len(state.activity_ids), state.chosen_count))
+    response = await client.put(f"/api/activities/user/{user_id}/selection", json={"activity_ids": activity_ids})
+    if response.status_code == 200:
+        state.chosen[user_id] = activity_ids
+    return response
+
+
+async def all_activities(client, state: BenchState, rng: random.Random):
+    user_id, _ = rng.choice(state.users)
+    return await client.get(f"/api/activities/user/{user_id}/all")
+
+
+async def catalog(client, state: BenchState, rng: random.Random):
+    lifestyle_ids = rng.sample(state.lifestyle_ids, min(len(state.lifestyle_ids), 2))
+    return await client.get("/api/activityByLifestyleId", params={"lifestyleId": lifestyle_ids})
+
+
+async def leaderboard(client, state: BenchState, rng: random.Random):
+    return await client.get("/api/leaderboard", params={"limit": 20})
+
+
+async def predict_rf(client, state: BenchState, rng: random.Random):
+    return await client.post("/api/predict_rf", json={
+        "screen_time_hours": round(rng.uniform(0, 12), 1),
+        "social_media_platforms_used": rng.randint(0, 8),
+        "hours_on_TikTok": round(rng.uniform(0, 6), 1),
+        "sleep_hours": round(rng.uniform(3, 10), 1),
+        "mood_score": rng.randint(1, 10),
+    })
+
+
+async def predict_mlp(client, state: BenchState, rng: random.Random):
+    from model_manager import LIFESTYLE_CAT_DIMS, LIFESTYLE_NUM_NUMERIC
+
+    return await client.post("/api/predictLifeStyle", json={
+        "numeric": [round(rng.gauss(0, 1), 3) for _ in range(LIFESTYLE_NUM_NUMERIC)],
+        "categorical": [rng.randrange(dim) for dim in LIFESTYLE_CAT_DIMS],
+    })
+
+
+# ชื่อ scenario -> (route template ที่ใช้รายงานผล, ฟังก์ชันที่ส่ง request)
+SCENARIOS = {
+    "login": ("POST /api/auth/token", login),
+    "dashboard": ("GET /api/dashboard/{user_id}", dashboard),
+    "complete": ("POST /api/dashboard/{user_id}/activity/{activity_id}/complete", complete),
+    "selection": ("PUT /api/activities/user/{user_id}/selection", selection),
+    "all_activities": ("GET /api/activities/user/{user_id}/all", all_activities),
+    "catalog": ("GET /api/activityByLifestyleId", catalog),
+    "leaderboard": ("GET /api/leaderboard", leaderboard),
+    "predict_rf": ("POST /api/predict_rf", predict_rf),
+    "predict_mlp": ("POST /api/predictLifeStyle", predict_mlp),
+}
+
+
+def parse_mix(spec: Optional[str]) -> Dict[str, float]:
+    mix = dict(DEFAULT_MIX)
+    if spec:
+        for part in spec.split(","):
+            name, _, weight = part.partition("=")
+            name = name.strip()
+            if name not in SCENARIOS:
+                raise SystemExit(f"Unknown scenario '{name}', choose from: {', '.join(SCENARIOS)}")
+            mix[name] = float(weight)
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+    if not mix:
+        raise SystemExit("The mix has no scenario with a positive weight")
+    return mix
+
+
+async def worker(client, state: BenchState, mix: Dict[str, float], seed: int,
+                 deadline: float, samples: Optional[List[Sample]]) -> None:
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        route, scenario = SCENARIOS[rng.choices(names, weights)[0]]
+        started = time.perf_counter()
+        try:
+            status = (await scenario(client, state, rng)).status_code
+        except Exception:
+            # timeout / connection error ฝั่ง client
+            status = 599
+        if samples is not None:
+            samples.append(Sample(route, time.perf_counter() - started, status))
+
+
+async def run_phase(client, state, mix, args, seconds: float, seed: int, record: bool) -> Tuple[List[Sample], float]:
+    samples: Optional[List[Sample]] = [] if record else None
+    started = time.perf_counter()
+    deadline = started + seconds
+    await asyncio.gather(*(
+        worker(client, state, mix, seed * 1000 + i, deadline, samples) for i in range(args.concurrency)
+    ))
+    return samples or [], time.perf_counter() - started
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # nearest-rank
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict:
+    def stats(group: List[Sample]) -> Dict:
+        latencies = sorted(sample.seconds * 1000 for sample in group)
+        statuses = defaultdict(int)
+        for sample in group:
+            statuses[str(sample.status)] += 1
+        return {
+            "requests": len(group),
+            "errors": sum(1 for sample in group if sample.status >= 400),
+            "rps": round(len(group) / elapsed, 2) if elapsed > 0 else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+            "status": dict(sorted(statuses.items())),
+        }
+
+    by_route: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_route[sample.route].append(sample)
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "total": stats(samples),
+        "routes": {route: stats(group) for route, group in sorted(by_route.items())},
+    }
+
+
+def print_report(results: Dict) -> None:
+    header = f"{'route':<62} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    print(header)
+    print("-" * len(header))
+    rows = list(results["routes"].items()) + [("TOTAL", results["total"])]
+    for route, stats in rows:
+        print(
+            f"{route:<62} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8.1f} "
+            f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}"
+        )
+    print("(latencies in ms)")
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float, min_samples: int) -> List[str]:
+    """
+    Regressions of results against a saved baseline
+
+    A route regresses when its p95 or p99 grows, or its throughput drops,
+    by more than `tolerance` (a fraction), or when its error rate rises.
+    Routes with fewer than `min_samples` requests in either run are shown
+    but not judged: their tail percentiles are mostly noise.
+
+    Returns:
+        Human-readable regression messages (empty = no regression)
+    """
+    regressions = []
+    if baseline.get("config", {}).get("workload") != results["config"]["workload"]:
+        print("warning: baseline was recorded with a different workload, numbers are not comparable")
+    current_routes = dict(results["routes"], TOTAL=results["total"])
+    baseline_routes = dict(baseline["routes"], TOTAL=baseline["total"])
+    print(f"\n{'route':<62} {'p95 base':>9} {'p95 now':>9} {'rps base':>9} {'rps now':>9}")
+    for route, base in baseline_routes.items():
+        now = current_routes.get(route)
+        if now is None:
+            regressions.append(f"{route}: missing from this run")
+            continue
+        few = min(base["requests"], now["requests"]) < min_samples
+        print(
+            f"{route:<62} {base['p95_ms']:>9.2f} {now['p95_ms']:>9.2f} {base['rps']:>9.1f} {now['rps']:>9.1f}"
+            + ("  (too few samples, not judged)" if few else "")
+        )
+        if few:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if base[key] > 0 and now[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{route}: {key} {base[key]} -> {now[key]}")
+        if now["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{route}: rps {base['rps']} -> {now['rps']}")
+        base_error_rate = base["errors"] / base["requests"] if base["requests"] else 0.0
+        now_error_rate = now["errors"] / now["requests"] if now["requests"] else 0.0
+        if now_error_rate > base_error_rate + 0.01:
+            regressions.append(f"{route}: error rate {base_error_rate:.1%} -> {now_error_rate:.1%}")
+    return regressions
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, mix: Dict[str, float]) -> Dict:
+    import httpx
+
+    state = load_state(args.chosen)
+    if not state.users:
+        raise SystemExit("No bench users in the database")
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        async with client:
+            await run_phase(client, state, mix, args, args.warmup, args.seed + 1, record=False)
+            samples, elapsed = await run_phase(client, state, mix, args, args.duration, args.seed, record=True)
+    else:
+        import main
+
+        # ASGITransport ไม่ส่ง lifespan event ให้ จึงเปิด lifespan ของ app เอง (flush task, leaderboard, model warmup)
+        async with main.app.router.lifespan_context(main.app):
+            try:
+                await main.app.state.model_warmup
+            except Exception as e:
+                print(f"warning: model warmup failed ({e}), prediction routes will report errors")
+            # exception ใน app ให้กลายเป็น 500 เหมือน server จริง แทนที่จะโยนเข้า client
+            transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+                await run_phase(client, state, mix, args, args.warmup, args.seed + 1, record=False)
+                samples, elapsed = await run_phase(client, state, mix, args, args.duration, args.seed, record=True)
+
+    results = summarize(samples, elapsed)
+    results["config"] = {
+        "workload": {
+            "users": args.users,
+            "activities": args.activities,
+            "lifestyles": args.lifestyles,
+            "chosen": args.chosen,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "mix": mix,
+            "seed": args.seed,
+            "target": args.url or "asgi",
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        },
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="RealWorld XP HTTP load test")
+    parser.add_argument("--database-url", help="Sync SQLAlchemy URL (default: fresh SQLite file in the temp folder)")
+    parser.add_argument("--url", help="Drive a running server at this base URL instead of the in-process app")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--activities", type=int, default=300)
+    parser.add_argument("--lifestyles", type=int, default=12)
+    parser.add_argument("--chosen", type=int, default=8, help="Chosen activities per plan")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds before the run")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--mix", help="Scenario weights, e.g. dashboard=40,login=0 (defaults: %s)" % DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--model-warmup", default="all", help="MODEL_WARMUP for the in-process app")
+    parser.add_argument("--save", help="Write the results to this JSON file (e.g. as the new baseline)")
+    parser.add_argument("--compare", help="Baseline JSON to compare against; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed fractional slowdown (default 0.2 = 20%%)")
+    parser.add_argument("--min-samples", type=int, default=200, help="Routes with fewer requests are not judged")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    configure_environment(args)
+    seed(args)
+    results = asyncio.run(run(args, mix))
+    print_report(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_samples)
+        if regressions:
+            print("\nRegressions:")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print("\nNo regression against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
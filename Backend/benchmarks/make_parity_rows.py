@@ -0,0 +1,103 @@
+"""
+Build the feature sample used by the compiled lifestyle MLP parity check
+
+Rows are encoded exactly like the assessment form encodes its answers
+(transformFormData in src/app/assess-ment-question): raw numbers for the
+free-text fields, 1-5 / 1-8 ratings rescaled to the training ranges,
+THB amounts converted to USD, the wellness score appended last and gender
+as the only categorical. Answers are drawn across each field's allowed
+range with a fixed seed, so the file is reproducible.
+
+Prefer a sample of logged /predictLifeStyle request bodies when one is
+available: write them in the same format and point
+LIFESTYLE_MLP_PARITY_ROWS at the file.
+
+Run from the Backend folder:
+    python benchmarks/make_parity_rows.py [--rows 256] [--seed 0] [--out lifestyle_parity_rows.json]
+"""
+import argparse
+import json
+import os
+import random
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USD_TO_THB = 36.5
+
+# field -> (new_min, new_max, old_max) ของ rating ที่ถูก rescale (old_min = 1)
+RESCALED = {
+    "healthConsciousness": (0, 13.4, 5),
+    "educationLevel": (0, 15.3, 8),
+    "environmentalAwareness": (0, 15.4, 5),
+    "socialMediaInfluence": (0, 45, 5),
+    "riskTolerance": (0, 49, 5),
+    "techSavviness": (0, 39.1, 5),
+    "financialWellness": (0, 594, 5),
+    "lifestyleBalance": (0, 60.7, 5),
+    "entertainmentEngagement": (0.1, 3.32, 5),
+    "socialResponsibility": (0, 18.1, 5),
+    "workLifeBalance": (0, 1.58, 5),
+    "investmentRiskAppetite": (0, 9.07, 5),
+    "ecoConsciousness": (0, 3.25, 5),
+    "stressManagement": (0, 9.89, 5),
+    "timeManagement": (0, 122, 5),
+}
+
+NUMERIC_FIELD_ORDER = [
+    "age", "vacationDays", "monthlySpend", "onlinePurchases", "charityDonations",
+    "weeklyExercise", "portfolioValue", "healthConsciousness", "educationLevel",
+    "dailyScreenTime", "environmentalAwareness", "socialMediaInfluence", "riskTolerance",
+    "professionalTrainings", "techSavviness", "financialWellness", "lifestyleBalance",
+    "entertainmentEngagement", "socialResponsibility", "workLifeBalance",
+    "investmentRiskAppetite", "ecoConsciousness", "stressManagement", "timeManagement"
+]
+
+
+def _answers(rng: random.Random) -> dict:
+    answers = {
+        "age": rng.randint(15, 70),
+        "vacationDays": rng.randint(0, 30),
+        "monthlySpend": rng.randint(3000, 80000),
+        "onlinePurchases": rng.randint(0, 30),
+        "charityDonations": rng.randint(0, 12),
+        "weeklyExercise": round(rng.uniform(0, 14), 1),
+        "portfolioValue": rng.choice([0, rng.randint(10000, 3000000)]),
+        "dailyScreenTime": round(rng.uniform(1, 14), 1),
+        "professionalTrainings": rng.randint(0, 10),
+        "gender": rng.choice(["ชาย", "หญิง", "ไม่ต้องการระบุ"]),
+    }
+    for field, (_, _, old_max) in RESCALED.items():
+        answers[field] = rng.randint(1, old_max)
+    return answers
+
+
+def encode(answers: dict) -> dict:
+    """Same numeric / categorical encoding as the assessment form"""
+    numeric = []
+    for field in NUMERIC_FIELD_ORDER:
+        value = answers[field]
+        if field in ("monthlySpend", "portfolioValue"):
+            value = value / USD_TO_THB
+        elif field in RESCALED:
+            new_min, new_max, old_max = RESCALED[field]
+            value = new_min + (value - 1) / (old_max - 1) * (new_max - new_min)
+        numeric.append(float(value))
+    numeric.append(answers["healthConsciousness"] * 0.45 + answers["weeklyExercise"] * 0.55)
+    return {"numeric": numeric, "categorical": [1 if answers["gender"] == "หญิง" else 0]}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=os.path.join(BACKEND_DIR, "lifestyle_parity_rows.json"))
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    rows = [encode(_answers(rng)) for _ in range(args.rows)]
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(rows, f)
+    print(f"wrote {len(rows)} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
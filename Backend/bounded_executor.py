@@ -0,0 +1,149 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a job cannot be admitted or does not start before its deadline"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a bounded queue and a start deadline per job
+
+    At most max_workers jobs run at once and at most max_pending more wait
+    in the queue; anything beyond that is rejected immediately. A queued job
+    that has not started within queue_timeout seconds is cancelled and the
+    caller gets ExecutorSaturated, so callers can shed load (e.g. with 503)
+    instead of piling up behind a busy pool.
+
+    warm_up() starts every worker and runs one-off setup (e.g. model loading)
+    in the pool; the start deadline is not applied while it runs, so jobs
+    queued behind a cold start wait for it instead of being rejected.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        max_pending: int,
+        queue_timeout: float,
+        initializer: Optional[Callable[[], Any]] = None
+    ):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(0, max_pending)
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=name,
+            initializer=initializer
+        )
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._completed = 0
+        self._warming = False
+
+    def _submit(self, fn: Callable, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorSaturated(f"{self.name} queue is full")
+
+        with self._lock:
+            self._in_flight += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if not future.cancelled():
+                self._completed += 1
+        self._slots.release()
+
+    def _deadline_exceeded(self, future) -> bool:
+        # cancel() สำเร็จเฉพาะงานที่ยังไม่เริ่มรัน งานที่รันอยู่แล้วจะปล่อยให้ทำจนเสร็จ
+        if future.cancel():
+            with self._lock:
+                self._timed_out += 1
+            return True
+        return False
+
+    def _start_timeout(self) -> Optional[float]:
+        # ระหว่าง warm_up งานที่รอคิวต้องรอ import/โหลด model ไม่ใช่เพราะ pool ไม่ว่าง จึงไม่นับ deadline
+        return None if self._warming else self.queue_timeout
+
+    def warm_up(self, fn: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Start every worker thread, then run fn once in the pool
+
+        Blocks until done. Each worker runs the initializer when it starts,
+        so after this returns no job pays for it.
+
+        Args:
+            fn: Optional setup to run in a worker, e.g. loading models
+
+        Returns:
+            What fn returned, or None
+        """
+        self._warming = True
+        try:
+            # ThreadPoolExecutor สร้าง thread เพิ่มเมื่อไม่มี thread ว่าง: ให้ทุกงานรอกันที่ barrier จึงได้ครบทุก worker
+            barrier = threading.Barrier(self.max_workers)
+            for future in [self._executor.submit(barrier.wait) for _ in range(self.max_workers)]:
+                future.result()
+            if fn is not None:
+                return self._executor.submit(fn).result()
+            return None
+        finally:
+            self._warming = False
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run fn(*args) in the pool without blocking the event loop
+
+        Raises:
+            ExecutorSaturated: The queue is full or the job missed its start deadline
+        """
+        future = self._submit(fn, *args)
+        wrapped = asyncio.wrap_future(future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(wrapped), self._start_timeout())
+        except asyncio.TimeoutError:
+            if self._deadline_exceeded(future):
+                raise ExecutorSaturated(f"{self.name} job did not start within {self.queue_timeout}s")
+            return await wrapped
+
+    def run_sync(self, fn: Callable, *args) -> Any:
+        """
+        Blocking variant of run() for sync code (e.g. FastAPI def routes)
+
+        Raises:
+            ExecutorSaturated: The queue is full or the job missed its start deadline
+        """
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self._start_timeout())
+        except FutureTimeoutError:
+            if self._deadline_exceeded(future):
+                raise ExecutorSaturated(f"{self.name} job did not start within {self.queue_timeout}s")
+            return future.result()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "queue_timeout_ms": self.queue_timeout * 1000,
+                "warming": self._warming,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out
+            }
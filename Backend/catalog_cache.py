@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import in_event_loop
+from model import Activity, ActivityStyle, LifestyleCate
+
+# ตรวจ version ของตาราง catalog (count + max id) ทุก CATALOG_CHECK_SECONDS
+# และโหลดใหม่ทั้งหมดทุก CATALOG_TTL_SECONDS เผื่อมีการแก้ไขแถวเดิม
+CATALOG_CHECK_SECONDS = float(os.getenv("CATALOG_CHECK_SECONDS", "30"))
+CATALOG_TTL_SECONDS = float(os.getenv("CATALOG_TTL_SECONDS", "300"))
+
+
+class ActivityRecord(NamedTuple):
+    id: int
+    name: str
+    base_time: Optional[int]
+    base_xp: Optional[int]
+    activity_type: Optional[str]
+    description: Optional[str]
+
+
+class LifestyleRecord(NamedTuple):
+    id: int
+    name: str
+
+
+class Catalog(NamedTuple):
+    """Immutable snapshot of the Activity, Lifestyle_cate and Activity_style tables"""
+    version: Tuple
+    activities: Tuple[ActivityRecord, ...]
+    activities_by_id: Mapping[int, ActivityRecord]
+    lifestyles: Tuple[LifestyleRecord, ...]
+    # inverted index: lifestyle_id -> activity ids (สร้างจาก Activity_style)
+    activity_ids_by_lifestyle: Mapping[int, FrozenSet[int]]
+
+    def activities_for_lifestyles(self, lifestyle_ids: Iterable[int], rank: bool = False) -> List[Tuple[ActivityRecord, int]]:
+        """
+        Activities that match any of the given lifestyles, without duplicates
+
+        Args:
+            lifestyle_ids: Lifestyle IDs to match
+            rank: If True, order by number of matched lifestyles (most first), then id
+
+        Returns:
+            List of (activity, matched lifestyle count), ordered by id unless rank is set
+        """
+        match_counts: Dict[int, int] = {}
+        for lifestyle_id in set(lifestyle_ids):
+            for activity_id in self.activity_ids_by_lifestyle.get(lifestyle_id, ()):
+                match_counts[activity_id] = match_counts.get(activity_id, 0) + 1
+
+        if rank:
+            ordered = sorted(match_counts, key=lambda activity_id: (-match_counts[activity_id], activity_id))
+        else:
+            ordered = sorted(match_counts)
+        return [
+            (self.activities_by_id[activity_id], match_counts[activity_id])
+            for activity_id in ordered
+            if activity_id in self.activities_by_id
+        ]
+
+
+def _version_query():
+    # count + max id ของทุกตาราง catalog ใน query เดียว
+    return select(
+        select(func.count(Activity.id)).scalar_subquery(),
+        select(func.max(Activity.id)).scalar_subquery(),
+        select(func.count(LifestyleCate.id)).scalar_subquery(),
+        select(func.max(LifestyleCate.id)).scalar_subquery(),
+        select(func.count(ActivityStyle.id)).scalar_subquery(),
+        select(func.max(ActivityStyle.id)).scalar_subquery()
+    )
+
+
+class CatalogCache:
+    """
+    Process-local cache of the activity and lifestyle catalogs
+
+    Besides the records themselves the snapshot carries an inverted index
+    from lifestyle id to activity ids built from Activity_style.
+
+    The catalog is loaded once and served from memory. Every check_interval
+    seconds a cheap version query (row count and max id of each table)
+    decides whether to reload, and the whole catalog is reloaded at least
+    every ttl seconds to pick up edits to existing rows. While one caller
+    reloads, other callers keep getting the previous snapshot.
+    """
+
+    def __init__(self, check_interval: float = CATALOG_CHECK_SECONDS, ttl: float = CATALOG_TTL_SECONDS):
+        self.check_interval = check_interval
+        self.ttl = ttl
+        self._catalog: Optional[Catalog] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._loads = 0
+        self._version_checks = 0
+
+    def _load(self, db: Session, version: Tuple) -> Catalog:
+        activities = tuple(
+            ActivityRecord(
+                id=activity.id,
+                name=activity.name,
+                base_time=activity.base_time,
+                base_xp=activity.base_xp,
+                activity_type=activity.activity_type.value if activity.activity_type else None,
+                description=activity.description
+            )
+            for activity in db.query(Activity).order_by(Activity.id).all()
+        )
+        lifestyles = tuple(
+            LifestyleRecord(id=lifestyle.id, name=lifestyle.name)
+            for lifestyle in db.query(LifestyleCate).order_by(LifestyleCate.id).all()
+        )
+        index: Dict[int, set] = {}
+        for lifestyle_id, activity_id in db.query(ActivityStyle.lifestyle_id, ActivityStyle.activity_id).all():
+            if lifestyle_id is not None and activity_id is not None:
+                index.setdefault(lifestyle_id, set()).add(activity_id)
+        return Catalog(
+            version=version,
+            activities=activities,
+            activities_by_id=MappingProxyType({activity.id: activity for activity in activities}),
+            lifestyles=lifestyles,
+            activity_ids_by_lifestyle=MappingProxyType(
+                {lifestyle_id: frozenset(activity_ids) for lifestyle_id, activity_ids in index.items()}
+            )
+        )
+
+    def _needs_check(self, now: float) -> bool:
+        return self._catalog is None or now - self._checked_at >= self.check_interval
+
+    def get(self, db: Session) -> Catalog:
+        """
+        Return the current catalog snapshot, refreshing it if due
+
+        Args:
+            db: Database session, only used when a check or reload is due
+
+        Returns:
+            Catalog snapshot
+        """
+        now = time.monotonic()
+        if not self._needs_check(now):
+            return self._catalog
+
+        # มี snapshot อยู่แล้วและมีคนอื่นกำลัง refresh → ใช้ snapshot เดิมไปก่อน ไม่ต้องรอ
+        # ใน event loop (ผ่าน run_sync) ห้ามรอ lock เพราะผู้ถือ lock อาจเป็น coroutine บน thread เดียวกัน
+        if not self._lock.acquire(blocking=self._catalog is None and not in_event_loop()):
+            if self._catalog is not None:
+                return self._catalog
+            # โหลดครั้งแรกพร้อมกัน: โหลดเองโดยไม่ถือ lock (ได้ snapshot แบบเดียวกัน แค่ query ซ้ำ)
+            return self._refresh(db, now)
+        try:
+            if not self._needs_check(now):
+                return self._catalog
+            return self._refresh(db, now)
+        finally:
+            self._lock.release()
+
+    def _refresh(self, db: Session, now: float) -> Catalog:
+        version = tuple(db.execute(_version_query()).one())
+        self._version_checks += 1
+        self._checked_at = now
+        catalog = self._catalog
+        expired = now - self._loaded_at >= self.ttl
+        if catalog is None or expired or version != catalog.version:
+            catalog = self._load(db, version)
+            self._catalog = catalog
+            self._loaded_at = now
+            self._loads += 1
+        return catalog
+
+    async def aget(self, db: AsyncSession) -> Catalog:
+        """Async variant of get() for routes that use AsyncSession"""
+        now = time.monotonic()
+        if not self._needs_check(now):
+            return self._catalog
+        return await db.run_sync(self.get)
+
+    def invalidate(self) -> None:
+        """Force a version check and reload on the next get()"""
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+
+    def stats(self) -> Dict:
+        catalog = self._catalog
+        return {
+            "loaded": catalog is not None,
+            "activities": len(catalog.activities) if catalog else 0,
+            "lifestyles": len(catalog.lifestyles) if catalog else 0,
+            "indexed_lifestyles": len(catalog.activity_ids_by_lifestyle) if catalog else 0,
+            "version": list(catalog.version) if catalog else None,
+            "loads": self._loads,
+            "version_checks": self._version_checks
+        }
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,190 @@
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import and_, select, update
+from sqlalchemy.orm import Session
+
+from catalog_cache import catalog_cache
+from leaderboard import leaderboard
+from model import User, Activity, ActivityPlan, ActivityInPlan
+from write_behind import CompletionEvent, completion_ledger
+
+XP_PER_LEVEL = 100
+# จำนวนครั้งที่ลองใหม่เมื่อแถว User ถูกแก้ระหว่างคำนวณ (เกิดได้เฉพาะ DB ที่ไม่รองรับ FOR UPDATE เช่น SQLite)
+COMPLETION_MAX_RETRIES = 5
+
+
+class CompletionNotFound(LookupError):
+    """Raised when the user, activity or plan entry needed for a completion does not exist"""
+
+
+class CompletionResult(NamedTuple):
+    user_id: int
+    level: int
+    xp: int
+    day_streak: int
+    is_success: bool
+    xp_gained: int
+    plan_id: Optional[int]
+
+
+class CompletionService:
+    """
+    Apply an activity completion to the User row and the completion ledger
+
+    The User row is read with SELECT ... FOR UPDATE, the new XP, level,
+    streak and stress values are computed from it, and the row is written
+    back with an UPDATE guarded on the values that were read. On MySQL the
+    row lock already serializes concurrent completions of the same user;
+    the guard covers databases that ignore FOR UPDATE (SQLite), where a
+    conflicting write makes the engine re-read and retry instead of
+    overwriting it.
+
+    The completion itself is appended to the Activity_completion ledger
+    through the batched completion_ledger buffer, which also adds it to
+    Activity_in_plan.success_count and bumps the plan version when it
+    flushes, so success counts trail the User row by at most
+    COMPLETION_FLUSH_SECONDS.
+
+    XP and success_count are therefore no longer updated atomically, by
+    design: the ledger insert and the success_count increment commit in a
+    later transaction than the XP change, and entries still buffered when
+    the process dies without a clean shutdown are lost, leaving the XP
+    awarded but the completion uncounted. Only the User row (XP, level,
+    streak, stress) is guaranteed to be consistent under concurrency.
+    """
+
+    @staticmethod
+    def _activity_xp(db: Session, activity_id: int) -> int:
+        activity = catalog_cache.get(db).activities_by_id.get(activity_id)
+        if activity is None:
+            activity = db.execute(select(Activity).where(Activity.id == activity_id)).scalars().first()
+        if activity is None:
+            raise CompletionNotFound("Activity not found")
+        return activity.base_xp or 0
+
+    @staticmethod
+    def _apply(user: User, xp_gained: int, now: datetime) -> dict:
+        """
+        New User column values after a completion (same rules as POST /user/{id}/complete)
+        """
+        values = {
+            "xp": (user.xp or 0) + xp_gained,
+            "level": user.level or 0,
+            "day_streak": user.day_streak or 0,
+            "is_success": user.is_success,
+            "first_success": user.first_success,
+            "stress_level": user.stress_level
+        }
+
+        if not user.is_success and (user.first_success is None or user.first_success.date() != user.login_time):
+            values["first_success"] = now
+            values["day_streak"] += 1
+            values["is_success"] = True
+
+        if values["xp"] >= XP_PER_LEVEL:
+            original_level = values["level"]
+            values["level"] += values["xp"] // XP_PER_LEVEL
+            values["xp"] %= XP_PER_LEVEL
+
+            # ข้ามผ่าน "หลัก 100" ของ level กี่ครั้ง ลด stress ลงเท่านั้น แต่ไม่ต่ำกว่า 1
+            milestone_crossings = (values["level"] // 100) - (original_level // 100)
+            stress_level = values["stress_level"]
+            if milestone_crossings > 0 and stress_level is not None and stress_level > 1:
+                values["stress_level"] = max(1, stress_level - milestone_crossings)
+        return values
+
+    @staticmethod
+    def _update_user(db: Session, user_id: int, xp_gained: int, now: datetime) -> Optional[dict]:
+        user = db.execute(
+            select(User).where(User.id == user_id).with_for_update().execution_options(populate_existing=True)
+        ).scalars().first()
+        if user is None:
+            raise CompletionNotFound("User not found")
+
+        values = CompletionService._apply(user, xp_gained, now)
+        # เขียนกลับเฉพาะเมื่อคอลัมน์ที่จะเขียนยังเป็นค่าเดิมที่อ่านมา
+        unchanged = [
+            column.is_(None) if getattr(user, name) is None else column == getattr(user, name)
+            for name, column in (
+                ("xp", User.xp), ("level", User.level), ("day_streak", User.day_streak),
+                ("is_success", User.is_success), ("first_success", User.first_success),
+                ("stress_level", User.stress_level)
+            )
+        ]
+        result = db.execute(
+            update(User)
+            .where(User.id == user_id, *unchanged)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        return values if result.rowcount == 1 else None
+
+    @staticmethod
+    def complete_activity(db: Session, user_id: int, activity_id: int, require_plan: bool = False) -> CompletionResult:
+        """
+        Record one completion of an activity for a user
+
+        Args:
+            db: Database session (sync; async routes call this through run_sync)
+            user_id: User ID
+            activity_id: Activity ID
+            require_plan: If True the activity must be in the user's plan,
+                otherwise the success_count increment is skipped when it is not
+
+        Returns:
+            CompletionResult with the user's new XP, level and streak
+
+        Raises:
+            CompletionNotFound: User, activity or (with require_plan) plan entry missing
+        """
+        xp_gained = CompletionService._activity_xp(db, activity_id)
+        now = datetime.now()
+        try:
+            # ตรวจ plan ก่อน lock User เพื่อให้ถือ lock สั้นที่สุด
+            plan_id = db.execute(
+                select(ActivityPlan.id).where(ActivityPlan.user_id == user_id).limit(1)
+            ).scalar()
+            in_plan = plan_id is not None and db.execute(
+                select(ActivityInPlan.id)
+                .where(and_(ActivityInPlan.plan_id == plan_id, ActivityInPlan.activity_id == activity_id))
+                .limit(1)
+            ).first() is not None
+
+            if require_plan and plan_id is None:
+                raise CompletionNotFound("Activity plan not found")
+            if require_plan and not in_plan:
+                raise CompletionNotFound("Activity not found in plan")
+
+            for _ in range(COMPLETION_MAX_RETRIES):
+                values = CompletionService._update_user(db, user_id, xp_gained, now)
+                if values is not None:
+                    break
+            else:
+                raise RuntimeError("User row kept changing during completion")
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        leaderboard.update_score(user_id, values["level"], values["xp"])
+
+        # success_count นับเฉพาะ activity ที่อยู่ใน plan เหมือนเดิม แต่ ledger เก็บทุก completion
+        completion_ledger.append(CompletionEvent(
+            user_id=user_id,
+            activity_id=activity_id,
+            plan_id=plan_id if in_plan else None,
+            xp_awarded=xp_gained,
+            completed_at=now
+        ))
+
+        return CompletionResult(
+            user_id=user_id,
+            level=values["level"],
+            xp=values["xp"],
+            day_streak=values["day_streak"],
+            is_success=bool(values["is_success"]),
+            xp_gained=xp_gained,
+            plan_id=plan_id
+        )
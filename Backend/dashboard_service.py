@@ -1,27 +1,61 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select, update
+from sqlalchemy.engine import Row
+from typing import AsyncIterator, List, Dict, Optional, Sequence
 from model import User, ActivityPlan, ActivityInPlan, Activity
+import hashlib
+from write_behind import current_login_time
+from fast_json import RowSerializer
+from streaming import STREAM_CHUNK_SIZE
+
+# เปลี่ยนค่านี้เมื่อรูปแบบ payload ของ dashboard เปลี่ยน เพื่อไม่ให้ client ใช้ cache เก่า
+DASHBOARD_PAYLOAD_VERSION = "1"
+
+# key ของ activity ใน dashboard (schemas.DashboardActivityOut) ตามลำดับใน payload
+DASHBOARD_ACTIVITY_KEYS = (
+    'activity_id', 'activity_name', 'base_time', 'base_xp', 'activity_type',
+    'description', 'success_count', 'is_chose', 'plan_id', 'user_id'
+)
+# query ของ get_user_activities select คอลัมน์ตามลำดับนี้อยู่แล้ว จึงอ่าน row ตามตำแหน่งได้
+user_activity_serializer = RowSerializer(DASHBOARD_ACTIVITY_KEYS)
+# row ของ fetch_dashboard_rows มีคอลัมน์ของ user ปนอยู่ จึงอ่านตามชื่อ
+dashboard_activity_serializer = RowSerializer(DASHBOARD_ACTIVITY_KEYS, columns=DASHBOARD_ACTIVITY_KEYS)
+# schemas.PlanActivityOut
+plan_activity_serializer = RowSerializer((
+    'id', 'plan_id', 'activity_id', 'success_count', 'is_chose',
+    'activity_name', 'base_time', 'base_xp', 'activity_type', 'description'
+))
+
+def bump_plan_version(plan_id: int):
+    """
+    UPDATE statement that increments Activity_plan.version
+
+    Execute it in the same transaction as any change to the plan's
+    Activity_in_plan rows so the dashboard ETag changes with them.
+    Works with both sync and async sessions.
+    """
+    return update(ActivityPlan).where(ActivityPlan.id == plan_id).values(version=ActivityPlan.version + 1)
 
 class DashboardService:
-    """Service class for dashboard data operations using SQLAlchemy"""
+    """Service class for dashboard data operations using SQLAlchemy async sessions"""
     
     @staticmethod
-    def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
+    async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
         """
         Get user information by user ID
         
         Args:
-            db: Database session
+            db: Async database session
             user_id: User ID
             
         Returns:
             User object or None
         """
-        return db.query(User).filter(User.id == user_id).first()
+        result = await db.execute(select(User).where(User.id == user_id))
+        return result.scalars().first()
     
     @staticmethod
-    def get_user_activities(db: Session, user_id: int) -> List[Dict]:
+    async def get_user_activities(db: AsyncSession, user_id: int) -> List[Dict]:
         """
         Get all chosen activities for a user
         
@@ -29,13 +63,13 @@ class DashboardService:
         User -> Activity_plan -> Activity_in_plan -> Activity
         
         Args:
-            db: Database session
+            db: Async database session
             user_id: User ID
             
         Returns:
             List of dictionaries containing activity information
         """
-        results = db.query(
+        results = (await db.execute(select(
             Activity.id.label('activity_id'),
             Activity.name.label('activity_name'),
             Activity.base_time,
@@ -52,61 +86,48 @@ class DashboardService:
             ActivityInPlan, ActivityPlan.id == ActivityInPlan.plan_id
         ).join(
             Activity, ActivityInPlan.activity_id == Activity.id
-        ).filter(
+        ).where(
             and_(
                 User.id == user_id,
                 ActivityInPlan.is_chose == True  # Changed from == 1
             )
-        ).order_by(Activity.id).all()
-        
-        # Convert to list of dictionaries
-        activities = []
-        for row in results:
-            activities.append({
-                'activity_id': row.activity_id,
-                'activity_name': row.activity_name,
-                'base_time': row.base_time,
-                'base_xp': row.base_xp,
-                'activity_type': row.activity_type.value if row.activity_type else None,  # Handle Enum
-                'description': row.description,
-                'success_count': row.success_count,
-                'is_chose': row.is_chose,
-                'plan_id': row.plan_id,
-                'user_id': row.user_id
-            })
+        ).order_by(Activity.id))).all()
         
-        return activities
+        # activity_type stays an ActivityType (str enum), which serializes as its value
+        return user_activity_serializer.dicts(results)
     
     @staticmethod
-    def get_activity_plan(db: Session, user_id: int) -> Optional[ActivityPlan]:
+    async def get_activity_plan(db: AsyncSession, user_id: int) -> Optional[ActivityPlan]:
         """
         Get activity plan for a user
         
         Args:
-            db: Database session
+            db: Async database session
             user_id: User ID
             
         Returns:
             ActivityPlan object or None
         """
-        return db.query(ActivityPlan).filter(
+        result = await db.execute(select(ActivityPlan).where(
             ActivityPlan.user_id == user_id
-        ).first()
+        ))
+        return result.scalars().first()
     
     @staticmethod
-    def get_activities_in_plan(db: Session, plan_id: int, chosen_only: bool = True) -> List[Dict]:
+    def plan_activities_query(plan_id: int, chosen_only: bool = True, cursor: Optional[int] = None, limit: Optional[int] = None):
         """
-        Get activities in a specific plan
+        SELECT for the activities of a plan, ordered by Activity.id
         
         Args:
-            db: Database session
             plan_id: Activity plan ID
-            chosen_only: If True, only return activities where is_chose = 1
+            chosen_only: If True, only activities where is_chose = 1
+            cursor: Only activities with an id greater than this (keyset pagination)
+            limit: Maximum number of rows (None = all)
             
         Returns:
-            List of dictionaries containing activity plan details
+            Select whose columns are in plan_activity_serializer key order
         """
-        query = db.query(
+        query = select(
             ActivityInPlan.id,
             ActivityInPlan.plan_id,
             ActivityInPlan.activity_id,
@@ -119,187 +140,259 @@ class DashboardService:
             Activity.description
         ).join(
             Activity, ActivityInPlan.activity_id == Activity.id
-        ).filter(
+        ).where(
             ActivityInPlan.plan_id == plan_id
-        )
+        ).order_by(ActivityInPlan.activity_id)
         
         if chosen_only:
-            query = query.filter(ActivityInPlan.is_chose == 1)
+            query = query.where(ActivityInPlan.is_chose == 1)
+        if cursor is not None:
+            query = query.where(ActivityInPlan.activity_id > cursor)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+    
+    @staticmethod
+    async def get_activities_in_plan(
+        db: AsyncSession,
+        plan_id: int,
+        chosen_only: bool = True,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Get activities in a specific plan
         
-        results = query.all()
+        Args:
+            db: Async database session
+            plan_id: Activity plan ID
+            chosen_only: If True, only return activities where is_chose = 1
+            cursor: Only activities with an id greater than this (keyset pagination)
+            limit: Maximum number of activities (None = all)
+            
+        Returns:
+            List of dictionaries containing activity plan details
+        """
+        query = DashboardService.plan_activities_query(plan_id, chosen_only, cursor, limit)
+        results = (await db.execute(query)).all()
+        
+        return plan_activity_serializer.dicts(results)
+    
+    @staticmethod
+    async def stream_activities_in_plan(
+        db: AsyncSession,
+        plan_id: int,
+        chosen_only: bool = True,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Activities in a plan, read through a server-side cursor
         
-        # Convert to list of dictionaries
-        activities = []
-        for row in results:
-            activities.append({
-                'id': row.id,
-                'plan_id': row.plan_id,
-                'activity_id': row.activity_id,
-                'success_count': row.success_count,
-                'is_chose': row.is_chose,
-                'activity_name': row.activity_name,
-                'base_time': row.base_time,
-                'base_xp': row.base_xp,
-                'activity_type': row.activity_type,
-                'description': row.description
-            })
+        Rows are fetched chunk_size at a time (yield_per), so only one chunk
+        is held in memory however large the plan is.
         
-        return activities
+        Args:
+            db: Async database session, kept open until the iterator is exhausted
+            plan_id: Activity plan ID
+            chosen_only: If True, only activities where is_chose = 1
+            cursor: Only activities with an id greater than this
+            limit: Maximum number of activities (None = all)
+            chunk_size: Rows per fetch
+            
+        Yields:
+            Lists of dictionaries, in the same format as get_activities_in_plan
+        """
+        query = DashboardService.plan_activities_query(plan_id, chosen_only, cursor, limit)
+        result = await db.stream(query.execution_options(yield_per=chunk_size))
+        async for partition in result.partitions():
+            yield plan_activity_serializer.dicts(partition)
     
     @staticmethod
-    def get_activity_details(db: Session, activity_id: int) -> Optional[Activity]:
+    async def get_activity_details(db: AsyncSession, activity_id: int) -> Optional[Activity]:
         """
         Get detailed information about a specific activity
         
         Args:
-            db: Database session
+            db: Async database session
             activity_id: Activity ID
             
         Returns:
             Activity object or None
         """
-        return db.query(Activity).filter(Activity.id == activity_id).first()
+        result = await db.execute(select(Activity).where(Activity.id == activity_id))
+        return result.scalars().first()
     
     @staticmethod
-    def get_dashboard_data(db: Session, user_id: int) -> Dict:
+    async def fetch_dashboard_rows(db: AsyncSession, user_id: int) -> Sequence[Row]:
         """
-        Get all dashboard data for a user in one call
+        Fetch the user and their chosen activities in a single round trip
+        
+        User LEFT JOIN Activity_plan LEFT JOIN Activity_in_plan (is_chose=1)
+        LEFT JOIN Activity, so a user without a plan or without chosen
+        activities still returns one row with NULL activity columns.
         
         Args:
-            db: Database session
+            db: Async database session
             user_id: User ID
             
         Returns:
-            Dictionary containing user info and chosen activities
+            Rows with user, plan and activity columns (empty if user not found)
+        """
+        result = await db.execute(select(
+            User.id.label('user_id'),
+            User.username,
+            User.stress_level,
+            User.xp,
+            User.level,
+            User.day_streak,
+            User.is_success,
+            User.first_success,
+            User.login_time,
+            ActivityPlan.id.label('plan_id'),
+            ActivityPlan.version.label('plan_version'),
+            Activity.id.label('activity_id'),
+            Activity.name.label('activity_name'),
+            Activity.base_time,
+            Activity.base_xp,
+            Activity.activity_type,
+            Activity.description,
+            ActivityInPlan.success_count,
+            ActivityInPlan.is_chose
+        ).select_from(User).outerjoin(
+            ActivityPlan, User.id == ActivityPlan.user_id
+        ).outerjoin(
+            ActivityInPlan, and_(
+                ActivityPlan.id == ActivityInPlan.plan_id,
+                ActivityInPlan.is_chose == True
+            )
+        ).outerjoin(
+            Activity, ActivityInPlan.activity_id == Activity.id
+        ).where(
+            User.id == user_id
+        ).order_by(Activity.id))
+        return result.all()
+    
+    @staticmethod
+    def dashboard_etag(rows: Sequence[Row]) -> Optional[str]:
         """
-        user = DashboardService.get_user_by_id(db, user_id)
-        activities = DashboardService.get_user_activities(db, user_id)
+        Strong ETag for a dashboard payload, computed without touching the activity list
         
-        user_dict = None
-        if user:
-            user_dict = {
-                'id': user.id,
-                'username': user.username,
-                'stress_level': user.stress_level,
-                'xp': user.xp,
-                'level': user.level,
-                'day_streak': user.day_streak,
-                'is_success': user.is_success,
-                'first_success': user.first_success,
-                'login_time': user.login_time.isoformat() if user.login_time else None
-            }
+        Derived from the user's columns (xp, level, streak and the rest of the
+        user block) plus every plan's version and the payload version.
         
-        return {
-            'user': user_dict,
-            'activities': activities,
-            'activity_count': len(activities)
-        }
+        Args:
+            rows: Rows returned by fetch_dashboard_rows
+            
+        Returns:
+            Quoted ETag string, or None if the user was not found
+        """
+        if not rows:
+            return None
+        first = rows[0]
+        plan_versions = sorted({(row.plan_id, row.plan_version) for row in rows if row.plan_id is not None})
+        fingerprint = repr((
+            DASHBOARD_PAYLOAD_VERSION,
+            first.user_id, first.username, first.stress_level,
+            first.xp, first.level, first.day_streak, first.is_success,
+            first.first_success, current_login_time(first.user_id, first.login_time),
+            plan_versions
+        ))
+        return '"' + hashlib.sha1(fingerprint.encode()).hexdigest() + '"'
     
     @staticmethod
-    def update_activity_choice(db: Session, plan_id: int, activity_id: int, is_chose: int) -> bool:
+    def build_dashboard_data(rows: Sequence[Row]) -> Dict:
         """
-        Update whether an activity is chosen in a plan
+        Build the dashboard payload from rows returned by fetch_dashboard_rows
         
         Args:
-            db: Database session
-            plan_id: Activity plan ID
-            activity_id: Activity ID
-            is_chose: 1 if chosen, 0 if not
+            rows: Rows returned by fetch_dashboard_rows
             
         Returns:
-            True if successful, False otherwise
+            Dictionary containing user info and chosen activities
         """
-        try:
-            activity_in_plan = db.query(ActivityInPlan).filter(
-                and_(
-                    ActivityInPlan.plan_id == plan_id,
-                    ActivityInPlan.activity_id == activity_id
-                )
-            ).first()
-            
-            if activity_in_plan:
-                activity_in_plan.is_chose = is_chose
-                db.commit()
-                return True
-            return False
-        except Exception as e:
-            db.rollback()
-            print(f"Error updating activity choice: {e}")
-            return False
+        if not rows:
+            return {'user': None, 'activities': [], 'activity_count': 0}
+        
+        first = rows[0]
+        login_time = current_login_time(first.user_id, first.login_time)
+        user_dict = {
+            'id': first.user_id,
+            'username': first.username,
+            'stress_level': first.stress_level,
+            'xp': first.xp,
+            'level': first.level,
+            'day_streak': first.day_streak,
+            'is_success': first.is_success,
+            'first_success': first.first_success,
+            'login_time': login_time.isoformat() if login_time else None
+        }
+        
+        activities = dashboard_activity_serializer.dicts(row for row in rows if row.activity_id is not None)
+        
+        return {
+            'user': user_dict,
+            'activities': activities,
+            'activity_count': len(activities)
+        }
     
     @staticmethod
-    def update_user_xp(db: Session, user_id: int, xp_gained: int) -> bool:
+    async def get_dashboard_data(db: AsyncSession, user_id: int) -> Dict:
         """
-        Update user XP and potentially level
+        Get all dashboard data for a user in one query
         
         Args:
-            db: Database session
+            db: Async database session
             user_id: User ID
-            xp_gained: Amount of XP to add
             
         Returns:
-            True if successful, False otherwise
+            Dictionary containing user info and chosen activities
         """
-        try:
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user:
-                return False
-            
-            new_xp = user.xp + xp_gained
-            new_level = user.level
-            
-            # Simple level calculation (100 XP per level)
-            if new_xp >= 100:
-                new_level = new_xp // 100
-                new_xp = new_xp % 100
-            
-            user.xp = new_xp
-            user.level = new_level
-            db.commit()
-            return True
-        except Exception as e:
-            db.rollback()
-            print(f"Error updating user XP: {e}")
-            return False
+        rows = await DashboardService.fetch_dashboard_rows(db, user_id)
+        return DashboardService.build_dashboard_data(rows)
     
     @staticmethod
-    def increment_activity_success(db: Session, plan_id: int, activity_id: int) -> bool:
+    async def update_activity_choice(db: AsyncSession, plan_id: int, activity_id: int, is_chose: int) -> bool:
         """
-        Increment success count for an activity in a plan
+        Update whether an activity is chosen in a plan
         
         Args:
-            db: Database session
+            db: Async database session
             plan_id: Activity plan ID
             activity_id: Activity ID
+            is_chose: 1 if chosen, 0 if not
             
         Returns:
             True if successful, False otherwise
         """
         try:
-            activity_in_plan = db.query(ActivityInPlan).filter(
+            result = await db.execute(select(ActivityInPlan).where(
                 and_(
                     ActivityInPlan.plan_id == plan_id,
                     ActivityInPlan.activity_id == activity_id
                 )
-            ).first()
+            ))
+            activity_in_plan = result.scalars().first()
             
             if activity_in_plan:
-                activity_in_plan.success_count += 1
-                db.commit()
+                activity_in_plan.is_chose = is_chose
+                await db.execute(bump_plan_version(plan_id))
+                await db.commit()
                 return True
             return False
         except Exception as e:
-            db.rollback()
-            print(f"Error incrementing success count: {e}")
+            await db.rollback()
+            print(f"Error updating activity choice: {e}")
             return False
     
     @staticmethod
-    def update_user_streak(db: Session, user_id: int, increment: bool = True) -> bool:
+    async def update_user_streak(db: AsyncSession, user_id: int, increment: bool = True) -> bool:
         """
         Update user's day streak
         
         Args:
-            db: Database session
+            db: Async database session
             user_id: User ID
             increment: True to increment, False to reset
             
@@ -307,7 +400,7 @@ class DashboardService:
             True if successful, False otherwise
         """
         try:
-            user = db.query(User).filter(User.id == user_id).first()
+            user = await DashboardService.get_user_by_id(db, user_id)
             if not user:
                 return False
             
@@ -316,9 +409,9 @@ class DashboardService:
             else:
                 user.day_streak = 0
             
-            db.commit()
+            await db.commit()
             return True
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             print(f"Error updating user streak: {e}")
             return False
\ No newline at end of file
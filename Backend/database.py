@@ -1,8 +1,13 @@
 from sqlalchemy import create_engine 
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import asyncio
 import os
 from dotenv import load_dotenv
+from db_metrics import (
+    TimedQueuePool, TimedAsyncAdaptedQueuePool, sync_pool_metrics, async_pool_metrics
+)
 
 load_dotenv()
 
@@ -12,10 +17,41 @@ DB_PASS = os.getenv("DB_PASS")
 DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
-URL_DATABASE = (f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
-engine = create_engine(URL_DATABASE)
+
+# DATABASE_URL / ASYNC_DATABASE_URL ใช้ override ได้ เช่นตอนเทสต์ด้วย SQLite:
+#   DATABASE_URL=sqlite:///./test.db
+#   ASYNC_DATABASE_URL=sqlite+aiosqlite:///./test.db
+URL_DATABASE = os.getenv("DATABASE_URL") or (f"mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+ASYNC_URL_DATABASE = os.getenv("ASYNC_DATABASE_URL") or (f"mysql+aiomysql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+
+# ตั้งค่า connection pool จาก .env
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))   # วินาที, ต้องน้อยกว่า wait_timeout ของ MySQL
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+def _pool_options(url: str, poolclass) -> dict:
+    # SQLite in-memory ใช้ pool แบบพิเศษของ SQLAlchemy จึงไม่ตั้งค่า pool ให้
+    if url.startswith("sqlite") and ":memory:" in url:
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING
+    }
+
+engine = create_engine(URL_DATABASE, **_pool_options(URL_DATABASE, TimedQueuePool))
+async_engine = create_async_engine(ASYNC_URL_DATABASE, **_pool_options(ASYNC_URL_DATABASE, TimedAsyncAdaptedQueuePool))
+sync_pool_metrics.attach(engine)
+async_pool_metrics.attach(async_engine.sync_engine)
 
 SessionLocal = sessionmaker(autoflush= False, autocommit=False, bind=engine)
+# expire_on_commit=False เพราะ AsyncSession โหลด attribute แบบ lazy หลัง commit ไม่ได้
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
 
 Base = declarative_base()
 
@@ -25,3 +61,21 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def in_event_loop() -> bool:
+    """
+    True when called on the event loop thread, including sync code run through AsyncSession.run_sync
+
+    Such code must not block on a threading lock: the holder may be another
+    coroutine on the same thread that is suspended on database I/O, and it
+    can only resume once the blocked call returns.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
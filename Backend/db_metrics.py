@@ -0,0 +1,106 @@
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from metrics import Histogram
+
+CHECKOUT_WAIT_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000, 30000)
+
+
+class PoolMetrics:
+    """Connection pool counters collected through SQLAlchemy pool events"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.checkout_wait_ms = Histogram(CHECKOUT_WAIT_BUCKETS_MS)
+        self._lock = threading.Lock()
+        self._counters = {
+            "connects": 0,
+            "checkouts": 0,
+            "checkins": 0,
+            "invalidations": 0,
+            "soft_invalidations": 0,
+            "checkout_timeouts": 0
+        }
+
+    def incr(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def attach(self, sync_engine) -> None:
+        """
+        Register pool event listeners on a (sync) engine
+
+        Args:
+            sync_engine: Engine, or AsyncEngine.sync_engine for the async engine
+        """
+        self.pool = sync_engine.pool
+        pool = sync_engine.pool
+        event.listen(pool, "connect", lambda *args: self.incr("connects"))
+        event.listen(pool, "checkout", lambda *args: self.incr("checkouts"))
+        event.listen(pool, "checkin", lambda *args: self.incr("checkins"))
+        event.listen(pool, "invalidate", lambda *args: self.incr("invalidations"))
+        event.listen(pool, "soft_invalidate", lambda *args: self.incr("soft_invalidations"))
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+
+        state = {}
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            state = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+                "max_overflow": pool._max_overflow,
+                "timeout_seconds": pool.timeout()
+            }
+        return {
+            "pool_class": type(pool).__name__ if pool is not None else None,
+            **state,
+            **counters,
+            "checkout_wait_ms": self.checkout_wait_ms.snapshot()
+        }
+
+
+def timed_pool_class(base, pool_metrics: PoolMetrics):
+    """
+    Subclass a queue pool so the time spent waiting for a connection is recorded
+
+    SQLAlchemy has no "checkout started" event, so the wait is measured
+    around the pool's own _do_get().
+    """
+    class TimedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                pool_metrics.incr("checkout_timeouts")
+                raise
+            finally:
+                pool_metrics.checkout_wait_ms.observe((time.perf_counter() - started) * 1000)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+TimedQueuePool = timed_pool_class(QueuePool, sync_pool_metrics)
+TimedAsyncAdaptedQueuePool = timed_pool_class(AsyncAdaptedQueuePool, async_pool_metrics)
+
+
+def pool_stats() -> Dict[str, Dict]:
+    return {
+        "sync": sync_pool_metrics.snapshot(),
+        "async": async_pool_metrics.snapshot()
+    }
@@ -0,0 +1,89 @@
+import enum
+import json
+import operator
+import os
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # orjson เป็น optional: ไม่มีก็ใช้ json ของ stdlib (ช้ากว่า แต่ผลลัพธ์เหมือนกัน)
+    orjson = None
+
+# FAST_JSON=0 → route คืน dict ให้ FastAPI validate ด้วย response_model แบบเดิม (ใช้ตอน debug schema)
+FAST_JSON = os.getenv("FAST_JSON", "1") != "0"
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _default(obj: Any) -> Any:
+    # ค่าที่ stdlib json ไม่รู้จัก แปลงแบบเดียวกับ jsonable_encoder ของ FastAPI
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize to compact UTF-8 JSON bytes
+
+    Enums are written as their value and datetimes as ISO 8601, the same
+    output FastAPI's jsonable_encoder gives, so switching a route to
+    json_response() does not change its payload.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """
+    Response with already serialized JSON
+
+    Returning a Response from a route skips response_model validation and
+    jsonable_encoder; the response_model is then only used for the OpenAPI
+    schema. Headers set on an injected `response: Response` are not copied,
+    pass them here instead.
+    """
+    return Response(content=dumps(content), status_code=status_code, headers=headers, media_type=JSON_MEDIA_TYPE)
+
+
+def respond(content: Any, headers: Optional[Mapping[str, str]] = None) -> Any:
+    """
+    What a route returns for a JSON payload
+
+    json_response(content) when FAST_JSON is on, otherwise content itself so
+    FastAPI validates and encodes it through the route's response_model.
+    """
+    if FAST_JSON:
+        return json_response(content, headers=headers)
+    return content
+
+
+class RowSerializer:
+    """
+    Turn row tuples into JSON-ready dicts with a fixed set of keys
+
+    Keys (and the columns they are read from) are bound once, so each row
+    costs one dict(zip(...)) instead of a hand-written dict literal.
+
+    Args:
+        keys: Output keys, in output order
+        columns: Row attributes to read for each key (default: read the
+            row positionally, which must then already be in `keys` order)
+    """
+
+    def __init__(self, keys: Sequence[str], columns: Optional[Sequence[str]] = None):
+        self.keys = tuple(keys)
+        if columns is not None and len(columns) != len(self.keys):
+            raise ValueError("columns must match keys one to one")
+        self._values = operator.attrgetter(*columns) if columns else None
+
+    def dicts(self, rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+        keys, values = self.keys, self._values
+        if values is None:
+            return [dict(zip(keys, row)) for row in rows]
+        return [dict(zip(keys, values(row))) for row in rows]
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+from bounded_executor import BoundedExecutor, ExecutorSaturated
+from metrics import Histogram
+
+PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "32"))
+PREDICT_BATCH_MAX_WAIT_MS = float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "5"))
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "16"))
+INFERENCE_QUEUE_TIMEOUT_MS = float(os.getenv("INFERENCE_QUEUE_TIMEOUT_MS", "2000"))
+TORCH_INTRA_OP_THREADS = int(os.getenv("TORCH_INTRA_OP_THREADS", "1"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+_batchers: Dict[str, "MicroBatcher"] = {}
+
+
+def _init_inference_thread() -> None:
+    # torch ใช้ intra-op thread pool ร่วมกันทั้ง process จึงต้องจำกัดจำนวน thread ไม่ให้แย่ง CPU กันเอง
+    import torch
+    torch.set_num_threads(TORCH_INTRA_OP_THREADS)
+
+
+inference_executor = BoundedExecutor(
+    "inference",
+    max_workers=INFERENCE_WORKERS,
+    max_pending=INFERENCE_MAX_PENDING,
+    queue_timeout=INFERENCE_QUEUE_TIMEOUT_MS / 1000,
+    initializer=_init_inference_thread
+)
+
+
+class MicroBatcher:
+    """
+    Gather concurrent prediction requests into a single forward pass
+
+    Every call to submit() enqueues one item and waits for its own result.
+    A background task collects items until either max_batch_size items are
+    waiting or max_wait_ms has passed since the first item of the batch
+    arrived, then calls batch_fn once with the whole list. batch_fn must
+    return one result per item, in the same order.
+
+    batch_fn runs in the bounded inference executor, never on the event
+    loop; while one batch is running the next one is already being
+    collected. If the executor is saturated every caller in the batch gets
+    ExecutorSaturated. If batch_fn raises for a batch of several items, the
+    items are scored again one at a time, so only the caller whose item
+    fails gets the exception.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = PREDICT_BATCH_MAX_SIZE,
+        max_wait_ms: float = PREDICT_BATCH_MAX_WAIT_MS,
+        executor: BoundedExecutor = inference_executor
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.batch_size_hist = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_hist = Histogram(QUEUE_WAIT_BUCKETS_MS)
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._dispatching = set()
+        _batchers[name] = self
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Enqueue one item and wait for its slice of the batch result
+
+        Args:
+            item: A single request, as understood by batch_fn
+
+        Returns:
+            The result batch_fn produced for this item
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._collect())
+
+        future = loop.create_future()
+        self._queue.put_nowait((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # เก็บ request ที่มารอในคิวแล้วให้เต็ม batch โดยไม่ต้องรอเพิ่ม
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, batch: List[tuple]) -> None:
+        now = time.perf_counter()
+        pending = [(item, future) for item, future, _ in batch if not future.done()]
+        for _, _, enqueued_at in batch:
+            self.queue_wait_hist.observe((now - enqueued_at) * 1000)
+        if not pending:
+            return
+        self.batch_size_hist.observe(len(pending))
+
+        try:
+            results = await self.executor.run(self.batch_fn, [item for item, _ in pending])
+        except ExecutorSaturated as e:
+            self._settle(pending, [(None, e)] * len(pending))
+            return
+        except Exception as e:
+            if len(pending) == 1:
+                self._settle(pending, [(None, e)])
+                return
+            # batch fail ทั้งก้อน: score ใหม่ทีละ item (เป็นงานเดียวใน executor) เพื่อแยก item ที่ผิดออกมา
+            try:
+                outcomes = await self.executor.run(self._score_each, [item for item, _ in pending])
+            except Exception as retry_error:
+                outcomes = [(None, retry_error)] * len(pending)
+            self._settle(pending, outcomes)
+            return
+
+        self._settle(pending, [(result, None) for result in results])
+
+    def _score_each(self, items: List[Any]) -> List[tuple]:
+        # รันใน executor thread: คืน (result, error) ต่อ item แทนการ raise
+        outcomes = []
+        for item in items:
+            try:
+                outcomes.append((self.batch_fn([item])[0], None))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
+
+    @staticmethod
+    def _settle(pending: List[tuple], outcomes: Sequence[tuple]) -> None:
+        for (_, future), (result, error) in zip(pending, outcomes):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batch_size": self.batch_size_hist.snapshot(),
+            "queue_wait_ms": self.queue_wait_hist.snapshot()
+        }
+
+
+def batcher_stats() -> Dict[str, Dict]:
+    """Histograms of every registered batcher plus the inference executor"""
+    stats = {name: batcher.stats() for name, batcher in _batchers.items()}
+    stats["executor"] = inference_executor.stats()
+    return stats
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from sortedcontainers import SortedList
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import in_event_loop
+from model import User, UserLifestyle
+
+logger = logging.getLogger(__name__)
+
+# อ่านจาก DB ใหม่ทั้งหมดเป็นระยะ เพื่อรับการเปลี่ยนแปลงจาก process อื่น (หลาย worker) หรือจากการแก้ DB ตรงๆ
+LEADERBOARD_RESYNC_SECONDS = float(os.getenv("LEADERBOARD_RESYNC_SECONDS", "300"))
+LEADERBOARD_MAX_LIMIT = 100
+
+# key ใน SortedList: (-level, -xp, user_id) → เรียง level มากไปน้อย, xp มากไปน้อย, แล้ว id
+ScoreKey = Tuple[int, int, int]
+
+
+class LeaderboardEntry(NamedTuple):
+    rank: int
+    user_id: int
+    username: str
+    level: int
+    xp: int
+
+
+class _UserState(NamedTuple):
+    key: ScoreKey
+    username: str
+    lifestyle_ids: FrozenSet[int]
+
+
+def _score_key(user_id: int, level: Optional[int], xp: Optional[int]) -> ScoreKey:
+    return (-(level or 0), -(xp or 0), user_id)
+
+
+class Leaderboard:
+    """
+    In-memory ranking of users by level, then xp
+
+    A global SortedList plus one per lifestyle hold (-level, -xp, user_id)
+    keys, so top-N is a slice and a user's rank is one bisect (O(log n)).
+    Users with the same level and xp share a rank (1, 2, 2, 4).
+
+    The board is built from the database on first use (or at startup) and
+    kept current by update_score() / set_lifestyles() calls from the routes
+    that change level, xp or lifestyles. rebuild() replaces it wholesale
+    and is also run periodically; changes reported while a rebuild is
+    reading the database are journaled and replayed onto the new board, so
+    the swap does not roll them back.
+    """
+
+    def __init__(self):
+        self._global = SortedList()
+        self._by_lifestyle: Dict[int, SortedList] = {}
+        self._users: Dict[int, _UserState] = {}
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        # journal ของ rebuild ที่กำลังทำงานอยู่ (อาจมีมากกว่าหนึ่งพร้อมกัน)
+        self._journals: List[List[Tuple[Callable, tuple]]] = []
+        self._loaded = False
+        self._loaded_at = None
+        self._rebuilds = 0
+        self._updates = 0
+
+    def rebuild(self, db: Session) -> None:
+        """Reload every user's score and lifestyles from the database"""
+        started = time.perf_counter()
+        journal: List[Tuple[Callable, tuple]] = []
+        with self._lock:
+            self._journals.append(journal)
+        try:
+            users = self._rebuild(db, journal)
+        finally:
+            with self._lock:
+                self._journals.remove(journal)
+        logger.info("Leaderboard rebuilt with %d users in %.3fs", len(users), time.perf_counter() - started)
+
+    def _rebuild(self, db: Session, journal: List[Tuple[Callable, tuple]]) -> Dict[int, _UserState]:
+        lifestyles: Dict[int, set] = {}
+        for user_id, lifestyle_id in db.execute(select(UserLifestyle.user_id, UserLifestyle.lifestyle_id)):
+            if user_id is not None and lifestyle_id is not None:
+                lifestyles.setdefault(user_id, set()).add(lifestyle_id)
+
+        users: Dict[int, _UserState] = {}
+        for user_id, username, level, xp in db.execute(select(User.id, User.username, User.level, User.xp)):
+            users[user_id] = _UserState(
+                _score_key(user_id, level, xp), username, frozenset(lifestyles.get(user_id, ()))
+            )
+
+        by_lifestyle: Dict[int, list] = {}
+        for state in users.values():
+            for lifestyle_id in state.lifestyle_ids:
+                by_lifestyle.setdefault(lifestyle_id, []).append(state.key)
+
+        board = SortedList(state.key for state in users.values())
+        boards = {lifestyle_id: SortedList(keys) for lifestyle_id, keys in by_lifestyle.items()}
+        with self._lock:
+            self._global, self._by_lifestyle, self._users = board, boards, users
+            self._loaded = True
+            self._loaded_at = time.time()
+            self._rebuilds += 1
+            # การเปลี่ยนแปลงที่ commit หลังจากอ่าน DB ไปแล้วไม่อยู่ใน board ใหม่: เล่นซ้ำตามลำดับที่เข้ามา
+            for apply, args in journal:
+                apply(*args)
+        return users
+
+    def get(self, db: Session) -> "Leaderboard":
+        """Return the board, building it from db first if it was never loaded"""
+        if not self._loaded:
+            # ใน event loop (ผ่าน run_sync) ห้ามรอ lock: ถ้ามี coroutine อื่นกำลัง rebuild อยู่ก็ rebuild เองไปเลย
+            if not self._load_lock.acquire(blocking=not in_event_loop()):
+                self.rebuild(db)
+                return self
+            try:
+                if not self._loaded:
+                    self.rebuild(db)
+            finally:
+                self._load_lock.release()
+        return self
+
+    async def aget(self, db: AsyncSession) -> "Leaderboard":
+        """Async variant of get() for routes that use AsyncSession"""
+        if not self._loaded:
+            await db.run_sync(self.get)
+        return self
+
+    def _remove(self, state: _UserState) -> None:
+        self._global.discard(state.key)
+        for lifestyle_id in state.lifestyle_ids:
+            board = self._by_lifestyle.get(lifestyle_id)
+            if board is not None:
+                board.discard(state.key)
+
+    def _add(self, state: _UserState) -> None:
+        self._global.add(state.key)
+        for lifestyle_id in state.lifestyle_ids:
+            self._by_lifestyle.setdefault(lifestyle_id, SortedList()).add(state.key)
+
+    def _replace(self, user_id: int, state: _UserState) -> None:
+        old = self._users.get(user_id)
+        if old is not None:
+            self._remove(old)
+        self._users[user_id] = state
+        self._add(state)
+        self._updates += 1
+
+    def _record(self, apply: Callable, *args) -> None:
+        # เรียกขณะถือ _lock: เก็บลง journal ของทุก rebuild ที่กำลังอ่าน DB แล้ว apply กับ board ปัจจุบัน
+        for journal in self._journals:
+            journal.append((apply, args))
+        if self._loaded:
+            apply(*args)
+
+    def update_score(self, user_id: int, level: Optional[int], xp: Optional[int], username: Optional[str] = None) -> None:
+        """
+        Move a user to their new position (adds the user if not on the board yet)
+
+        Before the board is loaded this only matters to a load that is
+        already reading the database; a later load reads the current values.
+        """
+        with self._lock:
+            self._record(self._apply_score, user_id, level, xp, username)
+
+    def set_lifestyles(self, user_id: int, lifestyle_ids: Iterable[int]) -> None:
+        """Replace the lifestyles a user is ranked under"""
+        with self._lock:
+            self._record(self._apply_lifestyles, user_id, frozenset(lifestyle_ids), False)
+
+    def add_lifestyles(self, user_id: int, lifestyle_ids: Iterable[int]) -> None:
+        with self._lock:
+            self._record(self._apply_lifestyles, user_id, frozenset(lifestyle_ids), True)
+
+    def _apply_score(self, user_id: int, level: Optional[int], xp: Optional[int], username: Optional[str]) -> None:
+        old = self._users.get(user_id)
+        if username is None:
+            if old is None:
+                return
+            username = old.username
+        lifestyle_ids = old.lifestyle_ids if old is not None else frozenset()
+        self._replace(user_id, _UserState(_score_key(user_id, level, xp), username, lifestyle_ids))
+
+    def _apply_lifestyles(self, user_id: int, lifestyle_ids: FrozenSet[int], merge: bool) -> None:
+        old = self._users.get(user_id)
+        if old is None:
+            return
+        if merge:
+            lifestyle_ids = old.lifestyle_ids | lifestyle_ids
+        self._replace(user_id, old._replace(lifestyle_ids=lifestyle_ids))
+
+    def _board(self, lifestyle_id: Optional[int]) -> SortedList:
+        if lifestyle_id is None:
+            return self._global
+        return self._by_lifestyle.get(lifestyle_id, SortedList())
+
+    def top(self, limit: int = 10, offset: int = 0, lifestyle_id: Optional[int] = None) -> List[LeaderboardEntry]:
+        """
+        Users ranked offset+1 .. offset+limit, best first
+
+        Args:
+            limit: Number of entries
+            offset: Number of entries to skip
+            lifestyle_id: Rank only users with this lifestyle (None = everyone)
+
+        Returns:
+            List of LeaderboardEntry
+        """
+        with self._lock:
+            board = self._board(lifestyle_id)
+            entries = []
+            for key in board.islice(offset, offset + limit):
+                state = self._users[key[2]]
+                entries.append(LeaderboardEntry(
+                    rank=board.bisect_left(key[:2]) + 1,
+                    user_id=key[2],
+                    username=state.username,
+                    level=-key[0],
+                    xp=-key[1]
+                ))
+            return entries
+
+    def rank(self, user_id: int, lifestyle_id: Optional[int] = None) -> Optional[Tuple[LeaderboardEntry, int]]:
+        """
+        A user's rank
+
+        Returns:
+            (entry, number of ranked users), or None if the user is not on that board
+        """
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None or (lifestyle_id is not None and lifestyle_id not in state.lifestyle_ids):
+                return None
+            board = self._board(lifestyle_id)
+            entry = LeaderboardEntry(
+                rank=board.bisect_left(state.key[:2]) + 1,
+                user_id=user_id,
+                username=state.username,
+                level=-state.key[0],
+                xp=-state.key[1]
+            )
+            return entry, len(board)
+
+    async def run_periodic_resync(self, session_factory, interval: float = LEADERBOARD_RESYNC_SECONDS) -> None:
+        """Rebuild now and then every interval seconds until cancelled (run as a lifespan task)"""
+        while True:
+            def _resync():
+                db = session_factory()
+                try:
+                    self.rebuild(db)
+                finally:
+                    db.close()
+            try:
+                await asyncio.to_thread(_resync)
+            except Exception:
+                logger.exception("Leaderboard resync failed")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "users": len(self._users),
+                "lifestyles": len(self._by_lifestyle),
+                "loaded_at": self._loaded_at,
+                "rebuilds": self._rebuilds,
+                "updates": self._updates
+            }
+
+
+leaderboard = Leaderboard()
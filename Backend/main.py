@@ -1,7 +1,37 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from routes import start_activity,lifestyle_cat,auth,activity,predict,dashboard_routes, all_activities_routes,rf_predict
+from fastapi.responses import JSONResponse
+from routes import start_activity,lifestyle_cat,auth,activity,predict,dashboard_routes, all_activities_routes,rf_predict,metrics,leaderboard as leaderboard_routes
 from fastapi.middleware.cors import CORSMiddleware
-app = FastAPI()
+from model_manager import models
+from inference_batcher import inference_executor
+from write_behind import write_behind_buffers
+from leaderboard import leaderboard
+from database import SessionLocal
+import maintenance
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warmup ใน background thread เพื่อให้ /health ตอบได้ทันที ส่วน /ready จะรอจน warmup เสร็จ
+    # รันผ่าน inference executor: import torch + โหลด model เกิดใน worker ก่อน request แรก และไม่นับ start deadline
+    app.state.model_warmup = asyncio.create_task(asyncio.to_thread(inference_executor.warm_up, models.warmup_from_env))
+    # buffer แบบ write-behind (login_time, completion ledger): flush เป็นระยะ และ flush ที่เหลือทั้งหมดตอน shutdown
+    flush_tasks = [asyncio.create_task(buffer.run_periodic()) for buffer in write_behind_buffers]
+    # สร้าง leaderboard จาก DB ตอนเริ่ม แล้ว resync เป็นระยะ
+    leaderboard_resync = asyncio.create_task(leaderboard.run_periodic_resync(SessionLocal))
+    # job reset streak รายวัน (เปิดเมื่อตั้ง STREAK_RESET_AT) หรือใช้ cron เรียก python maintenance.py reset-streaks แทน
+    streak_reset = asyncio.create_task(maintenance.run_daily()) if maintenance.STREAK_RESET_AT else None
+    yield
+    leaderboard_resync.cancel()
+    if streak_reset is not None:
+        streak_reset.cancel()
+    for task in flush_tasks:
+        task.cancel()
+    for buffer in write_behind_buffers:
+        await asyncio.to_thread(buffer.flush)
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],    
@@ -18,6 +48,8 @@ app.include_router(activity.router, prefix="/api", tags=["activity"])
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(dashboard_routes.router, prefix="/api/dashboard", tags=["dashboard"])
 app.include_router(all_activities_routes.router, prefix="/api/activities", tags=["activities"])
+app.include_router(leaderboard_routes.router, prefix="/api", tags=["leaderboard"])
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
 
 @app.get("/")
 async def root():
@@ -31,6 +63,19 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Ready only after the configured models are loaded and warmup inference has run
+
+    Per-model readiness is reported under "models"; models skipped because
+    their artifacts are missing do not make the service unready.
+    """
+    status = models.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "not ready", **status})
+    return {"status": "ready", **status}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="localhost", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+Scheduled maintenance jobs
+
+Run from the Backend folder:
+    python maintenance.py reset-streaks [--dry-run] [--chunk-size 5000]
+
+or in-process by setting STREAK_RESET_AT (e.g. "00:05", Bangkok time);
+main.py then schedules reset_expired_streaks() once a day.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from model import User
+
+logger = logging.getLogger(__name__)
+
+BANGKOK = ZoneInfo("Asia/Bangkok")
+STREAK_RESET_CHUNK_SIZE = int(os.getenv("STREAK_RESET_CHUNK_SIZE", "5000"))
+# พักระหว่าง chunk เพื่อไม่ให้ job แย่ง I/O กับ request ปกติ
+STREAK_RESET_PAUSE_MS = float(os.getenv("STREAK_RESET_PAUSE_MS", "0"))
+# เวลาที่ให้ job รันใน process ทุกวัน ("HH:MM" เวลาไทย); ว่าง = ไม่รัน
+STREAK_RESET_AT = os.getenv("STREAK_RESET_AT", "")
+
+
+class MaintenanceReport(NamedTuple):
+    dry_run: bool
+    success_cleared: int
+    streaks_reset: int
+    ids_scanned: int
+    chunks: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return round(self.ids_scanned / self.seconds, 1) if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        mode = "dry run: would update" if self.dry_run else "updated"
+        return (
+            f"{mode} is_success on {self.success_cleared} and day_streak on {self.streaks_reset} users; "
+            f"scanned {self.ids_scanned} ids in {self.chunks} chunks, "
+            f"{self.seconds:.2f}s ({self.rows_per_second} rows/s)"
+        )
+
+
+def streak_cutoffs(now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """
+    Cutoffs on first_success, same rules as login_for_access_token
+
+    first_success before today (Bangkok) -> is_success is cleared;
+    first_success before yesterday -> the streak is broken.
+
+    Returns:
+        (start of today, start of yesterday) as naive Bangkok datetimes, like the stored values
+    """
+    now = now or datetime.now(BANGKOK)
+    today = now.astimezone(BANGKOK).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    return today, today - timedelta(days=1)
+
+
+def reset_expired_streaks(
+    db: Session,
+    dry_run: bool = False,
+    chunk_size: int = STREAK_RESET_CHUNK_SIZE,
+    pause_ms: float = STREAK_RESET_PAUSE_MS,
+    now: Optional[datetime] = None
+) -> MaintenanceReport:
+    """
+    Clear is_success and reset day_streak for users whose day has passed
+
+    Walks User by primary-key range, chunk_size ids at a time, with two
+    set-based UPDATEs per chunk and a commit after each chunk, so locks
+    are held only for one chunk. The predicates only match rows that
+    actually change, which makes the job idempotent.
+
+    Args:
+        db: Database session
+        dry_run: Count the rows that would change without writing
+        chunk_size: Ids per chunk
+        pause_ms: Sleep between chunks
+        now: Reference time (default: now in Bangkok)
+
+    Returns:
+        MaintenanceReport with counts and throughput
+    """
+    today, yesterday = streak_cutoffs(now)
+    clear_success = and_(User.first_success < today, User.is_success == True)
+    break_streak = and_(User.first_success < yesterday, User.day_streak != 0)
+
+    started = time.perf_counter()
+    success_cleared = streaks_reset = ids_scanned = chunks = 0
+    min_id, max_id = db.execute(select(func.min(User.id), func.max(User.id))).one()
+    if min_id is not None:
+        for low in range(min_id, max_id + 1, max(1, chunk_size)):
+            in_chunk = and_(User.id >= low, User.id < low + chunk_size)
+            if dry_run:
+                success_cleared += db.execute(select(func.count(User.id)).where(in_chunk, clear_success)).scalar()
+                streaks_reset += db.execute(select(func.count(User.id)).where(in_chunk, break_streak)).scalar()
+            else:
+                success_cleared += db.execute(
+                    update(User).where(in_chunk, clear_success).values(is_success=False)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                streaks_reset += db.execute(
+                    update(User).where(in_chunk, break_streak).values(day_streak=0)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                db.commit()
+            ids_scanned += min(chunk_size, max_id + 1 - low)
+            chunks += 1
+            if pause_ms > 0:
+                time.sleep(pause_ms / 1000)
+
+    report = MaintenanceReport(
+        dry_run=dry_run,
+        success_cleared=success_cleared,
+        streaks_reset=streaks_reset,
+        ids_scanned=ids_scanned,
+        chunks=chunks,
+        seconds=time.perf_counter() - started
+    )
+    logger.info("Streak reset %s", report.summary())
+    return report
+
+
+def run_reset_expired_streaks(**kwargs) -> MaintenanceReport:
+    """reset_expired_streaks() with its own session"""
+    db = SessionLocal()
+    try:
+        return reset_expired_streaks(db, **kwargs)
+    finally:
+        db.close()
+
+
+def _seconds_until(at: str, now: Optional[datetime] = None) -> float:
+    hour, minute = (int(part) for part in at.split(":"))
+    now = now or datetime.now(BANGKOK)
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+async def run_daily(at: str = STREAK_RESET_AT) -> None:
+    """Run the streak reset every day at the given Bangkok time until cancelled (lifespan task)"""
+    while True:
+        await asyncio.sleep(_seconds_until(at))
+        try:
+            await asyncio.to_thread(run_reset_expired_streaks)
+        except Exception:
+            logger.exception("Streak reset failed")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="RealWorld XP maintenance jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    reset = commands.add_parser("reset-streaks", help="Clear is_success and reset expired day streaks")
+    reset.add_argument("--dry-run", action="store_true", help="Only count the rows that would change")
+    reset.add_argument("--chunk-size", type=int, default=STREAK_RESET_CHUNK_SIZE)
+    reset.add_argument("--pause-ms", type=float, default=STREAK_RESET_PAUSE_MS)
+    args = parser.parse_args(argv)
+
+    if args.command == "reset-streaks":
+        report = run_reset_expired_streaks(dry_run=args.dry_run, chunk_size=args.chunk_size, pause_ms=args.pause_ms)
+        print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
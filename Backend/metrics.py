@@ -0,0 +1,47 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram used by the /metrics endpoints"""
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # ช่องสุดท้ายคือ +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict:
+        """
+        Return the histogram as cumulative bucket counts
+
+        Returns:
+            Dictionary with count, sum, mean and cumulative buckets
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+            count = self._count
+
+        buckets = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            buckets[f"le_{bound:g}"] = running
+        buckets["le_inf"] = running + counts[-1]
+
+        return {
+            "count": count,
+            "sum": round(total, 3),
+            "mean": round(total / count, 3) if count else None,
+            "buckets": buckets
+        }
@@ -0,0 +1,118 @@
+"""Initial schema
+
+Tables as they existed before migrations were introduced. A database that
+already has them should be stamped instead of upgraded:
+
+    alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "User",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(length=100), nullable=False),
+        sa.Column("password", sa.String(length=255), nullable=False),
+        sa.Column("stress_level", sa.Integer(), nullable=True),
+        sa.Column("xp", sa.Integer(), nullable=True),
+        sa.Column("level", sa.Integer(), nullable=True),
+        sa.Column("day_streak", sa.Integer(), nullable=True),
+        sa.Column("is_success", sa.Boolean(), nullable=True),
+        sa.Column("first_success", sa.DateTime(), nullable=True),
+        sa.Column("login_time", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("username")
+    )
+    op.create_index("ix_User_id", "User", ["id"])
+
+    op.create_table(
+        "Lifestyle_cate",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_Lifestyle_cate_id", "Lifestyle_cate", ["id"])
+
+    op.create_table(
+        "Activity",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("base_time", sa.Integer(), nullable=True),
+        sa.Column("base_xp", sa.Integer(), nullable=True),
+        sa.Column("activity_type", sa.Enum("INDOOR", "OUTDOOR", name="activitytype"), nullable=True),
+        sa.Column("description", sa.String(length=500), nullable=True),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_Activity_id", "Activity", ["id"])
+
+    op.create_table(
+        "User_lifestyle",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("lifestyle_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["User.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["lifestyle_id"], ["Lifestyle_cate.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_User_lifestyle_id", "User_lifestyle", ["id"])
+
+    op.create_table(
+        "Activity_plan",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["User.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_Activity_plan_id", "Activity_plan", ["id"])
+
+    op.create_table(
+        "Activity_in_plan",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("plan_id", sa.Integer(), nullable=True),
+        sa.Column("activity_id", sa.Integer(), nullable=True),
+        sa.Column("success_count", sa.Integer(), nullable=True),
+        sa.Column("is_chose", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(["plan_id"], ["Activity_plan.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["activity_id"], ["Activity.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_Activity_in_plan_id", "Activity_in_plan", ["id"])
+
+    op.create_table(
+        "Activity_style",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("activity_id", sa.Integer(), nullable=True),
+        sa.Column("lifestyle_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["activity_id"], ["Activity.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["lifestyle_id"], ["Lifestyle_cate.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_Activity_style_id", "Activity_style", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("Activity_style")
+    op.drop_table("Activity_in_plan")
+    op.drop_table("Activity_plan")
+    op.drop_table("Activity")
+    op.drop_table("User_lifestyle")
+    op.drop_table("Lifestyle_cate")
+    op.drop_table("User")
@@ -0,0 +1,75 @@
+"""Activity_plan.version and unique (plan_id, activity_id) on Activity_in_plan
+
+Duplicate Activity_in_plan rows are merged into the lowest id before the
+constraint is added: success counts are summed and the row stays chosen
+if any duplicate was chosen.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+activity_in_plan = sa.table(
+    "Activity_in_plan",
+    sa.column("id", sa.Integer),
+    sa.column("plan_id", sa.Integer),
+    sa.column("activity_id", sa.Integer),
+    sa.column("success_count", sa.Integer),
+    sa.column("is_chose", sa.Boolean)
+)
+
+
+def _merge_duplicate_selections() -> None:
+    bind = op.get_bind()
+    duplicates = bind.execute(
+        sa.select(
+            activity_in_plan.c.plan_id,
+            activity_in_plan.c.activity_id,
+            sa.func.min(activity_in_plan.c.id),
+            sa.func.sum(sa.func.coalesce(activity_in_plan.c.success_count, 0)),
+            sa.func.max(sa.case((activity_in_plan.c.is_chose == sa.true(), 1), else_=0))
+        )
+        .group_by(activity_in_plan.c.plan_id, activity_in_plan.c.activity_id)
+        .having(sa.func.count() > 1)
+    ).all()
+
+    for plan_id, activity_id, keep_id, success_count, is_chose in duplicates:
+        same_pair = sa.and_(activity_in_plan.c.plan_id == plan_id, activity_in_plan.c.activity_id == activity_id)
+        bind.execute(
+            activity_in_plan.update()
+            .where(activity_in_plan.c.id == keep_id)
+            .values(success_count=success_count, is_chose=bool(is_chose))
+        )
+        bind.execute(activity_in_plan.delete().where(same_pair, activity_in_plan.c.id != keep_id))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("Activity_plan") as batch_op:
+        batch_op.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="0"))
+
+    if not context.is_offline_mode():
+        _merge_duplicate_selections()
+    with op.batch_alter_table("Activity_in_plan") as batch_op:
+        batch_op.create_unique_constraint("uq_activity_in_plan_plan_activity", ["plan_id", "activity_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("Activity_in_plan") as batch_op:
+        batch_op.drop_constraint("uq_activity_in_plan_plan_activity", type_="unique")
+
+    with op.batch_alter_table("Activity_plan") as batch_op:
+        batch_op.drop_column("version")
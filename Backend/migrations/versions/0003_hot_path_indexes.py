@@ -0,0 +1,61 @@
+"""Indexes for the hot lookup paths
+
+- Activity_plan.user_id: unique (one plan per user), used by every plan lookup
+- Activity_in_plan (plan_id, is_chose, activity_id): dashboard / chosen activities
+- Activity_style (lifestyle_id, activity_id): activities by lifestyle
+- User_lifestyle (user_id, lifestyle_id): lifestyles of a user
+
+User.username is already covered by its unique constraint from 0001.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _check_single_plan_per_user() -> None:
+    # ไม่ลบ plan ให้อัตโนมัติ เพราะแต่ละ plan มี Activity_in_plan / success_count ของตัวเอง
+    activity_plan = sa.table("Activity_plan", sa.column("user_id", sa.Integer))
+    user_ids = op.get_bind().execute(
+        sa.select(activity_plan.c.user_id)
+        .where(activity_plan.c.user_id.is_not(None))
+        .group_by(activity_plan.c.user_id)
+        .having(sa.func.count() > 1)
+    ).scalars().all()
+    if user_ids:
+        raise RuntimeError(
+            f"Users with more than one Activity_plan: {user_ids}. "
+            "Merge or delete the extra plans before running this migration."
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not context.is_offline_mode():
+        _check_single_plan_per_user()
+    op.create_index("ix_activity_plan_user_id", "Activity_plan", ["user_id"], unique=True)
+    op.create_index(
+        "ix_activity_in_plan_plan_chose_activity", "Activity_in_plan", ["plan_id", "is_chose", "activity_id"]
+    )
+    op.create_index("ix_activity_style_lifestyle_activity", "Activity_style", ["lifestyle_id", "activity_id"])
+    op.create_index("ix_user_lifestyle_user_lifestyle", "User_lifestyle", ["user_id", "lifestyle_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_user_lifestyle_user_lifestyle", table_name="User_lifestyle")
+    op.drop_index("ix_activity_style_lifestyle_activity", table_name="Activity_style")
+    op.drop_index("ix_activity_in_plan_plan_chose_activity", table_name="Activity_in_plan")
+    op.drop_index("ix_activity_plan_user_id", table_name="Activity_plan")
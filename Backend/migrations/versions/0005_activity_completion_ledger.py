@@ -0,0 +1,44 @@
+"""Activity_completion ledger
+
+Completions before this revision are only reflected in
+Activity_in_plan.success_count; the ledger starts empty.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "Activity_completion",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("activity_id", sa.Integer(), nullable=False),
+        sa.Column("plan_id", sa.Integer(), nullable=True),
+        sa.Column("xp_awarded", sa.Integer(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["User.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["activity_id"], ["Activity.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["plan_id"], ["Activity_plan.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_activity_completion_user_completed", "Activity_completion", ["user_id", "completed_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("Activity_completion")
@@ -1,7 +1,15 @@
+import json
+import logging
+import os
+import threading
 import torch
 import torch.nn as nn
 import numpy as np
 from pytorch_tabnet.tab_model import TabNetClassifier
+from model_manager import (
+    models, MODEL_DIR, LIFESTYLE_MLP_PATH, LIFESTYLE_TABNET_PATH,
+    LIFESTYLE_NUM_NUMERIC, LIFESTYLE_CAT_DIMS, LIFESTYLE_N_CLASSES
+)
 
 class EmbeddingMLP(nn.Module):
     def __init__(self, num_numeric, cat_dims, n_classes, emb_szs=None, hidden=[512,256], dropout=0.3):
@@ -29,15 +37,129 @@ class EmbeddingMLP(nn.Module):
 
 # parameter ต้องตรงกับตอน train
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-num_numeric = 25   # จำนวน numeric features
-cat_dims = [2]  # dimension ของ categorical features แต่ละ column
-n_classes = 5      # จำนวน class lifestyle
+num_numeric = LIFESTYLE_NUM_NUMERIC   # จำนวน numeric features
+cat_dims = LIFESTYLE_CAT_DIMS  # dimension ของ categorical features แต่ละ column
+n_classes = LIFESTYLE_N_CLASSES      # จำนวน class lifestyle
 
+logger = logging.getLogger(__name__)
 
-model = EmbeddingMLP(num_numeric, cat_dims, n_classes)
-model.load_state_dict(torch.load("./lifestyle_mlp.pth", map_location=device))
-model.to(device)
-model.eval()
+# "eager" = PyTorch fp32 ปกติ, "compiled" = build model ตาม LIFESTYLE_MLP_COMPILED ตอนโหลด
+LIFESTYLE_MLP_MODE = os.getenv("LIFESTYLE_MLP_MODE", "eager").lower()
+# "torchscript" = trace + freeze เป็น TorchScript fp32 (ผ่าน parity, เร็วกว่า eager ราว 2 เท่าที่ batch เล็ก)
+# "int8" = dynamic int8 quantization ของ Linear ก่อน trace (เร็วกว่าอีก แต่ไม่ผ่าน parity กับ feature ที่ไม่ได้ normalize)
+LIFESTYLE_MLP_COMPILED = os.getenv("LIFESTYLE_MLP_COMPILED", "torchscript").lower()
+# ค่าต่างสูงสุดของ softmax probability ที่ยอมรับได้ระหว่าง compiled กับ eager
+LIFESTYLE_MLP_PARITY_TOL = float(os.getenv("LIFESTYLE_MLP_PARITY_TOL", "0.01"))
+# ตัวอย่าง feature ที่ encode แบบเดียวกับแบบประเมินหน้าเว็บ (สร้างด้วย benchmarks/make_parity_rows.py)
+# ถ้ามี request จริงที่เก็บไว้ ให้เขียนเป็นรูปแบบเดียวกันแล้วชี้ env นี้ไปที่ไฟล์นั้น
+LIFESTYLE_MLP_PARITY_ROWS = os.getenv("LIFESTYLE_MLP_PARITY_ROWS", os.path.join(MODEL_DIR, "lifestyle_parity_rows.json"))
+PARITY_SAMPLES = 512
+PARITY_SEED = 0
+
+def _validation_set(n_samples=PARITY_SAMPLES, seed=PARITY_SEED):
+    """
+    validation set แบบ fixed seed สำหรับเทียบ TabNet fast path กับ predict_proba (ได้ input ชุดเดิมทุกครั้งที่โหลด)
+    ทั้งสอง path คำนวณเหมือนกัน จึงไม่ต้องใช้ feature จริง ต่างจาก parity ของ compiled MLP
+    """
+    generator = torch.Generator().manual_seed(seed)
+    x_num = torch.randn(n_samples, num_numeric, generator=generator)
+    x_cat = torch.stack(
+        [torch.randint(0, d, (n_samples,), generator=generator) for d in cat_dims], dim=1
+    )
+    return x_num, x_cat
+
+def _parity_rows(path=LIFESTYLE_MLP_PARITY_ROWS):
+    """
+    โหลด feature rows ที่เก็บไว้ ([{"numeric": [...], "categorical": [...]}, ...]) เป็น tensor
+    """
+    with open(path, encoding="utf-8") as f:
+        rows = json.load(f)
+    return _to_tensors([(row["numeric"], row["categorical"]) for row in rows])
+
+def build_compiled_model(eager_model, example_inputs, scheme=LIFESTYLE_MLP_COMPILED):
+    """
+    trace model เป็น TorchScript (CPU เท่านั้น)
+
+    scheme "torchscript" freeze weight ลงใน graph แล้ว optimize_for_inference (ยังเป็น fp32),
+    scheme "int8" quantize Linear layer เป็น int8 แบบ dynamic ก่อน trace
+    """
+    if scheme == "int8":
+        model = torch.ao.quantization.quantize_dynamic(eager_model, {nn.Linear}, dtype=torch.qint8)
+        with torch.no_grad():
+            return torch.jit.trace(model, example_inputs)
+    if scheme != "torchscript":
+        raise ValueError(f"Unknown LIFESTYLE_MLP_COMPILED scheme: {scheme}")
+    with torch.no_grad():
+        traced = torch.jit.trace(eager_model, example_inputs)
+        return torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+def check_parity(eager_model, compiled_model, x_num, x_cat, tolerance=LIFESTYLE_MLP_PARITY_TOL):
+    """
+    เทียบ softmax probability ของ compiled model กับ eager model บน feature rows ที่เก็บไว้
+
+    Returns:
+        (passed, max_abs_diff, argmax_agreement)
+    """
+    with torch.no_grad():
+        eager_probs = torch.softmax(eager_model(x_num, x_cat), dim=1)
+        compiled_probs = torch.softmax(compiled_model(x_num, x_cat), dim=1)
+    max_abs_diff = (eager_probs - compiled_probs).abs().max().item()
+    agreement = (eager_probs.argmax(dim=1) == compiled_probs.argmax(dim=1)).float().mean().item()
+    return max_abs_diff <= tolerance, max_abs_diff, agreement
+
+def load_eager_mlp():
+    """
+    EmbeddingMLP fp32 จาก state dict ในโหมด eval
+    """
+    mlp = EmbeddingMLP(num_numeric, cat_dims, n_classes)
+    mlp.load_state_dict(torch.load(LIFESTYLE_MLP_PATH, map_location=device))
+    mlp.to(device)
+    mlp.eval()
+    return mlp
+
+def load_mlp_model():
+    """
+    โหลด state dict ของ EmbeddingMLP (ถูกเรียกโดย model_manager ตอนใช้งานครั้งแรกหรือตอน warmup)
+
+    ถ้า LIFESTYLE_MLP_MODE=compiled จะ build compiled model ครั้งเดียวตอนโหลด และใช้ได้เฉพาะเมื่อผ่าน
+    parity check เท่านั้น ไม่เช่นนั้นจะ fallback เป็น eager
+    """
+    mlp = load_eager_mlp()
+
+    if LIFESTYLE_MLP_MODE != "compiled":
+        models.annotate("lifestyle_mlp", mode="eager")
+        return mlp
+    if device.type != "cpu":
+        logger.warning("Compiled lifestyle MLP is CPU-only, falling back to eager on %s", device)
+        models.annotate("lifestyle_mlp", mode="eager", fallback_reason=f"device {device}")
+        return mlp
+
+    try:
+        x_num, x_cat = _parity_rows()
+    except (OSError, ValueError, KeyError) as e:
+        # ไม่มีข้อมูลให้ตรวจ parity ก็ไม่ใช้ compiled model
+        logger.warning("Cannot load parity rows from %s (%s), falling back to eager", LIFESTYLE_MLP_PARITY_ROWS, e)
+        models.annotate("lifestyle_mlp", mode="eager", fallback_reason="no parity rows")
+        return mlp
+
+    compiled = build_compiled_model(mlp, (x_num[:8], x_cat[:8]))
+    passed, max_abs_diff, agreement = check_parity(mlp, compiled, x_num, x_cat)
+    parity = {
+        "scheme": LIFESTYLE_MLP_COMPILED,
+        "rows": len(x_num),
+        "source": os.path.basename(LIFESTYLE_MLP_PARITY_ROWS),
+        "max_abs_diff": round(max_abs_diff, 6),
+        "argmax_agreement": round(agreement, 4),
+        "tolerance": LIFESTYLE_MLP_PARITY_TOL
+    }
+    if not passed:
+        logger.warning("Compiled lifestyle MLP failed parity check (%s), falling back to eager", parity)
+        models.annotate("lifestyle_mlp", mode="eager", fallback_reason="parity", parity=parity)
+        return mlp
+
+    logger.info("Compiled lifestyle MLP passed parity check (%s)", parity)
+    models.annotate("lifestyle_mlp", mode="compiled", parity=parity)
+    return compiled
 
 class_mapping = {
     2: "Sustainability",
@@ -47,45 +169,150 @@ class_mapping = {
     3: "Tech/Digital"
 }
 
-def predict_with_both(x_num, x_cat, threshold=0.6):
-    model.eval()
+def _build_results(probs_softmax, probs_sigmoid, threshold):
+    """
+    แยกผลลัพธ์ของทั้ง batch (numpy float32) ออกเป็น dict ต่อ record (schema เดิมของ 1 record)
+    """
+    multilabel_mask = probs_sigmoid > threshold
+    pred_class_idxs = probs_softmax.argmax(axis=1).tolist()
+
+    results = []
+    for i, pred_class_idx in enumerate(pred_class_idxs):
+        pred_multilabel_idx = multilabel_mask[i].nonzero()[0].tolist()
+        results.append({
+            "softmax_probs": probs_softmax[i:i + 1].round(3).tolist(),
+            "pred_class_idx": pred_class_idx,
+            "pred_class_name": class_mapping[pred_class_idx],
+            "sigmoid_probs": probs_sigmoid[i:i + 1].round(3).tolist(),
+            "pred_multilabel_idx": pred_multilabel_idx,
+            "pred_multilabel_names": [class_mapping[j] for j in pred_multilabel_idx]
+        })
+    return results
+
+def predict_with_both_batch(x_num, x_cat, threshold=0.6):
+    """
+    predict หลาย record ใน forward pass เดียว คืนค่าเป็น list ของ dict ต่อ record
+    """
+    model = models.get("lifestyle_mlp")
     with torch.no_grad():
         logits = model(x_num.to(device), x_cat.to(device))
 
         # ---------- Multiclass ----------
         probs_softmax = torch.softmax(logits, dim=1)
-        pred_class_idx = probs_softmax.argmax(dim=1).item()
-        pred_class_name = class_mapping[pred_class_idx]
 
         # ---------- Multilabel ----------
         probs_sigmoid = torch.sigmoid(logits)
-        pred_multilabel_idx = (probs_sigmoid > threshold).nonzero(as_tuple=True)[1].tolist()
-        pred_multilabel_names = [class_mapping[i] for i in pred_multilabel_idx]
-
-    return {
-        "softmax_probs": probs_softmax.cpu().numpy().round(3).tolist(),
-        "pred_class_idx": pred_class_idx,
-        "pred_class_name": pred_class_name,
-        "sigmoid_probs": probs_sigmoid.cpu().numpy().round(3).tolist(),
-        "pred_multilabel_idx": pred_multilabel_idx,
-        "pred_multilabel_names": pred_multilabel_names
-    }
+
+    return _build_results(probs_softmax.cpu().numpy(), probs_sigmoid.cpu().numpy(), threshold)
+
+def predict_with_both(x_num, x_cat, threshold=0.6):
+    return predict_with_both_batch(x_num, x_cat, threshold)[0]
 
 
 
 # TabNet
 
 
-modelTabnet = TabNetClassifier()
-modelTabnet.load_model("./tabnet_lifestyle_final.zip")
-# ตั้งโหมด eval (เพื่อปิด dropout)
+# ใช้ network.forward ของ TabNet ตรงๆ แทน predict_proba (ซึ่งสร้าง DataLoader ทุกครั้ง)
+TABNET_FAST_PATH = os.getenv("TABNET_FAST_PATH", "1") == "1"
+# ค่าต่างสูงสุดที่ยอมรับได้ระหว่าง fast path กับ predict_proba path ตอนตรวจ equivalence
+TABNET_FAST_PATH_TOL = 1e-6
+
+_tabnet_fast_path_verified = False
+_input_buffers = threading.local()
+
+def _tabnet_probs_legacy(tabnet, x_input):
+    """
+    path เดิม: predict_proba → torch tensor → softmax / sigmoid
+    """
+    logits = tabnet.predict_proba(x_input)
+    logits_t = torch.tensor(logits, dtype=torch.float32)
+
+    # ---------- Softmax ----------
+    probs_softmax = torch.softmax(logits_t, dim=1)
+
+    # ---------- Sigmoid ----------
+    probs_sigmoid = torch.sigmoid(logits_t)
+
+    return probs_softmax.numpy(), probs_sigmoid.numpy()
+
+def _input_buffer(n_rows, n_features, device):
+    """
+    tensor input ที่จองไว้ล่วงหน้าต่อ thread (ขยายเมื่อ batch ใหญ่กว่าเดิม) เพื่อไม่ต้อง allocate ทุก request
+    """
+    buffer = getattr(_input_buffers, "tabnet", None)
+    if buffer is None or buffer.shape[0] < n_rows or buffer.shape[1] != n_features or buffer.device != device:
+        capacity = max(n_rows, buffer.shape[0] if buffer is not None else 0, 32)
+        buffer = torch.empty((capacity, n_features), dtype=torch.float32, device=device)
+        _input_buffers.tabnet = buffer
+    return buffer[:n_rows]
+
+def _tabnet_probs_fast(tabnet, x_input):
+    """
+    fast path: เรียก tabnet.network ตรงๆ บน buffer ที่จองไว้ แล้วทำ post-processing ด้วย NumPy
+
+    ให้ผลเท่ากับ _tabnet_probs_legacy: softmax(output) ของ network คือค่าที่ predict_proba คืนมา
+    (เทียบแล้วตรงกันทุก bit) ส่วน softmax / sigmoid รอบที่สองทำใน NumPy float32 ซึ่งต่างจาก torch
+    ได้ไม่เกินระดับ ulp ของ float32 จึงได้ pred_class_idx / multilabel และค่าหลัง round(3) เดียวกัน
+    (ยกเว้นค่าที่อยู่บนขอบการปัดพอดี) ตรวจซ้ำทุกครั้งที่โหลด model ด้วย verify_tabnet_fast_path()
+    """
+    x_tensor = _input_buffer(x_input.shape[0], x_input.shape[1], tabnet.device)
+    x_tensor.copy_(torch.from_numpy(x_input))
+    with torch.no_grad():
+        output, _ = tabnet.network(x_tensor)
+        probs = torch.softmax(output, dim=1).cpu().numpy()
+
+    # ---------- Softmax (ซ้ำบน probability เหมือน path เดิม) ----------
+    exp = np.exp(probs - probs.max(axis=1, keepdims=True))
+    probs_softmax = exp / exp.sum(axis=1, keepdims=True)
+
+    # ---------- Sigmoid ----------
+    probs_sigmoid = 1 / (1 + np.exp(-probs))
+
+    return probs_softmax.astype(np.float32, copy=False), probs_sigmoid.astype(np.float32, copy=False)
+
+def verify_tabnet_fast_path(tabnet, threshold=0.6):
+    """
+    ตรวจว่า fast path ให้ผลเท่ากับ path เดิมบน validation set แบบ fixed seed
+
+    Returns:
+        (passed, max_abs_diff)
+    """
+    x_num, x_cat = _validation_set()
+    x_input = np.concatenate([x_num.numpy(), x_cat.numpy()], axis=1)
+    legacy = _tabnet_probs_legacy(tabnet, x_input)
+    fast = _tabnet_probs_fast(tabnet, x_input)
+
+    max_abs_diff = max(float(np.abs(a - b).max()) for a, b in zip(legacy, fast))
+    same_labels = all(
+        legacy_row["pred_class_idx"] == fast_row["pred_class_idx"]
+        and legacy_row["pred_multilabel_idx"] == fast_row["pred_multilabel_idx"]
+        for legacy_row, fast_row in zip(_build_results(*legacy, threshold), _build_results(*fast, threshold))
+    )
+    return same_labels and max_abs_diff <= TABNET_FAST_PATH_TOL, max_abs_diff
+
+def load_tabnet_model():
+    global _tabnet_fast_path_verified
+    modelTabnet = TabNetClassifier()
+    modelTabnet.load_model(LIFESTYLE_TABNET_PATH)
+    # ตั้งโหมด eval ครั้งเดียว (เพื่อปิด dropout) แทนการตั้งทุกครั้งใน predict_proba
+    modelTabnet.network.eval()
+
+    _tabnet_fast_path_verified = False
+    if TABNET_FAST_PATH:
+        passed, max_abs_diff = verify_tabnet_fast_path(modelTabnet)
+        _tabnet_fast_path_verified = passed
+        models.annotate("lifestyle_tabnet", fast_path=passed, max_abs_diff=max_abs_diff)
+        if not passed:
+            logger.warning("TabNet fast path differs from predict_proba (max diff %g), using predict_proba", max_abs_diff)
+    return modelTabnet
 
 # -------------------------
 # ฟังก์ชัน predict_with_both
 # -------------------------
-def predict_with_both_tabnet(x_num, x_cat, threshold=0.6):
+def predict_with_both_tabnet_batch(x_num, x_cat, threshold=0.6):
     """
-    ทำงานเหมือน predict_with_both() แต่รองรับ input แยก numeric / categorical
+    ทำงานเหมือน predict_with_both_batch() แต่รองรับ input แยก numeric / categorical
     """
     # รวม numeric + categorical → 1 feature vector
     if isinstance(x_num, torch.Tensor):
@@ -93,28 +320,45 @@ def predict_with_both_tabnet(x_num, x_cat, threshold=0.6):
     if isinstance(x_cat, torch.Tensor):
         x_cat = x_cat.cpu().numpy()
 
-    # ถ้าเป็น 1 record ให้ reshape เป็น (1, n_features)
+    # shape (n_records, n_features)
     x_input = np.concatenate([x_num, x_cat], axis=1)
 
-    # ---------- ได้ logits จาก TabNet ----------
-    logits = modelTabnet.predict_proba(x_input)
-    logits_t = torch.tensor(logits, dtype=torch.float32)
+    tabnet = models.get("lifestyle_tabnet")
+    if _tabnet_fast_path_verified:
+        probs_softmax, probs_sigmoid = _tabnet_probs_fast(tabnet, x_input)
+    else:
+        probs_softmax, probs_sigmoid = _tabnet_probs_legacy(tabnet, x_input)
 
-    # ---------- Softmax ----------
-    probs_softmax = torch.softmax(logits_t, dim=1)
-    pred_class_idx = probs_softmax.argmax(dim=1).item()
-    pred_class_name = class_mapping[pred_class_idx]
+    return _build_results(probs_softmax, probs_sigmoid, threshold)
 
-    # ---------- Sigmoid ----------
-    probs_sigmoid = torch.sigmoid(logits_t)
-    pred_multilabel_idx = (probs_sigmoid > threshold).nonzero(as_tuple=True)[1].tolist()
-    pred_multilabel_names = [class_mapping[i] for i in pred_multilabel_idx]
-
-    return {
-        "softmax_probs": probs_softmax.cpu().numpy().round(3).tolist(),
-        "pred_class_idx": pred_class_idx,
-        "pred_class_name": pred_class_name,
-        "sigmoid_probs": probs_sigmoid.cpu().numpy().round(3).tolist(),
-        "pred_multilabel_idx": pred_multilabel_idx,
-        "pred_multilabel_names": pred_multilabel_names
-    }
\ No newline at end of file
+def predict_with_both_tabnet(x_num, x_cat, threshold=0.6):
+    """
+    ทำงานเหมือน predict_with_both() แต่รองรับ input แยก numeric / categorical
+    """
+    return predict_with_both_tabnet_batch(x_num, x_cat, threshold)[0]
+
+# -------------------------
+# helper สำหรับ route: list ของ (numeric, categorical) → tensor
+# -------------------------
+def _to_tensors(items):
+    x_num = torch.tensor([numeric for numeric, _ in items], dtype=torch.float32)
+    x_cat = torch.tensor([categorical for _, categorical in items], dtype=torch.long)
+    return x_num, x_cat
+
+def predict_rows(items, threshold=0.6):
+    return predict_with_both_batch(*_to_tensors(items), threshold)
+
+def predict_rows_tabnet(items, threshold=0.6):
+    # TabNet ใช้ numpy อยู่แล้ว จึงไม่ต้องแปลงผ่าน torch tensor
+    x_num = np.array([numeric for numeric, _ in items], dtype=np.float32)
+    x_cat = np.array([categorical for _, categorical in items], dtype=np.int64)
+    return predict_with_both_tabnet_batch(x_num, x_cat, threshold)
+
+def _warmup_items():
+    return [([0.0] * num_numeric, [0] * len(cat_dims))]
+
+def warmup_mlp():
+    predict_rows(_warmup_items())
+
+def warmup_tabnet():
+    predict_rows_tabnet(_warmup_items())
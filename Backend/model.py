@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Boolean,Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Boolean,Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from database import Base
 import enum
@@ -21,6 +21,8 @@ class User(Base):
     is_success = Column(Boolean, default=False)
     first_success = Column(DateTime, nullable=True)
     login_time = Column(DateTime, nullable=True)
+    # เพิ่มค่าเมื่อต้องการยกเลิก token ทั้งหมดของ user (token ที่มี ver ไม่ตรงจะใช้ไม่ได้)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     lifestyles = relationship("UserLifestyle", back_populates="user")
     activity_plans = relationship("ActivityPlan", back_populates="user")
@@ -38,6 +40,9 @@ class LifestyleCate(Base):
 
 class UserLifestyle(Base):
     __tablename__ = "User_lifestyle"
+    __table_args__ = (
+        Index("ix_user_lifestyle_user_lifestyle", "user_id", "lifestyle_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"))
@@ -63,9 +68,15 @@ class Activity(Base):
 
 class ActivityPlan(Base):
     __tablename__ = "Activity_plan"
+    # user หนึ่งคนมี plan เดียว
+    __table_args__ = (
+        Index("ix_activity_plan_user_id", "user_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"))
+    # เพิ่มทุกครั้งที่ Activity_in_plan ของ plan นี้เปลี่ยน (ใช้ทำ ETag ของ dashboard)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
     user = relationship("User", back_populates="activity_plans")
     activities_in_plan = relationship("ActivityInPlan", back_populates="plan")
@@ -73,6 +84,12 @@ class ActivityPlan(Base):
 
 class ActivityInPlan(Base):
     __tablename__ = "Activity_in_plan"
+    # activity หนึ่งอยู่ใน plan ได้แถวเดียว (ใช้เป็น key ของ upsert ตอนเลือก activity)
+    __table_args__ = (
+        UniqueConstraint("plan_id", "activity_id", name="uq_activity_in_plan_plan_activity"),
+        # dashboard ค้นด้วย plan_id + is_chose แล้วใช้ activity_id ต่อ (covering index)
+        Index("ix_activity_in_plan_plan_chose_activity", "plan_id", "is_chose", "activity_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     plan_id = Column(Integer, ForeignKey("Activity_plan.id", ondelete="CASCADE"))
@@ -86,6 +103,9 @@ class ActivityInPlan(Base):
 
 class ActivityStyle(Base):
     __tablename__ = "Activity_style"
+    __table_args__ = (
+        Index("ix_activity_style_lifestyle_activity", "lifestyle_id", "activity_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     activity_id = Column(Integer, ForeignKey("Activity.id", ondelete="CASCADE"))
@@ -93,3 +113,19 @@ class ActivityStyle(Base):
 
     activity = relationship("Activity", back_populates="styles")
     lifestyle = relationship("LifestyleCate", back_populates="activities")
+
+
+class ActivityCompletion(Base):
+    """Append-only ledger: one row per completed activity"""
+    __tablename__ = "Activity_completion"
+    __table_args__ = (
+        # ประวัติของ user เรียงตามเวลา
+        Index("ix_activity_completion_user_completed", "user_id", "completed_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("User.id", ondelete="CASCADE"), nullable=False)
+    activity_id = Column(Integer, ForeignKey("Activity.id", ondelete="CASCADE"), nullable=False)
+    plan_id = Column(Integer, ForeignKey("Activity_plan.id", ondelete="SET NULL"), nullable=True)
+    xp_awarded = Column(Integer, nullable=False, default=0)
+    completed_at = Column(DateTime, nullable=False)
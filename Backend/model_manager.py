@@ -0,0 +1,217 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# path ของไฟล์ model อ้างอิงจากตำแหน่งของ module ไม่ใช่ cwd ที่รัน uvicorn
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+LIFESTYLE_MLP_PATH = os.path.join(MODEL_DIR, "lifestyle_mlp.pth")
+LIFESTYLE_TABNET_PATH = os.path.join(MODEL_DIR, "tabnet_lifestyle_final.zip")
+STRESS_RF_PATH = os.path.join(MODEL_DIR, "stressLevel_rf.pkl")
+STRESS_SCALER_PATH = os.path.join(MODEL_DIR, "scaler.pkl")
+
+# parameter ต้องตรงกับตอน train
+LIFESTYLE_NUM_NUMERIC = 25   # จำนวน numeric features
+LIFESTYLE_CAT_DIMS = [2]     # dimension ของ categorical features แต่ละ column
+LIFESTYLE_N_CLASSES = 5      # จำนวน class lifestyle
+
+# "all" (ทุก model ที่มีไฟล์ artifact ครบ), "none" หรือรายชื่อ model คั่นด้วย comma
+# model ที่ระบุชื่อไว้ตรงๆ ถือว่าจำเป็น: ถ้าไฟล์ไม่มีหรือ warmup ไม่ผ่าน /ready จะไม่ ready
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "all")
+
+
+class ModelManager:
+    """
+    Load models on first use or during an explicit warmup step
+
+    Each model is registered with a loader (returns the loaded object), an
+    optional warmup function (runs one inference through the model) and
+    the artifact files the loader reads. Loading is guarded per model, so
+    concurrent first requests only load a model once.
+
+    Warmup runs every requested model even when one of them fails and
+    records the outcome per model. Models skipped because their artifacts
+    are missing do not block readiness; models that were requested and
+    failed do.
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._warmups: Dict[str, Optional[Callable[[], Any]]] = {}
+        self._models: Dict[str, Any] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._info: Dict[str, Dict] = {}
+        self._artifacts: Dict[str, Sequence[str]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        # ผล warmup ต่อ model: {"state": "ready" | "failed" | "skipped", "error": ...}
+        self._warmup_results: Dict[str, Dict[str, Optional[str]]] = {}
+        self._ready = False
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        warmup: Optional[Callable[[], Any]] = None,
+        artifacts: Sequence[str] = ()
+    ) -> None:
+        self._loaders[name] = loader
+        self._warmups[name] = warmup
+        self._artifacts[name] = tuple(artifacts)
+        self._locks[name] = threading.Lock()
+
+    def missing_artifacts(self, name: str) -> List[str]:
+        """Artifact files registered for a model that do not exist on disk"""
+        return [path for path in self._artifacts[name] if not os.path.exists(path)]
+
+    def get(self, name: str) -> Any:
+        """
+        Return a loaded model, loading it first if needed
+
+        Args:
+            name: Registered model name
+
+        Returns:
+            The object returned by the model's loader
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._locks[name]:
+            if name not in self._models:
+                started = time.perf_counter()
+                self._models[name] = self._loaders[name]()
+                self._load_seconds[name] = round(time.perf_counter() - started, 3)
+                logger.info("Loaded model %s in %.3fs", name, self._load_seconds[name])
+        return self._models[name]
+
+    def unload(self, name: str) -> None:
+        """Drop a loaded model so the next get() loads it again"""
+        with self._locks[name]:
+            self._models.pop(name, None)
+            self._load_seconds.pop(name, None)
+
+    def annotate(self, name: str, **info: Any) -> None:
+        """Attach load-time details (e.g. inference mode) reported by status()"""
+        self._info.setdefault(name, {}).update(info)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def warmup(self, names: Iterable[str], skip_missing: bool = False) -> None:
+        """
+        Load the given models and run one warmup inference on each
+
+        A failing model is recorded and the remaining models are still
+        warmed up. The manager reports ready once warmup has finished and
+        every model that was not skipped succeeded.
+
+        Args:
+            names: Registered model names to warm up
+            skip_missing: Skip models whose artifacts are missing instead
+                of counting them as failed
+        """
+        all_ready = True
+        for name in names:
+            if name not in self._loaders:
+                self._warmup_results[name] = {"state": "failed", "error": "not a registered model"}
+                logger.error("Model warmup failed for %s: not a registered model", name)
+                all_ready = False
+                continue
+
+            missing = self.missing_artifacts(name)
+            if missing:
+                error = f"missing artifact: {', '.join(missing)}"
+                state = "skipped" if skip_missing else "failed"
+                self._warmup_results[name] = {"state": state, "error": error}
+                logger.warning("Model warmup %s for %s: %s", state, name, error)
+                all_ready = all_ready and skip_missing
+                continue
+
+            try:
+                self.get(name)
+                warmup = self._warmups.get(name)
+                if warmup is not None:
+                    warmup()
+                self._warmup_results[name] = {"state": "ready", "error": None}
+            except Exception as e:
+                self._warmup_results[name] = {"state": "failed", "error": f"{type(e).__name__}: {e}"}
+                logger.exception("Model warmup failed for %s", name)
+                all_ready = False
+        self._ready = all_ready
+
+    def warmup_from_env(self, spec: str = MODEL_WARMUP) -> None:
+        spec = spec.strip().lower()
+        if spec == "none":
+            self.warmup([])
+        elif spec == "all":
+            # "all" = ทุก model ที่ deploy มา: model ที่ไม่มีไฟล์ถูกข้ามพร้อมบันทึกเหตุผล
+            self.warmup(list(self._loaders), skip_missing=True)
+        else:
+            self.warmup([name.strip() for name in spec.split(",") if name.strip()])
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def status(self) -> Dict:
+        per_model = {}
+        for name in self._loaders:
+            result = self._warmup_results.get(name, {"state": "not_warmed", "error": None})
+            per_model[name] = {
+                # model ที่ไม่ได้ warmup (หรือถูกข้าม) แต่ถูกโหลดทีหลังตอนมี request ก็ถือว่าพร้อม
+                "ready": result["state"] == "ready" or (result["state"] != "failed" and self.is_loaded(name)),
+                **result
+            }
+        # ชื่อที่ระบุใน MODEL_WARMUP แต่ไม่ได้ register
+        for name, result in self._warmup_results.items():
+            per_model.setdefault(name, {"ready": False, **result})
+
+        failed = [f"{name}: {m['error']}" for name, m in per_model.items() if m["state"] == "failed"]
+        return {
+            "ready": self._ready,
+            "warmup_error": "; ".join(failed) or None,
+            "models": per_model,
+            "loaded": dict(self._load_seconds),
+            "info": dict(self._info),
+            "registered": list(self._loaders)
+        }
+
+
+def _load_lifestyle_mlp():
+    import ml_model
+    return ml_model.load_mlp_model()
+
+
+def _warmup_lifestyle_mlp():
+    import ml_model
+    ml_model.warmup_mlp()
+
+
+def _load_lifestyle_tabnet():
+    import ml_model
+    return ml_model.load_tabnet_model()
+
+
+def _warmup_lifestyle_tabnet():
+    import ml_model
+    ml_model.warmup_tabnet()
+
+
+def _load_stress_rf():
+    import rf_model
+    return rf_model.load_rf_model()
+
+
+def _warmup_stress_rf():
+    import rf_model
+    rf_model.warmup_rf()
+
+
+models = ModelManager()
+models.register("lifestyle_mlp", _load_lifestyle_mlp, _warmup_lifestyle_mlp, artifacts=[LIFESTYLE_MLP_PATH])
+models.register("lifestyle_tabnet", _load_lifestyle_tabnet, _warmup_lifestyle_tabnet, artifacts=[LIFESTYLE_TABNET_PATH])
+models.register("stress_rf", _load_stress_rf, _warmup_stress_rf, artifacts=[STRESS_RF_PATH, STRESS_SCALER_PATH])
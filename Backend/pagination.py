@@ -0,0 +1,127 @@
+"""
+Keyset (cursor) pagination for list endpoints
+
+List endpoints keep returning the full JSON array by default. Passing
+`limit` and/or `cursor` switches them to pages ordered by id:
+
+    GET ...?limit=100              -> {"items": [...100], "next_cursor": 1234}
+    GET ...?limit=100&cursor=1234  -> items with id > 1234
+
+`next_cursor` is the id of the last item on the page, or null on the last
+page. `stream=true` returns the (optionally cursor/limit bounded) list as
+NDJSON instead, one object per line, see streaming.py.
+"""
+import bisect
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from fast_json import respond
+from streaming import NDJSON_MEDIA_TYPE, STREAM_CHUNK_SIZE, iter_chunks, iter_ndjson
+
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "100"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "1000"))
+
+
+class PageParams(NamedTuple):
+    limit: Optional[int]
+    cursor: Optional[int]
+    stream: bool
+
+    @property
+    def paged(self) -> bool:
+        """True if the client asked for a page instead of the legacy full array"""
+        return self.limit is not None or self.cursor is not None
+
+    @property
+    def page_limit(self) -> int:
+        return self.limit if self.limit is not None else PAGE_DEFAULT_LIMIT
+
+    @property
+    def fetch_limit(self) -> Optional[int]:
+        """Rows to read: one extra to know whether there is a next page, None = everything"""
+        if self.stream:
+            return self.limit
+        return self.page_limit + 1 if self.paged else None
+
+
+def page_params(
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT, description="Page size (enables paging)"),
+    cursor: Optional[int] = Query(None, ge=0, description="next_cursor of the previous page (enables paging)"),
+    stream: bool = Query(False, description="Stream the items as NDJSON")
+) -> PageParams:
+    """Query parameters shared by the paginated list endpoints (use with Depends)"""
+    return PageParams(limit=limit, cursor=cursor, stream=stream)
+
+
+def reject_paging(params: PageParams, reason: str) -> None:
+    """400 for requests that combine paging / streaming with an option that cannot be keyset-ordered"""
+    if params.paged or params.stream:
+        raise HTTPException(status_code=400, detail=reason)
+
+
+def keyset_slice(items: Sequence[Any], key: Callable[[Any], int], cursor: Optional[int], limit: Optional[int]) -> Sequence[Any]:
+    """
+    Items after the cursor from a sequence already sorted by key
+
+    The start is found with bisect (O(log n)), so only the requested window
+    is copied, not the whole sequence.
+
+    Args:
+        items: Sequence sorted by key, e.g. a catalog snapshot
+        key: Function returning an item's id
+        cursor: Return items whose key is greater than this (None = from the start)
+        limit: Maximum number of items (None = all remaining)
+
+    Returns:
+        Slice of items
+    """
+    start = 0 if cursor is None else bisect.bisect_right(items, cursor, key=key)
+    return items[start:] if limit is None else items[start:start + limit]
+
+
+def page_body(items: List[Dict[str, Any]], limit: int, cursor_key: str) -> Dict[str, Any]:
+    """
+    Page payload from up to limit + 1 serialized items
+
+    Args:
+        items: Items after the cursor, at most limit + 1 (the extra one only signals a next page)
+        limit: Page size
+        cursor_key: Item key holding the id used as cursor
+
+    Returns:
+        {"items": [...], "next_cursor": id of the last item or None}
+    """
+    if len(items) > limit:
+        items = items[:limit]
+        return {"items": items, "next_cursor": items[-1][cursor_key]}
+    return {"items": items, "next_cursor": None}
+
+
+def list_response(
+    items: Sequence[Any],
+    params: PageParams,
+    to_dicts: Callable[[Sequence[Any]], List[Dict[str, Any]]],
+    cursor_key: str
+) -> Any:
+    """
+    Legacy array, page or NDJSON stream, depending on params
+
+    Args:
+        items: Items after the cursor, at most params.fetch_limit (see keyset_slice)
+        params: Paging parameters of the request
+        to_dicts: Serializes a chunk of items to JSON-ready dicts
+        cursor_key: Item key holding the id used as cursor
+
+    Returns:
+        Route return value
+    """
+    if params.stream:
+        chunks = (to_dicts(chunk) for chunk in iter_chunks(items, STREAM_CHUNK_SIZE))
+        return StreamingResponse(iter_ndjson(chunks), media_type=NDJSON_MEDIA_TYPE)
+    dicts = to_dicts(items)
+    if params.paged:
+        return respond(page_body(dicts, params.page_limit, cursor_key))
+    return respond(dicts)
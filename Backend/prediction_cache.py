@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Sequence, Tuple
+
+
+class LRUTTLCache:
+    """
+    Bounded in-process cache with LRU eviction and a per-entry TTL
+
+    The cache watches a set of files (e.g. the pickled model) and clears
+    itself as soon as any of them changes on disk, so a redeployed model
+    never serves predictions cached from the old one. on_invalidate is
+    called after such a clear, e.g. to unload the stale model.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        watch_paths: Iterable[str] = (),
+        file_check_interval: float = 1.0,
+        on_invalidate: Optional[Callable[[], Any]] = None
+    ):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl_seconds
+        self.watch_paths = tuple(watch_paths)
+        self.file_check_interval = file_check_interval
+        self.on_invalidate = on_invalidate
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._file_signature = self._read_file_signature()
+        self._next_file_check = time.monotonic() + file_check_interval
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def _read_file_signature(self):
+        signature = []
+        for path in self.watch_paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _check_files(self, now: float) -> None:
+        # stat ไฟล์ไม่เกินทุก file_check_interval วินาที เพื่อไม่ให้เพิ่ม syscall ทุก request
+        if now < self._next_file_check:
+            return
+        self._next_file_check = now + self.file_check_interval
+        signature = self._read_file_signature()
+        if signature != self._file_signature:
+            self._file_signature = signature
+            self.clear()
+            with self._lock:
+                self._invalidations += 1
+            if self.on_invalidate is not None:
+                self.on_invalidate()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a key
+
+        Returns:
+            (found, value); value is None when not found
+        """
+        now = time.monotonic()
+        self._check_files(now)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return False, None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return True, value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        """Drop one entry if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else None,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations
+            }
+
+
+def feature_key(features: Sequence[float], quantum: float = 0.0) -> Tuple[float, ...]:
+    """
+    Normalize a feature vector into a hashable cache key
+
+    Values are cast to float so 7 and 7.0 share an entry. With quantum > 0
+    each value is snapped to the nearest multiple of quantum, so
+    near-identical inputs share an entry too.
+    """
+    if quantum > 0:
+        return tuple(round(float(value) / quantum) * quantum for value in features)
+    return tuple(float(value) for value in features)
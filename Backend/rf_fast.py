@@ -0,0 +1,176 @@
+import numpy as np
+
+
+class FlatForest:
+    """
+    RandomForestClassifier + scaler compiled into contiguous NumPy arrays
+
+    All trees are concatenated into one node table (feature, threshold,
+    left, right, leaf probabilities). Leaves point to themselves, so every
+    tree can be walked for every row in lock-step for max_depth steps
+    without per-estimator dispatch or sklearn input validation.
+
+    The arithmetic mirrors sklearn exactly: scaling in float64, features
+    cast to float32 before comparing with the float64 thresholds, leaf
+    probabilities taken as sklearn's tree would return them, summed in
+    estimator order, then divided by the number of trees. Rows containing
+    NaN or infinity are rejected with ValueError instead of being walked
+    down a default branch.
+    """
+
+    def __init__(self, forest, scaler):
+        if getattr(forest, "n_outputs_", 1) != 1 or not hasattr(forest, "classes_"):
+            raise ValueError("FlatForest only supports single-output classifiers")
+
+        self.classes_ = np.asarray(forest.classes_)
+        self.n_classes = len(self.classes_)
+        self._compile_scaler(scaler)
+
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        node_counts = np.array([tree.node_count for tree in trees], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(node_counts)[:-1]]).astype(np.int64)
+
+        features, thresholds, lefts, rights, leaf_values = [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            node_ids = np.arange(tree.node_count, dtype=np.int64) + offset
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+
+            leaf_values.append(self._leaf_probabilities(tree))
+
+        self.roots = offsets
+        self.feature = np.ascontiguousarray(np.concatenate(features))
+        self.threshold = np.ascontiguousarray(np.concatenate(thresholds))
+        self.left = np.ascontiguousarray(np.concatenate(lefts))
+        self.right = np.ascontiguousarray(np.concatenate(rights))
+        self.leaf_value = np.ascontiguousarray(np.concatenate(leaf_values))
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.n_trees = len(trees)
+
+    def _leaf_probabilities(self, tree) -> np.ndarray:
+        value = tree.value[:, 0, :self.n_classes].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        # sklearn >= 1.4 เก็บ value เป็นสัดส่วนอยู่แล้วและ predict_proba คืนค่าตรง ๆ
+        # การหารซ้ำจะทำให้บิตท้ายต่างจาก sklearn
+        if np.allclose(normalizer, 1.0, rtol=0.0, atol=1e-9):
+            return value
+        # sklearn รุ่นเก่าเก็บเป็นจำนวน sample: normalize ต่อ node แบบเดียวกัน ผลรวม 0 ให้หารด้วย 1
+        normalizer[normalizer == 0.0] = 1.0
+        return value / normalizer
+
+    def _compile_scaler(self, scaler):
+        self._scaler = None
+        self._scale_kind = None
+        name = type(scaler).__name__
+        if name == "StandardScaler":
+            self._scale_kind = "standard"
+            self._mean = None if scaler.mean_ is None or not scaler.with_mean else np.asarray(scaler.mean_, dtype=np.float64)
+            self._scale = None if scaler.scale_ is None or not scaler.with_std else np.asarray(scaler.scale_, dtype=np.float64)
+        elif name == "MinMaxScaler" and not getattr(scaler, "clip", False):
+            self._scale_kind = "minmax"
+            self._scale = np.asarray(scaler.scale_, dtype=np.float64)
+            self._min = np.asarray(scaler.min_, dtype=np.float64)
+        else:
+            # scaler ชนิดอื่นใช้ transform ของ sklearn ตามเดิม
+            self._scaler = scaler
+
+    def transform(self, rows) -> np.ndarray:
+        if self._scaler is not None:
+            return self._scaler.transform(rows)
+
+        X = np.array(rows, dtype=np.float64, ndmin=2)
+        if self._scale_kind == "standard":
+            if self._mean is not None:
+                X -= self._mean
+            if self._scale is not None:
+                X /= self._scale
+        else:
+            X *= self._scale
+            X += self._min
+        return X
+
+    def predict_proba_scaled(self, X) -> np.ndarray:
+        with np.errstate(over="ignore"):
+            X = np.asarray(X, dtype=np.float32)
+        # ปฏิเสธ NaN / inf (รวมค่าที่ใหญ่เกิน float32) เหมือน input validation ของ sklearn; ถ้าไม่ตรวจ NaN จะเดินไปทางขวาทุก node แบบเงียบ ๆ
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity or a value too large for dtype('float32')")
+        n_rows = X.shape[0]
+        rows = np.arange(n_rows)[np.newaxis, :]
+        nodes = np.repeat(self.roots[:, np.newaxis], n_rows, axis=1)  # (n_trees, n_rows)
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        proba = np.zeros((n_rows, self.n_classes), dtype=np.float64)
+        for tree_nodes in nodes:
+            proba += self.leaf_value[tree_nodes]
+        proba /= self.n_trees
+        return proba
+
+    def predict_proba(self, rows) -> np.ndarray:
+        """
+        Scale raw feature rows and return their class probabilities
+
+        Args:
+            rows: Unscaled feature rows, shape (n_rows, n_features)
+
+        Returns:
+            Array of shape (n_rows, n_classes), columns ordered like classes_
+
+        Raises:
+            ValueError: If a row contains NaN or infinity
+        """
+        return self.predict_proba_scaled(self.transform(rows))
+
+    def predict(self, rows) -> np.ndarray:
+        """
+        Scale raw feature rows and predict their classes
+
+        Args:
+            rows: Unscaled feature rows, shape (n_rows, n_features)
+
+        Returns:
+            Array of predicted class labels
+
+        Raises:
+            ValueError: If a row contains NaN or infinity
+        """
+        proba = self.predict_proba(rows)
+        return self.classes_.take(np.argmax(proba, axis=1), axis=0)
+
+
+def probe_rows(scaler, n_rows: int = 2000, seed: int = 0) -> np.ndarray:
+    """
+    Fixed-seed feature rows spread around the scaler's training distribution
+    """
+    rng = np.random.default_rng(seed)
+    n_features = int(scaler.n_features_in_)
+    center, spread = np.zeros(n_features), np.ones(n_features)
+    if hasattr(scaler, "mean_"):
+        if scaler.mean_ is not None:
+            center = np.asarray(scaler.mean_, dtype=np.float64)
+        if scaler.scale_ is not None:
+            spread = np.asarray(scaler.scale_, dtype=np.float64)
+    elif hasattr(scaler, "data_min_"):
+        center = (scaler.data_min_ + scaler.data_max_) / 2
+        spread = np.maximum(scaler.data_range_ / 2, 1e-6)
+
+    rows = rng.normal(center, 2 * spread, size=(n_rows, n_features))
+    # ใส่ค่าจำนวนเต็มด้วย เพราะ input จริงบางตัวเป็น int (platform count, mood score)
+    return np.concatenate([rows, np.round(rows)])
+
+
+def matches_sklearn(flat_forest: FlatForest, forest, scaler, rows=None) -> bool:
+    """
+    Check that FlatForest predicts exactly what scaler.transform + forest.predict does
+    """
+    if rows is None:
+        rows = probe_rows(scaler)
+    expected = forest.predict(scaler.transform(rows))
+    return bool(np.array_equal(flat_forest.predict(rows), expected))
@@ -1,13 +1,81 @@
-import joblib
+import logging
 import os
+import joblib
+from model_manager import models, STRESS_RF_PATH, STRESS_SCALER_PATH
+from prediction_cache import LRUTTLCache, feature_key
+from rf_fast import FlatForest, matches_sklearn
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = STRESS_RF_PATH
+SCALER_PATH = STRESS_SCALER_PATH
+
+RF_CACHE_SIZE = int(os.getenv("RF_CACHE_SIZE", "4096"))
+RF_CACHE_TTL_SECONDS = float(os.getenv("RF_CACHE_TTL_SECONDS", "600"))
+# 0 = key ตรงตัว, > 0 = ปัด feature แต่ละตัวเป็นพหุคูณของค่านี้ก่อนทำ key
+RF_CACHE_QUANTUM = float(os.getenv("RF_CACHE_QUANTUM", "0"))
+# ใช้ FlatForest แทน scaler.transform + rf_model.predict ของ sklearn
+RF_FAST_PATH = os.getenv("RF_FAST_PATH", "1") == "1"
+
+def _compile_fast_path(rf_model, scaler):
+    """
+    compile forest + scaler เป็น FlatForest และใช้ได้เฉพาะเมื่อ predict ตรงกับ sklearn ทุก record
+    บน probe set ไม่เช่นนั้นคืน None (ใช้ sklearn ตามเดิม)
+    """
+    try:
+        flat_forest = FlatForest(rf_model, scaler)
+    except Exception as e:
+        logger.warning("Cannot compile RF fast path, using sklearn: %s", e)
+        models.annotate("stress_rf", fast_path=False, fallback_reason=str(e))
+        return None
+
+    if not matches_sklearn(flat_forest, rf_model, scaler):
+        logger.warning("RF fast path disagrees with sklearn on the probe set, using sklearn")
+        models.annotate("stress_rf", fast_path=False, fallback_reason="mismatch")
+        return None
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "stressLevel_rf.pkl")
-SCALER_PATH = os.path.join(os.path.dirname(__file__), "scaler.pkl")
+    models.annotate("stress_rf", fast_path=True, n_trees=flat_forest.n_trees, max_depth=flat_forest.max_depth)
+    return flat_forest
 
-rf_model = joblib.load(MODEL_PATH)
-scaler = joblib.load(SCALER_PATH)
+def load_rf_model():
+    """
+    โหลด RandomForest และ scaler (ถูกเรียกโดย model_manager ตอนใช้งานครั้งแรกหรือตอน warmup)
+
+    Returns:
+        (rf_model, scaler, flat_forest) โดย flat_forest เป็น None ถ้าไม่ได้ใช้ fast path
+    """
+    rf_model, scaler = joblib.load(MODEL_PATH), joblib.load(SCALER_PATH)
+    flat_forest = _compile_fast_path(rf_model, scaler) if RF_FAST_PATH else None
+    return rf_model, scaler, flat_forest
+
+# ถ้าไฟล์ model/scaler เปลี่ยน cache จะถูกล้างและ model จะถูกโหลดใหม่ในการเรียกครั้งถัดไป
+rf_prediction_cache = LRUTTLCache(
+    max_size=RF_CACHE_SIZE,
+    ttl_seconds=RF_CACHE_TTL_SECONDS,
+    watch_paths=(MODEL_PATH, SCALER_PATH),
+    on_invalidate=lambda: models.unload("stress_rf")
+)
+
+def predict_rf_batch(features_rows: list):
+    rf_model, scaler, flat_forest = models.get("stress_rf")
+    if flat_forest is not None:
+        return [int(prediction) for prediction in flat_forest.predict(features_rows)]
+
+    features_scaled = scaler.transform(features_rows)
+    predictions = rf_model.predict(features_scaled)
+    return [int(prediction) for prediction in predictions]
 
 def predict_rf(features: list):
-    features_scaled = scaler.transform([features])
-    prediction = rf_model.predict(features_scaled)
-    return int(prediction[0])
+    key = feature_key(features, RF_CACHE_QUANTUM)
+    found, prediction = rf_prediction_cache.get(key)
+    if found:
+        return prediction
+
+    # predict จาก key (ค่าหลัง quantize) เพื่อให้ทุก input ที่ได้ key เดียวกันได้ผลเดียวกันเสมอ
+    prediction = predict_rf_batch([list(key)])[0]
+    rf_prediction_cache.put(key, prediction)
+    return prediction
+
+def warmup_rf():
+    _, scaler, _ = models.get("stress_rf")
+    predict_rf_batch([[0.0] * int(scaler.n_features_in_)])
@@ -1,26 +1,44 @@
 from fastapi import APIRouter, Depends, Query,HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel
-from model import Activity, ActivityStyle,User,ActivityPlan,ActivityInPlan,UserLifestyle
+from model import User,ActivityPlan,ActivityInPlan,UserLifestyle
 from database import get_db
 from datetime import datetime
 from typing import Optional,List
+from dashboard_service import bump_plan_version
+from catalog_cache import catalog_cache
+from write_behind import login_time_buffer
+from leaderboard import leaderboard
+from pagination import PageParams, page_params, reject_paging, keyset_slice, list_response
 router = APIRouter()
 
 @router.get("/activityByLifestyleId")
 def get_activities_by_lifestyles(
     db: Session = Depends(get_db),
     # 1. รับค่า lifestyleId เป็น List ของ int จาก query string
-    lifestyle_ids: List[int] = Query(..., alias="lifestyleId", description="List of lifestyle IDs to filter activities")
+    lifestyle_ids: List[int] = Query(..., alias="lifestyleId", description="List of lifestyle IDs to filter activities"),
+    rank: bool = Query(False, description="Order by number of matched lifestyles (most first) and include match_count"),
+    paging: PageParams = Depends(page_params)
 ):
     """
-    Fetches activities by joining with ActivityStyle and filtering by a list of lifestyle IDs.
+    Fetches activities matching any of the given lifestyle IDs.
+
+    Answered from the in-memory lifestyle -> activity index (set union), so each
+    activity appears once even if it matches several requested lifestyles.
+    Supports limit/cursor paging on Activity.id and stream=true (not with rank).
     """
-    # 2. สร้าง query โดย join ตาราง Activity กับ ActivityStyle
-    # 3. Filter (where) เอาเฉพาะรายการที่ ActivityStyle.lifestyle_id อยู่ใน list ที่รับมา
-    activities = db.query(Activity).join(ActivityStyle).filter(ActivityStyle.lifestyle_id.in_(lifestyle_ids)).all()
-    
-    return activities
+    # 2. ใช้ inverted index จาก catalog cache แทนการ join Activity กับ ActivityStyle ทุก request
+    matches = catalog_cache.get(db).activities_for_lifestyles(lifestyle_ids, rank=rank)
+
+    # 3. ถ้า rank=true แนบจำนวน lifestyle ที่ตรงไปด้วย (เรียงตามจำนวนที่ตรง จึงแบ่งหน้าด้วย id ไม่ได้)
+    if rank:
+        reject_paging(paging, "rank cannot be combined with limit, cursor or stream")
+        return [{**activity._asdict(), "match_count": match_count} for activity, match_count in matches]
+
+    # 4. ผลลัพธ์เรียงตาม Activity.id → ตัดหน้าด้วย cursor
+    matches = keyset_slice(matches, lambda match: match[0].id, paging.cursor, paging.fetch_limit)
+    return list_response(matches, paging, lambda chunk: [activity._asdict() for activity, _ in chunk], "id")
 @router.get("/userStressById")
 def get_userlifeStyle_ById(db: Session = Depends(get_db),id:int = 0):
     userStress = db.query(User).filter(User.id == id).first()
@@ -39,7 +57,12 @@ class ActivityPlanResponse(BaseModel):
 def create_activity_plan(plan: ActivityPlanCreate, db: Session = Depends(get_db)):
     new_plan = ActivityPlan(**plan.model_dump())
     db.add(new_plan)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # user หนึ่งคนมี plan ได้เดียว (unique index บน Activity_plan.user_id)
+        db.rollback()
+        raise HTTPException(status_code=409, detail="User already has an activity plan")
     db.refresh(new_plan)
     return new_plan
 
@@ -87,9 +110,15 @@ def create_activity_in_plan(
 
     # 2. เพิ่มข้อมูลทั้งหมดเข้า session ทีเดียว
     db.add_all(new_activities_to_add)
+    db.execute(bump_plan_version(data.plan_id))
 
     # 3. commit เพียงครั้งเดียวเพื่อบันทึกทั้งหมด
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # (plan_id, activity_id) ซ้ำกับที่มีอยู่แล้ว
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Activity already in plan")
 
     # 4. คืนค่าเป็น list ของข้อมูลที่เพิ่งสร้าง
     return new_activities_to_add
@@ -131,6 +160,7 @@ def create_user_lifestyle(
 
     # 3. commit เพียงครั้งเดียว! เพื่อบันทึกข้อมูลทั้งหมดลงฐานข้อมูล
     db.commit()
+    leaderboard.add_lifestyles(data.user_id, data.lifestyle_ids)
 
     # 4. ไม่ต้องใช้ db.refresh() เพราะเมื่อ commit แล้ว SQLAlchemy จะอัปเดต id
     #    ให้กับ object ใน list `created_lifestyles` โดยอัตโนมัติ
@@ -163,6 +193,7 @@ def delete_activities_by_plan_id(plan_id: int, db: Session = Depends(get_db)):
     num_rows_deleted = db.query(ActivityInPlan).filter(
         ActivityInPlan.plan_id == plan_id
     ).delete(synchronize_session=False)
+    db.execute(bump_plan_version(plan_id))
 
     # 4. commit เพื่อยืนยันการลบ
     db.commit()
@@ -190,6 +221,7 @@ def delete_lifestyles_by_user_id(user_id: int, db: Session = Depends(get_db)):
 
     # 3. commit เพื่อยืนยันการลบ
     db.commit()
+    leaderboard.set_lifestyles(user_id, ())
 
     # 4. คืนค่าเป็นข้อความยืนยัน
     return {"detail": f"Successfully deleted {num_rows_deleted} lifestyles for user_id {user_id}"}
@@ -238,6 +270,9 @@ def update_user_details(
     # 3. แปลงข้อมูลที่รับมาจาก Pydantic เป็น dict
     #    ใช้ exclude_unset=True เพื่อเอาเฉพาะ field ที่ client ส่งมาจริงๆ
     update_data = user_data.model_dump(exclude_unset=True)
+    if "login_time" in update_data:
+        # ค่าที่ส่งมาชนะ login_time ที่ยังรอ flush อยู่
+        login_time_buffer.discard(user_id)
 
     # 4. วนลูปเพื่ออัปเดตค่าใน object `db_user`
     for key, value in update_data.items():
@@ -247,6 +282,7 @@ def update_user_details(
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    leaderboard.update_score(db_user.id, db_user.level, db_user.xp)
 
     # 6. คืนค่า User ที่อัปเดตแล้ว
     return db_user
\ No newline at end of file
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
-from all_activities_service import AllActivitiesService
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from all_activities_service import AllActivitiesService, user_activity_option_serializer
+from pagination import PageParams, page_params, list_response
+from schemas import Page, UserActivityOptionOut
 from pydantic import BaseModel
-from typing import List
+from typing import List, Union
 
 router = APIRouter(
     tags=["activities"]
@@ -12,8 +14,12 @@ router = APIRouter(
 class ActivitySelectionUpdate(BaseModel):
     activity_ids: List[int]
 
-@router.get("/user/{user_id}/all")
-async def get_all_activities_for_user(user_id: int, db: Session = Depends(get_db)):
+@router.get("/user/{user_id}/all", response_model=Union[List[UserActivityOptionOut], Page[UserActivityOptionOut]])
+async def get_all_activities_for_user(
+    user_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    paging: PageParams = Depends(page_params)
+):
     """
     Get all activities with indication of which ones the user has selected
     
@@ -21,10 +27,12 @@ async def get_all_activities_for_user(user_id: int, db: Session = Depends(get_db
     - All activities from Activity table
     - is_chosen flag indicating if user has selected it
     - in_plan_id if activity is in user's plan
+    
+    limit / cursor return one page ordered by activity_id, stream=true returns NDJSON.
     """
     try:
-        result = AllActivitiesService.get_all_activities_for_user(user_id, db)
-        return result
+        rows = await AllActivitiesService.get_activity_option_rows(user_id, db, paging.cursor, paging.fetch_limit)
+        return list_response(rows, paging, user_activity_option_serializer.dicts, "activity_id")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching activities: {str(e)}")
 
@@ -33,7 +41,7 @@ async def get_all_activities_for_user(user_id: int, db: Session = Depends(get_db
 async def update_user_activity_selection(
     user_id: int, 
     data: ActivitySelectionUpdate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update user's activity selection
@@ -45,12 +53,12 @@ async def update_user_activity_selection(
     4. Update is_chose to False for unselected activities
     """
     try:
-        result = AllActivitiesService.update_user_activity_selection(
+        result = await AllActivitiesService.update_user_activity_selection(
             user_id, 
             data.activity_ids, 
             db
         )
         return result
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error updating selection: {str(e)}")
\ No newline at end of file
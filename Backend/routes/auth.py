@@ -8,9 +8,20 @@ from database import get_db
 import model
 import schemas
 import security
+from bounded_executor import ExecutorSaturated
+from write_behind import login_time_buffer
+from leaderboard import leaderboard
 
 router = APIRouter()
 
+def _auth_overloaded(e: ExecutorSaturated) -> HTTPException:
+    # bcrypt executor เต็ม → ตอบ 503 ทันทีแทนการให้ request รอคิวจนทุก worker ค้าง
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Authentication is overloaded, retry later: {e}",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/signup", response_model=schemas.UserOut)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # Check if user already exists
@@ -19,13 +30,17 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Username already registered")
     
     # passlib handles encoding, so we pass the raw string
-    hashed_password = security.get_password_hash(user.password)
+    try:
+        hashed_password = security.get_password_hash(user.password)
+    except ExecutorSaturated as e:
+        raise _auth_overloaded(e)
     
     # Create new user
     new_user = model.User(username=user.username, password=hashed_password)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    leaderboard.update_score(new_user.id, new_user.level, new_user.xp, username=new_user.username)
     
     return new_user
 
@@ -35,7 +50,13 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     user = db.query(model.User).filter(model.User.username == form_data.username).first()
     
     # Check user and password
-    if not user or not security.verify_password(form_data.password, user.password):
+    password_ok, new_hash = False, None
+    if user:
+        try:
+            password_ok, new_hash = security.verify_and_update_password(form_data.password, user.password)
+        except ExecutorSaturated as e:
+            raise _auth_overloaded(e)
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -50,27 +71,48 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
         # คำนวณความต่างของวัน (ไม่สนใจเวลา)
         days_difference = (current_login_time.date() - user.first_success.date()).days
 
-        if days_difference == 1:
-            # ถ้าห่างกัน 1 วันพอดี (เมื่อวานทำ วันนี้ล็อกอิน) ให้รีเซ็ตสถานะความสำเร็จของวัน
-            user.is_success = 0
-        elif days_difference >= 2:
-            # ถ้าห่างกัน 2 วันขึ้นไป (ขาดการทำกิจกรรม) ให้รีเซ็ต Streak และสถานะ
+        # เขียนเฉพาะค่าที่เปลี่ยนจริง เพื่อให้รู้ว่า login นี้ต้อง commit ทันทีหรือไม่
+        if days_difference >= 1 and user.is_success:
+            # ห่างกัน 1 วันขึ้นไป (เมื่อวานทำ วันนี้ล็อกอิน) ให้รีเซ็ตสถานะความสำเร็จของวัน
             user.is_success = 0
+        if days_difference >= 2 and user.day_streak:
+            # ถ้าห่างกัน 2 วันขึ้นไป (ขาดการทำกิจกรรม) ให้รีเซ็ต Streak
             user.day_streak = 0
 
-    # อัปเดตเวลาล็อกอินล่าสุดเป็นเวลาประเทศไทย
-    user.login_time = current_login_time
+    # hash เดิมใช้ค่า bcrypt ไม่ตรงกับปัจจุบัน (เช่นเปลี่ยน BCRYPT_ROUNDS) → เก็บ hash ใหม่
+    if new_hash:
+        user.password = new_hash
 
     # Create access token
-    access_token = security.create_access_token(data={"sub": user.username})
+    access_token = security.create_access_token(data=security.token_claims(user))
 
-    db.commit()
+    # อัปเดตเวลาล็อกอินล่าสุดเป็นเวลาประเทศไทย (DB เก็บแบบไม่มี timezone)
+    login_time = current_login_time.replace(tzinfo=None)
+    if db.is_modified(user):
+        # streak / is_success / password เปลี่ยน → commit ทันทีพร้อม login_time
+        user.login_time = login_time
+        db.commit()
+        login_time_buffer.discard(user.id)
+    else:
+        # มีแค่ login_time → เขียนแบบ write-behind (flush เป็น batch ทุก LOGIN_FLUSH_SECONDS)
+        login_time_buffer.record(user.id, login_time)
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=schemas.UserOut)
-def read_users_me(current_user: model.User = Depends(security.get_current_user)):
+def read_users_me(current_user: security.Principal = Depends(security.get_current_user)):
     """
     Get current logged in user.
     """
     return current_user
+
+@router.post("/revoke")
+def revoke_my_tokens(
+    current_user: security.Principal = Depends(security.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Sign out everywhere: every token issued to the current user stops working.
+    """
+    security.revoke_tokens(db, current_user.id)
+    return {"message": "All tokens revoked"}
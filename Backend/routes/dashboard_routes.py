@@ -1,15 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal, get_async_db
 from dashboard_service import DashboardService
-from typing import Dict, List
+from completion_service import CompletionService, CompletionNotFound
+from write_behind import current_login_time
+from leaderboard import leaderboard
+from fast_json import respond
+from pagination import PageParams, page_params, page_body
+from streaming import NDJSON_MEDIA_TYPE, aiter_ndjson
+from schemas import DashboardOut, DashboardActivityOut, Page, PlanActivityOut
+from typing import Dict, List, Optional, Union
 
 router = APIRouter(
     tags=["dashboard"]
 )
 
-@router.get("/{user_id}", response_model=Dict)
-async def get_dashboard(user_id: int, db: Session = Depends(get_db)):
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match ใช้ weak comparison (ตัด W/ ออกก่อนเทียบ)
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+@router.get("/{user_id}", response_model=DashboardOut)
+async def get_dashboard(
+    user_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Get dashboard data for a specific user
     
@@ -18,43 +39,56 @@ async def get_dashboard(user_id: int, db: Session = Depends(get_db)):
     - All chosen activities (where is_chose = 1)
     - Activity count
     
-    The query flow:
+    The query flow (one query):
     User -> Activity_plan -> Activity_in_plan (is_chose=1) -> Activity
+    
+    The response carries a strong ETag; a request whose If-None-Match
+    matches it gets 304 without the activity list being serialized.
     """
     try:
-        dashboard_data = DashboardService.get_dashboard_data(db, user_id)
-        
-        if not dashboard_data['user']:
+        rows = await DashboardService.fetch_dashboard_rows(db, user_id)
+        if not rows:
             raise HTTPException(status_code=404, detail="User not found")
         
-        return dashboard_data
+        etag = DashboardService.dashboard_etag(rows)
+        # no-cache = browser เก็บ cache ได้แต่ต้อง revalidate ด้วย If-None-Match ทุกครั้ง
+        cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=cache_headers)
+        
+        response.headers.update(cache_headers)
+        # respond() คืน Response ที่ serialize แล้ว ซึ่งไม่รับ header จาก response ข้างบน จึงส่ง cache_headers ไปด้วย
+        return respond(DashboardService.build_dashboard_data(rows), headers=cache_headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching dashboard data: {str(e)}")
 
 
-@router.get("/{user_id}/activities", response_model=List[Dict])
-async def get_user_activities(user_id: int, db: Session = Depends(get_db)):
+@router.get("/{user_id}/activities", response_model=List[DashboardActivityOut])
+async def get_user_activities(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get all chosen activities for a user
     """
     try:
-        activities = DashboardService.get_user_activities(db, user_id)
-        return activities
+        activities = await DashboardService.get_user_activities(db, user_id)
+        return respond(activities)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching activities: {str(e)}")
 
 
 @router.get("/{user_id}/user-info", response_model=Dict)
-async def get_user_info(user_id: int, db: Session = Depends(get_db)):
+async def get_user_info(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get user information only
     """
     try:
-        user = DashboardService.get_user_by_id(db, user_id)
+        user = await DashboardService.get_user_by_id(db, user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
+        login_time = current_login_time(user.id, user.login_time)
         return {
             'id': user.id,
             'username': user.username,
@@ -64,30 +98,50 @@ async def get_user_info(user_id: int, db: Session = Depends(get_db)):
             'day_streak': user.day_streak,
             'is_success': user.is_success,
             'first_success': user.first_success,
-            'login_time': user.login_time.isoformat() if user.login_time else None
+            'login_time': login_time.isoformat() if login_time else None
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching user info: {str(e)}")
 
 
+@router.get("/{user_id}/rank", response_model=Dict)
+async def get_user_rank(
+    user_id: int,
+    lifestyle_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    The user's position on the global (or one lifestyle's) leaderboard
+
+    Served from the in-memory leaderboard; users with the same level and
+    xp share a rank.
+    """
+    board = await leaderboard.aget(db)
+    ranked = board.rank(user_id, lifestyle_id)
+    if ranked is None:
+        raise HTTPException(status_code=404, detail="User not ranked")
+    entry, total = ranked
+    return {**entry._asdict(), "total_users": total, "lifestyle_id": lifestyle_id}
+
+
 @router.put("/{user_id}/activity/{activity_id}/toggle")
 async def toggle_activity_choice(
     user_id: int,
     activity_id: int,
     is_chose: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Toggle whether an activity is chosen (0 or 1)
     """
     try:
         # Get user's plan
-        plan = DashboardService.get_activity_plan(db, user_id)
+        plan = await DashboardService.get_activity_plan(db, user_id)
         if not plan:
             raise HTTPException(status_code=404, detail="Activity plan not found")
         
         # Update activity choice
-        success = DashboardService.update_activity_choice(db, plan.id, activity_id, is_chose)
+        success = await DashboardService.update_activity_choice(db, plan.id, activity_id, is_chose)
         
         if not success:
             raise HTTPException(status_code=404, detail="Activity not found in plan")
@@ -103,67 +157,80 @@ async def toggle_activity_choice(
 async def complete_activity(
     user_id: int,
     activity_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Mark an activity as completed
     - Increments success count
     - Awards XP to user
+
+    XP is committed before the response (see CompletionService), so
+    concurrent completions cannot lose XP. The success count goes through
+    the write-behind completion ledger: it is committed in a later flush,
+    trails XP by up to COMPLETION_FLUSH_SECONDS and can be lost if the
+    process crashes before that flush.
     """
     try:
-        # Get user's plan
-        plan = DashboardService.get_activity_plan(db, user_id)
-        if not plan:
-            raise HTTPException(status_code=404, detail="Activity plan not found")
-        
-        # Get activity details
-        activity = DashboardService.get_activity_details(db, activity_id)
-        if not activity:
-            raise HTTPException(status_code=404, detail="Activity not found")
-        
-        # Increment success count
-        success_updated = DashboardService.increment_activity_success(db, plan.id, activity_id)
-        if not success_updated:
-            raise HTTPException(status_code=404, detail="Could not update activity success")
-        
-        # Award XP
-        xp_updated = DashboardService.update_user_xp(db, user_id, activity.base_xp)
-        if not xp_updated:
-            raise HTTPException(status_code=404, detail="Could not update user XP")
+        result = await db.run_sync(
+            CompletionService.complete_activity, user_id, activity_id, require_plan=True
+        )
         
         return {
             "message": "Activity completed successfully",
-            "xp_gained": activity.base_xp
+            "xp_gained": result.xp_gained
         }
+    except CompletionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error completing activity: {str(e)}")
 
 
-@router.get("/plan/{plan_id}/activities")
+@router.get("/plan/{plan_id}/activities", response_model=Union[List[PlanActivityOut], Page[PlanActivityOut]])
 async def get_activities_in_plan(
     plan_id: int,
     chosen_only: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    paging: PageParams = Depends(page_params)
 ):
     """
     Get all activities in a specific plan
+    
+    Ordered by activity_id. limit / cursor return one page,
+    stream=true returns NDJSON read through a server-side cursor.
     """
+    if paging.stream:
+        return StreamingResponse(
+            _stream_plan_activities(plan_id, chosen_only, paging.cursor, paging.limit),
+            media_type=NDJSON_MEDIA_TYPE
+        )
     try:
-        activities = DashboardService.get_activities_in_plan(db, plan_id, chosen_only)
-        return activities
+        activities = await DashboardService.get_activities_in_plan(
+            db, plan_id, chosen_only, paging.cursor, paging.fetch_limit
+        )
+        if paging.paged:
+            return respond(page_body(activities, paging.page_limit, "activity_id"))
+        return respond(activities)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching plan activities: {str(e)}")
 
 
+async def _stream_plan_activities(plan_id: int, chosen_only: bool, cursor: Optional[int], limit: Optional[int]):
+    # เปิด session ของตัวเอง เพราะ cursor ต้องเปิดอยู่จนส่ง response ครบ
+    async with AsyncSessionLocal() as db:
+        chunks = DashboardService.stream_activities_in_plan(db, plan_id, chosen_only, cursor, limit)
+        async for lines in aiter_ndjson(chunks):
+            yield lines
+
+
 @router.post("/{user_id}/streak/increment")
-async def increment_streak(user_id: int, db: Session = Depends(get_db)):
+async def increment_streak(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Increment user's day streak
     """
     try:
-        success = DashboardService.update_user_streak(db, user_id, increment=True)
+        success = await DashboardService.update_user_streak(db, user_id, increment=True)
         if not success:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -175,12 +242,12 @@ async def increment_streak(user_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/{user_id}/streak/reset")
-async def reset_streak(user_id: int, db: Session = Depends(get_db)):
+async def reset_streak(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Reset user's day streak to 0
     """
     try:
-        success = DashboardService.update_user_streak(db, user_id, increment=False)
+        success = await DashboardService.update_user_streak(db, user_id, increment=False)
         if not success:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from database import get_db
+from leaderboard import leaderboard, LEADERBOARD_MAX_LIMIT
+
+router = APIRouter()
+
+@router.get("/leaderboard")
+def get_leaderboard(
+    limit: int = Query(10, ge=1, le=LEADERBOARD_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    lifestyle_id: Optional[int] = Query(None, description="Rank only users with this lifestyle"),
+    db: Session = Depends(get_db)
+):
+    """
+    Top users by level, then xp (served from the in-memory leaderboard)
+    """
+    entries = leaderboard.get(db).top(limit=limit, offset=offset, lifestyle_id=lifestyle_id)
+    return [entry._asdict() for entry in entries]
@@ -1,11 +1,15 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from model import LifestyleCate
 from database import get_db
+from catalog_cache import catalog_cache
+from pagination import PageParams, page_params, keyset_slice, list_response
+from operator import attrgetter
 
 router = APIRouter()
 
 @router.get("/lifestyle_cate")
-def read_lifestyle_cate(db: Session = Depends(get_db)):
-    return db.query(LifestyleCate).all()
+def read_lifestyle_cate(db: Session = Depends(get_db), paging: PageParams = Depends(page_params)):
+    # lifestyle ใน catalog เรียงตาม id อยู่แล้ว จึงใช้ id เป็น cursor ได้เลย
+    lifestyles = keyset_slice(catalog_cache.get(db).lifestyles, attrgetter("id"), paging.cursor, paging.fetch_limit)
+    return list_response(lifestyles, paging, lambda chunk: [lifestyle._asdict() for lifestyle in chunk], "id")
 
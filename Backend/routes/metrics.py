@@ -0,0 +1,51 @@
+from fastapi import APIRouter
+from inference_batcher import batcher_stats
+from rf_model import rf_prediction_cache
+from db_metrics import pool_stats
+from catalog_cache import catalog_cache
+from security import principal_cache, password_executor
+from write_behind import write_behind_buffers
+from leaderboard import leaderboard
+
+router = APIRouter()
+
+@router.get("/inference")
+def get_inference_metrics():
+    """
+    Batch-size and queue-wait histograms of the prediction batchers
+    """
+    return batcher_stats()
+
+@router.get("/cache")
+def get_cache_metrics():
+    """
+    Hit/miss counters of the in-process prediction, catalog and principal caches, plus leaderboard size
+    """
+    return {
+        "predict_rf": rf_prediction_cache.stats(),
+        "catalog": catalog_cache.stats(),
+        "principals": principal_cache.stats(),
+        "leaderboard": leaderboard.stats()
+    }
+
+@router.get("/db")
+def get_db_metrics():
+    """
+    Connection pool state, checkout wait times and invalidations of both engines
+    """
+    return pool_stats()
+
+
+@router.get("/auth")
+def get_auth_metrics():
+    """
+    Load of the bcrypt executor (in flight, completed, rejected, timed out)
+    """
+    return password_executor.stats()
+
+@router.get("/write-behind")
+def get_write_behind_metrics():
+    """
+    Pending and flushed counts of the write-behind buffers
+    """
+    return {buffer.name: buffer.stats() for buffer in write_behind_buffers}
\ No newline at end of file
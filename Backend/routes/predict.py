@@ -1,22 +1,109 @@
-from fastapi import APIRouter
-import torch
-import numpy as np
-from ml_model import predict_with_both,predict_with_both_tabnet
+import math
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List
+from model_manager import LIFESTYLE_NUM_NUMERIC, LIFESTYLE_CAT_DIMS
+from inference_batcher import MicroBatcher, inference_executor
+from bounded_executor import ExecutorSaturated
+from streaming import NDJSON_MEDIA_TYPE, iter_scored_ndjson, score_records
 
 router = APIRouter()
 
+class LifestyleFeatures(BaseModel):
+    numeric: List[float]
+    categorical: List[int]
+
+class LifestyleBatchInput(BaseModel):
+    records: List[LifestyleFeatures]
+
+def _feature_error(numeric, categorical):
+    if not isinstance(numeric, list) or len(numeric) != LIFESTYLE_NUM_NUMERIC:
+        return f"'numeric' must be a list of {LIFESTYLE_NUM_NUMERIC} values"
+    if not isinstance(categorical, list) or len(categorical) != len(LIFESTYLE_CAT_DIMS):
+        return f"'categorical' must be a list of {len(LIFESTYLE_CAT_DIMS)} values"
+    # bool เป็น subclass ของ int จึงต้องตัดออกเอง
+    for i, value in enumerate(numeric):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return f"'numeric[{i}]' must be a finite number"
+    for i, (value, dim) in enumerate(zip(categorical, LIFESTYLE_CAT_DIMS)):
+        if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < dim:
+            return f"'categorical[{i}]' must be an integer in [0, {dim})"
+    return None
+
+def _parse_features(features: dict):
+    numeric = features.get("numeric")
+    categorical = features.get("categorical")
+    # ตรวจ shape และช่วงค่าต่อ request ก่อนเข้า batch เพื่อไม่ให้ record เดียวที่ผิดทำให้ทั้ง batch fail
+    error = _feature_error(numeric, categorical)
+    if error:
+        raise HTTPException(status_code=422, detail=error)
+    return numeric, categorical
+
+# import ml_model ตอนใช้งานจริง เพื่อไม่ให้ torch/TabNet ถูกโหลดตอน import main
+def _predict_mlp_batch(items):
+    from ml_model import predict_rows
+    return predict_rows(items)
+
+def _predict_tabnet_batch(items):
+    from ml_model import predict_rows_tabnet
+    return predict_rows_tabnet(items)
+
+def _bulk_scorer(predict_batch):
+    """
+    คืนฟังก์ชันที่ score ทั้ง chunk ใน inference executor โดย record ที่ shape หรือค่าผิดจะได้ error แทน
+    """
+    def score_chunk(records: List[LifestyleFeatures]):
+        results = [None] * len(records)
+        valid_idx, valid_items = [], []
+        for i, record in enumerate(records):
+            error = _feature_error(record.numeric, record.categorical)
+            if error:
+                results[i] = {"error": error}
+            else:
+                valid_idx.append(i)
+                valid_items.append((record.numeric, record.categorical))
+
+        if valid_items:
+            # รันใน executor เดียวกับ MicroBatcher เพื่อให้ bulk กับ single request แชร์ limit ของ CPU ร่วมกัน
+            scored = inference_executor.run_sync(score_records, predict_batch, valid_items)
+            for i, result in zip(valid_idx, scored):
+                results[i] = result
+        return results
+    return score_chunk
+
+mlp_batcher = MicroBatcher("predictLifeStyle", _predict_mlp_batch)
+tabnet_batcher = MicroBatcher("predictLifeStyleTabnet", _predict_tabnet_batch)
+
+async def _submit(batcher: MicroBatcher, features: dict):
+    try:
+        return await batcher.submit(_parse_features(features))
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=f"Inference is overloaded, retry later: {e}")
+
 @router.post('/predictLifeStyle')
 async def predict(features:dict):
-    x_num = torch.tensor([features["numeric"]],dtype=torch.float32)
-    x_cat = torch.tensor([features["categorical"]],dtype=torch.long)
-
-    probs = predict_with_both(x_num,x_cat)
+    probs = await _submit(mlp_batcher, features)
     return probs
 
 @router.post('/predictLifeStyleTabnet')
-async def predict(features:dict):
-    x_num = torch.tensor([features["numeric"]],dtype=torch.float32)
-    x_cat = torch.tensor([features["categorical"]],dtype=torch.long)
-    # เรียกฟังก์ชัน predict
-    probs = predict_with_both_tabnet(x_num, x_cat)
-    return probs
\ No newline at end of file
+async def predict_tabnet(features:dict):
+    # เรียกฟังก์ชัน predict ผ่าน batcher (รวม request ที่เข้ามาพร้อมกันเป็น forward pass เดียว)
+    probs = await _submit(tabnet_batcher, features)
+    return probs
+
+@router.post('/predictLifeStyle/batch')
+def predict_batch(data: LifestyleBatchInput):
+    """
+    Score N records with the MLP in vectorized chunks, streamed back as NDJSON
+    """
+    lines = iter_scored_ndjson(data.records, _bulk_scorer(_predict_mlp_batch))
+    return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE)
+
+@router.post('/predictLifeStyleTabnet/batch')
+def predict_tabnet_batch(data: LifestyleBatchInput):
+    """
+    Score N records with TabNet in vectorized chunks, streamed back as NDJSON
+    """
+    lines = iter_scored_ndjson(data.records, _bulk_scorer(_predict_tabnet_batch))
+    return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE)
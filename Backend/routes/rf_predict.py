@@ -1,6 +1,11 @@
-from fastapi import APIRouter
+import math
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from rf_model import predict_rf
+from typing import List
+from rf_model import predict_rf, predict_rf_batch
+from inference_batcher import inference_executor
+from streaming import NDJSON_MEDIA_TYPE, iter_scored_ndjson, score_records
 
 router = APIRouter()
 
@@ -11,14 +16,62 @@ class RFInput(BaseModel):
     sleep_hours: float
     mood_score: int
 
-@router.post("/predict_rf")
-def predict_rf_route(data: RFInput):
-    features = [
+class RFBatchInput(BaseModel):
+    records: List[RFInput]
+
+def _to_features(data: RFInput):
+    return [
         data.screen_time_hours,
         data.social_media_platforms_used,
         data.hours_on_TikTok,
         data.sleep_hours,
         data.mood_score
     ]
+
+def _feature_error(data: RFInput):
+    # pydantic รับ float "NaN" / "Infinity" ได้ ต้องตัดออกเองก่อนเข้า model
+    for name, value in data.model_dump().items():
+        if not math.isfinite(value):
+            return f"'{name}' must be a finite number"
+    return None
+
+def _predict_rf_records(rows):
+    return [{"stress_level_class": prediction} for prediction in predict_rf_batch(rows)]
+
+def _score_rf_chunk(records: List[RFInput]):
+    """
+    score ทั้ง chunk ใน inference executor โดย record ที่ค่าผิดจะได้ error แทน (เหมือน bulk ของ MLP)
+    """
+    results = [None] * len(records)
+    valid_idx, valid_rows = [], []
+    for i, record in enumerate(records):
+        error = _feature_error(record)
+        if error:
+            results[i] = {"error": error}
+        else:
+            valid_idx.append(i)
+            valid_rows.append(_to_features(record))
+
+    if valid_rows:
+        # executor เดียวกับ MLP / TabNet เพื่อให้ bulk ทุกแบบแชร์ limit ของ CPU ร่วมกัน
+        scored = inference_executor.run_sync(score_records, _predict_rf_records, valid_rows)
+        for i, result in zip(valid_idx, scored):
+            results[i] = result
+    return results
+
+@router.post("/predict_rf")
+def predict_rf_route(data: RFInput):
+    error = _feature_error(data)
+    if error:
+        raise HTTPException(status_code=422, detail=error)
+    features = _to_features(data)
     result = predict_rf(features)
     return {"stress_level_class": result}
+
+@router.post("/predict_rf/batch")
+def predict_rf_batch_route(data: RFBatchInput):
+    """
+    Score N records in vectorized chunks, streamed back as NDJSON
+    """
+    lines = iter_scored_ndjson(data.records, _score_rf_chunk)
+    return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE)
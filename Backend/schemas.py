@@ -1,5 +1,8 @@
 from pydantic import BaseModel
-from typing import Optional
+from datetime import datetime
+from typing import Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
 
 class UserCreate(BaseModel):
     username: str
@@ -14,4 +17,59 @@ class UserOut(BaseModel):
 
 class Token(BaseModel):
     access_token: str
-    token_type: str
\ No newline at end of file
+    token_type: str
+
+class DashboardActivityOut(BaseModel):
+    activity_id: int
+    activity_name: str
+    base_time: Optional[int] = None
+    base_xp: Optional[int] = None
+    activity_type: Optional[str] = None
+    description: Optional[str] = None
+    success_count: Optional[int] = None
+    is_chose: Optional[bool] = None
+    plan_id: int
+    user_id: Optional[int] = None
+
+class DashboardUserOut(BaseModel):
+    id: int
+    username: str
+    stress_level: Optional[int] = None
+    xp: Optional[int] = None
+    level: Optional[int] = None
+    day_streak: Optional[int] = None
+    is_success: Optional[bool] = None
+    first_success: Optional[datetime] = None
+    login_time: Optional[datetime] = None
+
+class DashboardOut(BaseModel):
+    user: Optional[DashboardUserOut] = None
+    activities: List[DashboardActivityOut]
+    activity_count: int
+
+class PlanActivityOut(BaseModel):
+    id: int
+    plan_id: Optional[int] = None
+    activity_id: Optional[int] = None
+    success_count: Optional[int] = None
+    is_chose: Optional[bool] = None
+    activity_name: str
+    base_time: Optional[int] = None
+    base_xp: Optional[int] = None
+    activity_type: Optional[str] = None
+    description: Optional[str] = None
+
+class UserActivityOptionOut(BaseModel):
+    activity_id: int
+    activity_name: str
+    base_time: Optional[int] = None
+    base_xp: Optional[int] = None
+    activity_type: Optional[str] = None
+    description: Optional[str] = None
+    is_chosen: Optional[bool] = None
+    in_plan_id: Optional[int] = None
+
+class Page(BaseModel, Generic[T]):
+    """One page of a keyset-paginated list (see pagination.py)"""
+    items: List[T]
+    next_cursor: Optional[int] = None
@@ -3,28 +3,95 @@ from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
+from typing import NamedTuple, Optional, Tuple
 import os
 
+from bounded_executor import BoundedExecutor
 from database import get_db
+from prediction_cache import LRUTTLCache
 import model
 
 # --- Password Hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# เปลี่ยน BCRYPT_ROUNDS ได้ตลอด hash เดิมจะถูก rehash ด้วยค่าใหม่ตอน login สำเร็จครั้งถัดไป
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt กิน CPU มาก จึงรันใน executor แยกที่จำกัดจำนวน thread และความยาวคิว
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "32"))
+BCRYPT_QUEUE_TIMEOUT_MS = float(os.getenv("BCRYPT_QUEUE_TIMEOUT_MS", "1000"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    # min = max = default ทำให้ hash ที่ rounds ไม่ตรงกับค่าปัจจุบัน (ทั้งมากกว่าและน้อยกว่า) ถูก rehash
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+password_executor = BoundedExecutor(
+    "bcrypt",
+    max_workers=BCRYPT_WORKERS,
+    max_pending=BCRYPT_MAX_PENDING,
+    queue_timeout=BCRYPT_QUEUE_TIMEOUT_MS / 1000
+)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    """
+    Check a password against its hash in the bcrypt executor
+
+    Raises:
+        ExecutorSaturated: Too many hashes queued; callers should answer 503
+    """
+    return password_executor.run_sync(pwd_context.verify, plain_password, hashed_password)
+
+def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password and rehash it if it was hashed with other settings (e.g. BCRYPT_ROUNDS)
+
+    Returns:
+        (valid, new_hash); new_hash is None unless the stored hash should be replaced
+
+    Raises:
+        ExecutorSaturated: Too many hashes queued; callers should answer 503
+    """
+    return password_executor.run_sync(pwd_context.verify_and_update, plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    """
+    Hash a password in the bcrypt executor
+
+    Raises:
+        ExecutorSaturated: Too many hashes queued; callers should answer 503
+    """
+    return password_executor.run_sync(pwd_context.hash, password)
 
 # --- JWT Token ---
 SECRET_KEY = os.getenv("SECRET_KEY", "a_very_secret_key_that_should_be_in_env_for_production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# token ที่ตรวจแล้วถูกเก็บไว้ใน process นี้ไม่เกิน PRINCIPAL_CACHE_TTL_SECONDS
+# การ revoke จาก process อื่นจึงมีผลช้าสุดเท่านี้
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
+class Principal(NamedTuple):
+    """The authenticated user as seen by route handlers"""
+    id: int
+    username: str
+
+
+# user_id -> (token_version, Principal)
+principal_cache = LRUTTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
+
+def token_claims(user: model.User) -> dict:
+    """Claims to put in an access token: username, user id and token version"""
+    return {"sub": user.username, "uid": user.id, "ver": user.token_version or 0}
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -32,7 +99,24 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> model.User:
+def _load_principal(db: Session, user_id: Optional[int], username: Optional[str]):
+    query = select(model.User.id, model.User.username, model.User.token_version)
+    if user_id is not None:
+        query = query.where(model.User.id == user_id)
+    else:
+        query = query.where(model.User.username == username)
+    return db.execute(query).first()
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """
+    Validate the bearer token and return the user it belongs to
+
+    Tokens carry the user id (uid) and the user's token_version (ver).
+    Verified principals are cached per user id, so repeated requests skip
+    the database until the cache entry expires. A token whose ver does not
+    match the user's current token_version is rejected. Tokens issued
+    before uid/ver existed are still accepted via a username lookup.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -43,10 +127,46 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
+        user_id = payload.get("uid")
+        token_version = payload.get("ver")
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(model.User).filter(model.User.username == username).first()
-    if user is None:
+
+    if user_id is not None:
+        found, cached = principal_cache.get(user_id)
+        if found:
+            cached_version, principal = cached
+            if cached_version == token_version:
+                return principal
+
+    row = _load_principal(db, user_id, username)
+    if row is None:
+        raise credentials_exception
+    current_version = row.token_version or 0
+    if user_id is not None and token_version != current_version:
         raise credentials_exception
-    return user
\ No newline at end of file
+
+    principal = Principal(id=row.id, username=row.username)
+    principal_cache.put(row.id, (current_version, principal))
+    return principal
+
+def revoke_tokens(db: Session, user_id: int) -> bool:
+    """
+    Invalidate every access token issued to a user so far
+
+    Bumps User.token_version and drops the user's cached principal in this
+    process; other processes stop accepting the old tokens once their
+    cache entry expires (PRINCIPAL_CACHE_TTL_SECONDS).
+
+    Returns:
+        True if the user exists
+    """
+    result = db.execute(
+        update(model.User)
+        .where(model.User.id == user_id)
+        .values(token_version=model.User.token_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    principal_cache.pop(user_id)
+    return result.rowcount > 0
@@ -0,0 +1,94 @@
+import os
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Sequence
+
+import fast_json
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+PREDICT_BULK_CHUNK_SIZE = int(os.getenv("PREDICT_BULK_CHUNK_SIZE", "512"))
+# จำนวน row ต่อ chunk ของ list ที่ stream (ใช้เป็น yield_per ของ server-side cursor ด้วย)
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "500"))
+
+
+def iter_chunks(items: Sequence[Any], chunk_size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+def score_records(predict_batch: Callable[[Sequence[Any]], List[Any]], items: Sequence[Any]) -> List[Any]:
+    """
+    Score a chunk in one vectorized call, falling back to one call per item
+
+    If the batch call raises, every item is scored on its own so only the
+    items that actually fail get an {"error": ...} result.
+    """
+    try:
+        return predict_batch(items)
+    except Exception:
+        results = []
+        for item in items:
+            try:
+                results.append(predict_batch([item])[0])
+            except Exception as e:
+                results.append({"error": str(e)})
+        return results
+
+
+def iter_scored_ndjson(
+    records: Sequence[Any],
+    score_chunk: Callable[[Sequence[Any]], List[Any]],
+    chunk_size: int = PREDICT_BULK_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Score records chunk by chunk and yield one NDJSON line per record
+
+    Only one chunk of results is alive at a time, so memory stays flat no
+    matter how many records are streamed. Every line carries the record's
+    position in the request as "index". score_chunk is expected to report
+    per-record failures itself; if it raises anyway (e.g. the inference
+    executor is saturated), each record of that chunk gets an "error" line
+    instead of aborting the stream.
+
+    Args:
+        records: Request records, in order
+        score_chunk: Function returning one JSON-serializable result per record
+        chunk_size: Number of records scored per vectorized call
+
+    Yields:
+        NDJSON lines (compact JSON bytes)
+    """
+    offset = 0
+    for chunk in iter_chunks(records, max(1, chunk_size)):
+        try:
+            results = score_chunk(chunk)
+        except Exception as e:
+            results = [{"error": str(e)}] * len(chunk)
+
+        for i, result in enumerate(results):
+            line = result if isinstance(result, dict) else {"result": result}
+            yield fast_json.dumps({"index": offset + i, **line}) + b"\n"
+        offset += len(chunk)
+
+
+
+def ndjson_lines(items: Iterable[Dict[str, Any]]) -> bytes:
+    """One NDJSON line per item, as a single bytes chunk"""
+    return b"".join(fast_json.dumps(item) + b"\n" for item in items)
+
+
+def iter_ndjson(chunks: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """
+    NDJSON body from chunks of serialized items
+
+    Each chunk becomes one write, so at most one chunk of items and its
+    JSON are alive at a time.
+    """
+    for chunk in chunks:
+        if chunk:
+            yield ndjson_lines(chunk)
+
+
+async def aiter_ndjson(chunks: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """Async variant of iter_ndjson() for chunks read from a server-side cursor"""
+    async for chunk in chunks:
+        if chunk:
+            yield ndjson_lines(chunk)
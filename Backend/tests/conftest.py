@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# database.py สร้าง engine ตอน import: ชี้ไปที่ SQLite ชั่วคราวก่อน import module ใดๆ ของแอป
+TEST_DB_DIR = tempfile.mkdtemp(prefix="realworld_xp_tests_")
+TEST_DB_PATH = os.path.join(TEST_DB_DIR, "app.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB_PATH}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{TEST_DB_PATH}"
+
+from sqlalchemy import event  # noqa: E402
+
+import database  # noqa: E402
+
+
+@event.listens_for(database.engine, "connect")
+def _sqlite_busy_timeout(dbapi_connection, connection_record):
+    # ให้ connection ที่ชนกันรอ lock ของ SQLite แทนที่จะ error "database is locked" ทันที
+    dbapi_connection.execute("PRAGMA busy_timeout=30000")
+
+
+@pytest.fixture
+def db_schema():
+    """Fresh tables in the test SQLite database for one test"""
+    # import ผ่าน model เพื่อให้ table ทั้งหมดถูกลงทะเบียนกับ Base.metadata แล้ว
+    from model import Base
+    Base.metadata.create_all(database.engine)
+    yield
+    database.engine.dispose()
+    Base.metadata.drop_all(database.engine)
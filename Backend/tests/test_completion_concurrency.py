@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+import database
+from catalog_cache import catalog_cache
+from completion_service import XP_PER_LEVEL, CompletionService
+from model import Activity, ActivityCompletion, ActivityInPlan, ActivityPlan, User
+from write_behind import completion_ledger
+
+THREADS = 8
+COMPLETIONS_PER_THREAD = 25
+ACTIVITY_XP = {1: 7, 2: 13}
+
+
+@pytest.fixture
+def seeded(db_schema):
+    catalog_cache.invalidate()
+    db = database.SessionLocal()
+    db.add(User(id=1, username="runner", password="x", xp=0, level=1, day_streak=0, is_success=False, stress_level=5))
+    for activity_id, base_xp in ACTIVITY_XP.items():
+        db.add(Activity(id=activity_id, name=f"activity {activity_id}", base_xp=base_xp))
+    db.add(ActivityPlan(id=1, user_id=1))
+    for activity_id in ACTIVITY_XP:
+        db.add(ActivityInPlan(plan_id=1, activity_id=activity_id, success_count=0, is_chose=True))
+    db.commit()
+    db.close()
+    yield
+    completion_ledger.flush()
+    catalog_cache.invalidate()
+
+
+def _complete_many(thread_index, errors):
+    db = database.SessionLocal()
+    try:
+        for i in range(COMPLETIONS_PER_THREAD):
+            activity_id = 1 if (thread_index + i) % 2 == 0 else 2
+            CompletionService.complete_activity(db, 1, activity_id, require_plan=True)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        db.close()
+
+
+def test_concurrent_completions_keep_xp_and_success_counts(seeded):
+    # SQLite ไม่รองรับ SELECT ... FOR UPDATE: test นี้ครอบคลุมเฉพาะ guarded UPDATE + retry
+    # ไม่ได้ทดสอบ row lock ของ MySQL (ใช้ benchmarks/bench_completions.py --database-url กับ MySQL แทน)
+    # ส่วน completions/s ก่อน/หลัง วัดด้วย benchmarks/bench_completions.py
+    errors = []
+    threads = [threading.Thread(target=_complete_many, args=(t, errors)) for t in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    completion_ledger.flush()
+
+    expected_counts = {activity_id: 0 for activity_id in ACTIVITY_XP}
+    for t in range(THREADS):
+        for i in range(COMPLETIONS_PER_THREAD):
+            expected_counts[1 if (t + i) % 2 == 0 else 2] += 1
+    total_xp = sum(ACTIVITY_XP[activity_id] * count for activity_id, count in expected_counts.items())
+
+    db = database.SessionLocal()
+    try:
+        user = db.get(User, 1)
+        assert (user.level, user.xp) == (1 + total_xp // XP_PER_LEVEL, total_xp % XP_PER_LEVEL)
+
+        success_counts = {row.activity_id: row.success_count for row in db.query(ActivityInPlan).all()}
+        assert success_counts == expected_counts
+        assert db.query(ActivityCompletion).count() == THREADS * COMPLETIONS_PER_THREAD
+    finally:
+        db.close()
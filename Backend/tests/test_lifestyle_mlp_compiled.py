@@ -0,0 +1,39 @@
+import pytest
+import torch
+
+import ml_model
+
+
+@pytest.fixture(scope="module")
+def eager_mlp():
+    return ml_model.load_eager_mlp()
+
+
+@pytest.fixture(scope="module")
+def parity_rows():
+    return ml_model._parity_rows()
+
+
+def test_default_compiled_model_passes_parity(eager_mlp, parity_rows):
+    x_num, x_cat = parity_rows
+    compiled = ml_model.build_compiled_model(eager_mlp, (x_num[:8], x_cat[:8]))
+
+    passed, max_abs_diff, agreement = ml_model.check_parity(eager_mlp, compiled, x_num, x_cat)
+
+    assert ml_model.LIFESTYLE_MLP_COMPILED == "torchscript"
+    assert passed, f"max_abs_diff={max_abs_diff}"
+    assert agreement == 1.0
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 33])
+def test_compiled_model_handles_other_batch_sizes(eager_mlp, parity_rows, batch_size):
+    # trace ด้วย batch 8 แต่ route ส่ง batch ขนาดใดก็ได้ (micro-batch, bulk chunk)
+    x_num, x_cat = parity_rows
+    compiled = ml_model.build_compiled_model(eager_mlp, (x_num[:8], x_cat[:8]))
+
+    with torch.no_grad():
+        expected = torch.softmax(eager_mlp(x_num[:batch_size], x_cat[:batch_size]), dim=1)
+        actual = torch.softmax(compiled(x_num[:batch_size], x_cat[:batch_size]), dim=1)
+
+    assert actual.shape == expected.shape
+    assert (actual - expected).abs().max().item() <= ml_model.LIFESTYLE_MLP_PARITY_TOL
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from model_manager import ModelManager
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def manager(tmp_path, calls):
+    present = tmp_path / "present.bin"
+    present.write_bytes(b"model")
+
+    def broken_warmup():
+        raise RuntimeError("bad weights")
+
+    manager = ModelManager()
+    manager.register("first", lambda: "first model", lambda: calls.append("first"), artifacts=[str(present)])
+    manager.register("missing", lambda: "never loaded", artifacts=[str(present), os.path.join(tmp_path, "gone.pkl")])
+    manager.register("broken", lambda: "broken model", broken_warmup, artifacts=[str(present)])
+    manager.register("last", lambda: "last model", lambda: calls.append("last"))
+    return manager
+
+
+def test_all_skips_missing_artifacts_and_becomes_ready(manager):
+    manager.warmup(["first", "missing", "last"], skip_missing=True)
+
+    status = manager.status()
+    assert manager.ready
+    assert status["models"]["missing"]["state"] == "skipped"
+    assert "gone.pkl" in status["models"]["missing"]["error"]
+    assert status["models"]["missing"]["ready"] is False
+    assert status["models"]["first"] == {"ready": True, "state": "ready", "error": None}
+    assert status["warmup_error"] is None
+    assert not manager.is_loaded("missing")
+
+
+def test_failure_does_not_stop_the_other_models(manager, calls):
+    manager.warmup_from_env("all")
+
+    status = manager.status()
+    # broken ล้มแต่ model ที่ register ไว้หลังจากนั้นยังถูก warmup
+    assert calls == ["first", "last"]
+    assert not manager.ready
+    assert status["models"]["broken"]["state"] == "failed"
+    assert status["models"]["broken"]["ready"] is False
+    assert "RuntimeError: bad weights" in status["warmup_error"]
+    assert status["models"]["last"]["ready"] is True
+    assert status["models"]["missing"]["state"] == "skipped"
+
+
+def test_explicitly_requested_missing_model_blocks_readiness(manager):
+    manager.warmup_from_env("first, missing")
+
+    status = manager.status()
+    assert not manager.ready
+    assert status["models"]["missing"]["state"] == "failed"
+    assert status["models"]["first"]["ready"] is True
+    assert status["models"]["last"] == {"ready": False, "state": "not_warmed", "error": None}
+
+
+def test_unknown_model_name_is_reported(manager):
+    manager.warmup_from_env("first,typo")
+
+    status = manager.status()
+    assert not manager.ready
+    assert status["models"]["typo"]["state"] == "failed"
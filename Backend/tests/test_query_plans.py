@@ -0,0 +1,173 @@
+import asyncio
+import os
+from contextlib import contextmanager
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import security
+import write_behind
+from all_activities_service import AllActivitiesService
+from catalog_cache import catalog_cache
+from completion_service import CompletionService
+from conftest import BACKEND_DIR, TEST_DB_DIR
+from dashboard_service import DashboardService
+from routes.activity import delete_lifestyles_by_user_id
+from routes.auth import login_for_access_token
+from model import (
+    Activity, ActivityInPlan, ActivityPlan, ActivityStyle, ActivityType, LifestyleCate, User, UserLifestyle
+)
+
+USERS = 300
+ACTIVITIES = 60
+LIFESTYLES = 5
+ACTIVITIES_PER_PLAN = 15
+# user ที่ใช้ทดสอบ login จึงต้องมี password hash จริง
+LOGIN_USER_ID = USERS // 2
+LOGIN_PASSWORD = "secret"
+
+
+def _upgrade_head(url: str) -> None:
+    # ไม่ส่ง alembic.ini ให้ Config เพื่อไม่ให้ env.py ตั้งค่า logging ของทั้ง process ใหม่
+    config = Config()
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    config.cmd_opts = type("CommandOptions", (), {"x": [f"url={url}"]})()
+    command.upgrade(config, "head")
+
+
+def _seed(engine) -> None:
+    with Session(engine) as db:
+        db.add_all(LifestyleCate(id=i, name=f"lifestyle {i}") for i in range(1, LIFESTYLES + 1))
+        db.add_all(
+            Activity(
+                id=i, name=f"activity {i}", base_time=10, base_xp=5 + i % 20,
+                activity_type=ActivityType.INDOOR if i % 2 else ActivityType.OUTDOOR
+            )
+            for i in range(1, ACTIVITIES + 1)
+        )
+        db.add_all(
+            ActivityStyle(lifestyle_id=1 + i % LIFESTYLES, activity_id=i)
+            for i in range(1, ACTIVITIES + 1)
+        )
+        login_hash = security.get_password_hash(LOGIN_PASSWORD)
+        for user_id in range(1, USERS + 1):
+            password = login_hash if user_id == LOGIN_USER_ID else "x"
+            db.add(User(id=user_id, username=f"user{user_id}", password=password, xp=user_id % 100, level=1 + user_id % 7))
+            db.add(UserLifestyle(user_id=user_id, lifestyle_id=1 + user_id % LIFESTYLES))
+            db.add(ActivityPlan(id=user_id, user_id=user_id))
+            db.add_all(
+                ActivityInPlan(
+                    plan_id=user_id,
+                    activity_id=1 + (user_id + k) % ACTIVITIES,
+                    success_count=0,
+                    is_chose=k % 3 != 0
+                )
+                for k in range(ACTIVITIES_PER_PLAN)
+            )
+        db.commit()
+        # ให้ planner ของ SQLite รู้ขนาดตารางจริงแบบเดียวกับ DB ที่ใช้งานอยู่
+        db.execute(text("ANALYZE"))
+        db.commit()
+
+
+@pytest.fixture(scope="module")
+def migrated_db():
+    """SQLite database built by `alembic upgrade head` and seeded with a few hundred users"""
+    path = os.path.join(TEST_DB_DIR, "migrated.db")
+    url = f"sqlite:///{path}"
+    _upgrade_head(url)
+    engine = create_engine(url)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    _seed(engine)
+    yield engine, async_engine
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+@contextmanager
+def _captured(engine, statements):
+    # เก็บ SQL ทุก statement ที่ service ส่งไปที่ DB พร้อม parameter ชุดแรก
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            parameters = parameters[0]
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _full_scans(engine, statements):
+    scans = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            for row in plan:
+                detail = row[-1]
+                # "SCAN <table>" ที่ไม่มี USING ... INDEX คืออ่านทั้งตาราง
+                if detail.startswith("SCAN ") and "USING" not in detail and detail != "SCAN CONSTANT ROW":
+                    scans.append((statement, detail))
+    return scans
+
+
+async def _async_lookups(async_engine, user_id: int, plan_id: int) -> None:
+    async with AsyncSession(async_engine, expire_on_commit=False) as db:
+        await DashboardService.fetch_dashboard_rows(db, user_id)
+        await DashboardService.get_user_activities(db, user_id)
+        await DashboardService.get_activity_plan(db, user_id)
+        await DashboardService.get_activities_in_plan(db, plan_id)
+        await DashboardService.get_activities_in_plan(db, plan_id, chosen_only=False, cursor=10, limit=5)
+        await AllActivitiesService.get_activity_option_rows(user_id, db)
+        await AllActivitiesService.get_activity_option_rows(user_id, db, cursor=10, limit=5)
+
+
+def _sync_lookups(db: Session, user_id: int, activity_id: int) -> None:
+    # login (login_time ไปทาง write-behind แล้ว flush เป็น UPDATE แบบ batch) และ token
+    form = OAuth2PasswordRequestForm(username=f"user{user_id}", password=LOGIN_PASSWORD)
+    login_for_access_token(form, db)
+    write_behind.login_time_buffer.flush()
+    security._load_principal(db, user_id, None)
+    security._load_principal(db, None, f"user{user_id}")
+    # completion: อ่าน/อัปเดต User, หา activity ใน plan แล้ว flush ledger (insert + success_count + plan version)
+    CompletionService.complete_activity(db, user_id, activity_id, require_plan=True)
+    write_behind.completion_ledger.flush()
+    # ตรวจ / ลบ lifestyle ของ user
+    delete_lifestyles_by_user_id(user_id, db)
+
+
+def test_hot_lookups_use_indexes(migrated_db, monkeypatch):
+    engine, async_engine = migrated_db
+    user_id = plan_id = LOGIN_USER_ID
+    activity_id = 1 + user_id % ACTIVITIES
+
+    # โหลด catalog (อ่านทั้งตารางโดยตั้งใจ) ก่อนเริ่มเก็บ statement
+    catalog_cache.invalidate()
+    with Session(engine) as db:
+        catalog_cache.get(db)
+
+    # write-behind flush เปิด session เองผ่าน write_behind.SessionLocal: ให้เขียนลง DB ที่ migrate ไว้
+    write_behind.login_time_buffer.flush()
+    write_behind.completion_ledger.flush()
+    monkeypatch.setattr(write_behind, "SessionLocal", sessionmaker(bind=engine))
+
+    statements = []
+    try:
+        with _captured(async_engine.sync_engine, statements):
+            asyncio.run(_async_lookups(async_engine, user_id, plan_id))
+        with _captured(engine, statements), Session(engine) as db:
+            _sync_lookups(db, user_id, activity_id)
+    finally:
+        catalog_cache.invalidate()
+
+    executed = " ".join(statement for statement, _ in statements)
+    for expected in ('UPDATE "User" SET login_time', 'INSERT INTO "Activity_completion"',
+                     'UPDATE "Activity_in_plan" SET success_count', 'DELETE FROM "User_lifestyle"'):
+        assert expected in executed
+    assert _full_scans(engine, statements) == []
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from rf_fast import FlatForest, matches_sklearn
+
+
+def _synthetic(seed: int, n_rows: int):
+    # หน้าตาเดียวกับ input ของ stress model: float 3 ตัว, int 2 ตัว (platform count, mood score)
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.uniform(0, 14, n_rows),
+        rng.integers(0, 10, n_rows),
+        rng.uniform(0, 6, n_rows),
+        rng.uniform(3, 10, n_rows),
+        rng.integers(1, 11, n_rows),
+    ]).astype(np.float64)
+    score = X[:, 0] * 0.4 + X[:, 2] * 0.6 - X[:, 3] * 0.5 - X[:, 4] * 0.3 + rng.normal(0, 0.8, n_rows)
+    y = np.digitize(score, np.quantile(score, [1 / 3, 2 / 3]))
+    return X, y
+
+
+@pytest.fixture(scope="module", params=[StandardScaler, MinMaxScaler])
+def fitted(request):
+    X, y = _synthetic(seed=0, n_rows=600)
+    scaler = request.param().fit(X)
+    forest = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(scaler.transform(X), y)
+    return forest, scaler, FlatForest(forest, scaler)
+
+
+def _threshold_rows(forest, n_features: int) -> np.ndarray:
+    # แถวที่ค่าหลัง scale เท่ากับ split threshold พอดี และติดกันทั้งสองฝั่งในความละเอียด float32
+    rows = []
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        for feature, threshold in zip(tree.feature, tree.threshold):
+            if feature < 0:
+                continue
+            for value in (
+                threshold,
+                np.nextafter(np.float32(threshold), np.float32(-np.inf)),
+                np.nextafter(np.float32(threshold), np.float32(np.inf)),
+            ):
+                row = np.zeros(n_features)
+                row[feature] = value
+                rows.append(row)
+    return np.array(rows, dtype=np.float64)
+
+
+def test_held_out_rows_match_sklearn(fitted):
+    forest, scaler, flat_forest = fitted
+    X, _ = _synthetic(seed=1, n_rows=500)
+
+    assert np.array_equal(flat_forest.predict(X), forest.predict(scaler.transform(X)))
+    assert np.array_equal(flat_forest.predict_proba(X), forest.predict_proba(scaler.transform(X)))
+    assert matches_sklearn(flat_forest, forest, scaler, X)
+
+
+def test_split_threshold_edges_match_sklearn(fitted):
+    forest, scaler, flat_forest = fitted
+    X_scaled = _threshold_rows(forest, scaler.n_features_in_)
+
+    assert np.array_equal(flat_forest.predict_proba_scaled(X_scaled), forest.predict_proba(X_scaled))
+    # ผ่าน scaler ด้วย: ค่าดิบที่ถอยกลับจาก threshold และค่าจำนวนเต็มที่อยู่ตรงกลางระหว่าง split
+    raw = np.concatenate([scaler.inverse_transform(X_scaled), np.round(scaler.inverse_transform(X_scaled))])
+    assert np.array_equal(flat_forest.predict(raw), forest.predict(scaler.transform(raw)))
+
+
+@pytest.mark.parametrize("bad", [np.nan, np.inf, -np.inf, 1e300])
+def test_non_finite_input_is_rejected(fitted, bad):
+    _, _, flat_forest = fitted
+    row = [2.5, 3, 1.0, 7.0, bad]
+
+    with pytest.raises(ValueError):
+        flat_forest.predict([row])
+    with pytest.raises(ValueError):
+        flat_forest.predict_proba([[1.0, 2, 0.5, 8.0, 5], row])
@@ -0,0 +1,94 @@
+import threading
+
+import numpy as np
+import pytest
+from pytorch_tabnet.tab_model import TabNetClassifier
+
+import ml_model
+
+
+@pytest.fixture(scope="module")
+def tabnet():
+    model = TabNetClassifier()
+    model.load_model(ml_model.LIFESTYLE_TABNET_PATH)
+    model.network.eval()
+    return model
+
+
+@pytest.fixture(scope="module")
+def x_input():
+    # feature แบบแบบประเมินจริงต่อด้วย validation set แบบสุ่มที่ verify_tabnet_fast_path ใช้
+    rows = [ml_model._parity_rows(), ml_model._validation_set()]
+    return np.concatenate([
+        np.concatenate([x_num.numpy(), x_cat.numpy()], axis=1) for x_num, x_cat in rows
+    ])
+
+
+def _assert_same(tabnet, x_batch, fast):
+    probs = tabnet.predict_proba(x_batch)
+    legacy = ml_model._tabnet_probs_legacy(tabnet, x_batch)
+
+    # softmax ของ network ใน fast path คือค่าที่ predict_proba คืนมา: sigmoid / softmax รอบสองต้องตรงกัน
+    np.testing.assert_allclose(fast[1], 1 / (1 + np.exp(-probs)), rtol=0, atol=ml_model.TABNET_FAST_PATH_TOL)
+    for expected, actual in zip(legacy, fast):
+        assert actual.shape == expected.shape
+        np.testing.assert_allclose(actual, expected, rtol=0, atol=ml_model.TABNET_FAST_PATH_TOL)
+
+    expected_rows = ml_model._build_results(*legacy, threshold=0.6)
+    actual_rows = ml_model._build_results(*fast, threshold=0.6)
+    assert [row["pred_class_idx"] for row in actual_rows] == [row["pred_class_idx"] for row in expected_rows]
+    assert [row["pred_multilabel_idx"] for row in actual_rows] == [row["pred_multilabel_idx"] for row in expected_rows]
+
+
+def test_fast_path_matches_predict_proba(tabnet, x_input):
+    _assert_same(tabnet, x_input, ml_model._tabnet_probs_fast(tabnet, x_input))
+
+    passed, max_abs_diff = ml_model.verify_tabnet_fast_path(tabnet)
+    assert passed, f"max_abs_diff={max_abs_diff}"
+
+
+def test_reused_buffer_with_different_batch_sizes(tabnet, x_input):
+    # ลำดับขนาด batch: ใหญ่ → เล็ก (ใช้ buffer เดิมบางส่วน) → ใหญ่กว่าเดิม (ขยาย buffer) → เล็กอีกครั้ง
+    sizes = [40, 3, 1, 17, 40, 257, 5, 1]
+    offset = 0
+    results = []
+    for size in sizes:
+        x_batch = x_input[offset:offset + size]
+        offset = (offset + size) % (len(x_input) - max(sizes))
+        buffer_before = getattr(ml_model._input_buffers, "tabnet", None)
+
+        fast = ml_model._tabnet_probs_fast(tabnet, x_batch)
+        _assert_same(tabnet, x_batch, fast)
+        results.append((x_batch, [array.copy() for array in fast], fast))
+
+        buffer_after = ml_model._input_buffers.tabnet
+        if buffer_before is not None and buffer_before.shape[0] >= size:
+            assert buffer_after.data_ptr() == buffer_before.data_ptr()
+        assert buffer_after.shape[0] >= size
+
+    # ผลของ batch ก่อนหน้าต้องไม่ถูกเขียนทับเมื่อ buffer ถูกใช้ซ้ำ
+    for _, saved, returned in results:
+        for expected, actual in zip(saved, returned):
+            np.testing.assert_array_equal(actual, expected)
+
+
+def test_each_thread_gets_its_own_buffer(tabnet, x_input):
+    ml_model._tabnet_probs_fast(tabnet, x_input[:64])
+    main_buffer = ml_model._input_buffers.tabnet
+    seen = {}
+
+    def score():
+        try:
+            fast = ml_model._tabnet_probs_fast(tabnet, x_input[:7])
+            _assert_same(tabnet, x_input[:7], fast)
+            seen["buffer"] = ml_model._input_buffers.tabnet
+        except BaseException as e:
+            seen["error"] = e
+
+    thread = threading.Thread(target=score)
+    thread.start()
+    thread.join()
+
+    assert "error" not in seen, seen.get("error")
+    assert seen["buffer"].data_ptr() != main_buffer.data_ptr()
+    assert ml_model._input_buffers.tabnet is main_buffer
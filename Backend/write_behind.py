@@ -0,0 +1,413 @@
+import asyncio
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import bindparam, case, func, insert, or_, update
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+from database import SessionLocal, in_event_loop
+from model import User, ActivityPlan, ActivityInPlan, ActivityCompletion
+
+logger = logging.getLogger(__name__)
+
+# ข้อมูลที่ยังไม่ถูกเขียนลง DB หายได้ไม่เกิน LOGIN_FLUSH_SECONDS (ถ้า process ตายแบบไม่ได้ shutdown ปกติ)
+LOGIN_FLUSH_SECONDS = float(os.getenv("LOGIN_FLUSH_SECONDS", "5"))
+LOGIN_FLUSH_MAX_PENDING = int(os.getenv("LOGIN_FLUSH_MAX_PENDING", "5000"))
+LOGIN_FLUSH_CHUNK_SIZE = 500
+
+# completion ที่ยังไม่ถูก insert ลง ledger (และยังไม่ถูกนับใน success_count) หายได้ไม่เกิน COMPLETION_FLUSH_SECONDS
+COMPLETION_FLUSH_SECONDS = float(os.getenv("COMPLETION_FLUSH_SECONDS", "1"))
+COMPLETION_FLUSH_MAX_PENDING = int(os.getenv("COMPLETION_FLUSH_MAX_PENDING", "2000"))
+
+# ระหว่างที่ DB ล่ม เก็บค่าที่ยังไม่ได้เขียนไว้ได้ไม่เกิน max_pending * factor นี้ ที่เกินจะถูก dead-letter
+WRITE_BEHIND_RETAIN_FACTOR = int(os.getenv("WRITE_BEHIND_RETAIN_FACTOR", "10"))
+WRITE_BEHIND_MAX_BACKOFF_SECONDS = float(os.getenv("WRITE_BEHIND_MAX_BACKOFF_SECONDS", "60"))
+
+# error ชั่วคราวของ DB (ต่อไม่ได้, lock timeout, pool เต็ม): เก็บทั้ง batch ไว้ลองใหม่
+# error อื่น (เช่น IntegrityError) เกิดจากข้อมูลบางแถว ลองซ้ำก็ไม่หาย
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError)
+
+
+class WriteBehindBuffer:
+    """
+    Coalesce non-critical writes in memory and flush them in batches
+
+    record() keeps only the latest value per key. flush() hands everything
+    pending to flush_fn in one call. A flush is triggered by the periodic
+    task, by shutdown, or once max_pending keys are waiting: on the event
+    loop (including sync code under run_sync) that only wakes the periodic
+    task, elsewhere the caller flushes inline.
+
+    If flush_fn fails with a transient database error the values are put
+    back (unless a newer value was recorded meanwhile) and retried with
+    exponential backoff. Any other error is blamed on the data: the batch is
+    split in halves until the failing entries are isolated, the rest is
+    written and the failing entries are dead-lettered (logged at ERROR and
+    dropped). At most max_retained entries are kept while the database is
+    unavailable; older ones beyond that are dead-lettered too.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_fn: Callable[[Dict[Hashable, Any]], Any],
+        flush_interval: float,
+        max_pending: int,
+        max_retained: Optional[int] = None
+    ):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.flush_interval = flush_interval
+        self.max_pending = max(1, max_pending)
+        self.max_retained = max(self.max_pending, max_retained or self.max_pending * WRITE_BEHIND_RETAIN_FACTOR)
+        self._pending: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        # flush ทีละครั้ง เพื่อไม่ให้ batch เก่าเขียนทับ batch ใหม่
+        self._flush_lock = threading.Lock()
+        self._recorded = 0
+        self._flushed = 0
+        self._flushes = 0
+        self._failures = 0
+        self._consecutive_failures = 0
+        self._dead_lettered = 0
+        # ตั้งโดย run_periodic: ใช้ปลุก flusher เมื่อ buffer เต็ม
+        self._wake: Optional[asyncio.Event] = None
+        self._wake_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def record(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._pending[key] = value
+            self._recorded += 1
+            full = len(self._pending) >= self.max_pending
+            dropped = self._trim()
+        self._dead_letter(dropped, "buffer over max_retained")
+        if full:
+            self._flush_soon()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Pending value for key, or default if nothing is waiting to be written"""
+        with self._lock:
+            return self._pending.get(key, default)
+
+    def discard(self, key: Hashable) -> None:
+        """Forget a pending value, e.g. after it was written synchronously"""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def flush(self) -> int:
+        """
+        Write everything pending now
+
+        Returns:
+            Number of entries written
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._take()
+            if not batch:
+                return 0
+            written, retry, dead = self._write(batch)
+            with self._lock:
+                if written:
+                    self._flushes += 1
+                    self._flushed += written
+                if retry:
+                    self._failures += 1
+                    self._consecutive_failures += 1
+                    self._restore(retry)
+                else:
+                    self._consecutive_failures = 0
+                dropped = self._trim()
+            if retry:
+                logger.warning("Flushing %s failed, %d entries kept for retry", self.name, self._size(retry))
+            self._dead_letter(dead, "rejected by the database")
+            self._dead_letter(dropped, "buffer over max_retained")
+            return written
+
+    def _write(self, batch) -> Tuple[int, Any, List[Any]]:
+        """
+        Write a batch, isolating entries that cannot be written
+
+        Returns:
+            (entries written, part to retry or None, dead-lettered entries)
+        """
+        try:
+            self.flush_fn(batch)
+            return self._size(batch), None, []
+        except TRANSIENT_ERRORS:
+            logger.exception("Flushing %s hit a transient database error", self.name)
+            return 0, batch, []
+        except Exception:
+            if self._size(batch) == 1:
+                logger.exception("Flushing %s failed for a single entry", self.name)
+                return 0, None, self._entries(batch)
+        # แบ่งครึ่งไปเรื่อยๆ จนเหลือเฉพาะ entry ที่เขียนไม่ได้
+        written, retries, dead = 0, [], []
+        for part in self._halves(batch):
+            part_written, part_retry, part_dead = self._write(part)
+            written += part_written
+            dead += part_dead
+            if part_retry:
+                retries.append(part_retry)
+        return written, self._join(retries) if retries else None, dead
+
+    def _flush_soon(self) -> None:
+        # flush ใน event loop thread ไม่ได้ (I/O ของ DB จะบล็อกทุก request) จึงปลุก periodic flusher แทน
+        if in_event_loop():
+            loop = self._wake_loop
+            if self._wake is not None and loop is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(self._wake.set)
+            elif not self._flush_lock.locked():
+                threading.Thread(target=self.flush, name=f"{self.name}-flush", daemon=True).start()
+            return
+        # ระหว่าง backoff ไม่ให้ request ต้องรอ flush ที่น่าจะ fail ซ้ำ (_trim จำกัดขนาดไว้แล้ว)
+        if self._consecutive_failures == 0:
+            self.flush()
+
+    def _dead_letter(self, entries: List[Any], reason: str) -> None:
+        if not entries:
+            return
+        with self._lock:
+            self._dead_lettered += len(entries)
+        # log ค่าทั้งหมดไว้ให้ replay เองได้
+        logger.error("Dropping %d %s entries (%s): %r", len(entries), self.name, reason, entries)
+
+    def _trim(self) -> List[Any]:
+        # เรียกขณะถือ _lock: ตัดค่าที่เก่าที่สุดออกเมื่อเกิน max_retained
+        overflow = len(self._pending) - self.max_retained
+        if overflow <= 0:
+            return []
+        keys = list(self._pending)[:overflow]
+        return [(key, self._pending.pop(key)) for key in keys]
+
+    def _take(self):
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def _restore(self, batch) -> None:
+        for key, value in batch.items():
+            self._pending.setdefault(key, value)
+
+    @staticmethod
+    def _size(batch) -> int:
+        return len(batch)
+
+    @staticmethod
+    def _entries(batch) -> List[Any]:
+        return list(batch.items())
+
+    @staticmethod
+    def _halves(batch) -> List[Any]:
+        items = list(batch.items())
+        middle = len(items) // 2
+        return [dict(items[:middle]), dict(items[middle:])]
+
+    @staticmethod
+    def _join(parts: List[Any]) -> Any:
+        joined = {}
+        for part in parts:
+            joined.update(part)
+        return joined
+
+    async def run_periodic(self) -> None:
+        """
+        Flush every flush_interval seconds until cancelled (run as a lifespan task)
+
+        A full buffer wakes the task early. After failed flushes the interval
+        doubles per failure, up to WRITE_BEHIND_MAX_BACKOFF_SECONDS.
+        """
+        self._wake, self._wake_loop = asyncio.Event(), asyncio.get_running_loop()
+        try:
+            while True:
+                failures = self._consecutive_failures
+                if failures:
+                    await asyncio.sleep(min(self.flush_interval * 2 ** min(failures, 10), WRITE_BEHIND_MAX_BACKOFF_SECONDS))
+                else:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                self._wake.clear()
+                await asyncio.to_thread(self.flush)
+        finally:
+            self._wake = self._wake_loop = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "max_pending": self.max_pending,
+                "flush_interval_seconds": self.flush_interval,
+                "recorded": self._recorded,
+                "flushed": self._flushed,
+                "flushes": self._flushes,
+                "failures": self._failures,
+                "consecutive_failures": self._consecutive_failures,
+                "max_retained": self.max_retained,
+                "dead_lettered": self._dead_lettered
+            }
+
+
+class AppendBuffer(WriteBehindBuffer):
+    """
+    WriteBehindBuffer for events that must all be written (no coalescing)
+
+    append() queues one event; flush_fn gets the events in arrival order.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_fn: Callable[[List[Any]], Any],
+        flush_interval: float,
+        max_pending: int,
+        max_retained: Optional[int] = None
+    ):
+        super().__init__(name, flush_fn, flush_interval, max_pending, max_retained)
+        self._pending: List[Any] = []
+
+    def append(self, event: Any) -> None:
+        with self._lock:
+            self._pending.append(event)
+            self._recorded += 1
+            full = len(self._pending) >= self.max_pending
+            dropped = self._trim()
+        self._dead_letter(dropped, "buffer over max_retained")
+        if full:
+            self._flush_soon()
+
+    def record(self, key: Hashable, value: Any) -> None:
+        raise TypeError("AppendBuffer does not coalesce by key, use append()")
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        raise TypeError("AppendBuffer does not coalesce by key")
+
+    def discard(self, key: Hashable) -> None:
+        raise TypeError("AppendBuffer does not coalesce by key")
+
+    def _take(self):
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _restore(self, batch) -> None:
+        # event ที่ flush ไม่สำเร็จเกิดก่อน event ที่มาใหม่ จึงใส่กลับไว้ข้างหน้า
+        self._pending[:0] = batch
+
+    def _trim(self) -> List[Any]:
+        overflow = len(self._pending) - self.max_retained
+        if overflow <= 0:
+            return []
+        dropped = self._pending[:overflow]
+        del self._pending[:overflow]
+        return dropped
+
+    @staticmethod
+    def _entries(batch) -> List[Any]:
+        return list(batch)
+
+    @staticmethod
+    def _halves(batch) -> List[Any]:
+        middle = len(batch) // 2
+        return [batch[:middle], batch[middle:]]
+
+    @staticmethod
+    def _join(parts: List[Any]) -> Any:
+        return [event for part in parts for event in part]
+
+
+def _write_login_times(login_times: Dict[int, Any]) -> None:
+    # UPDATE User SET login_time = CASE id WHEN ... END WHERE id IN (...) ทีละ chunk
+    user_ids = sorted(login_times)
+    db = SessionLocal()
+    try:
+        for start in range(0, len(user_ids), LOGIN_FLUSH_CHUNK_SIZE):
+            chunk = user_ids[start:start + LOGIN_FLUSH_CHUNK_SIZE]
+            new_login_time = case({user_id: login_times[user_id] for user_id in chunk}, value=User.id)
+            db.execute(
+                update(User)
+                # ไม่เขียนทับค่าที่ใหม่กว่า (เช่น login ที่ commit ไปแล้วระหว่างรอ flush)
+                .where(User.id.in_(chunk), or_(User.login_time.is_(None), User.login_time < new_login_time))
+                .values(login_time=new_login_time)
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# user_id -> เวลา login ล่าสุด (naive, เวลาไทย แบบเดียวกับที่เก็บใน DB)
+login_time_buffer = WriteBehindBuffer(
+    "login_time",
+    _write_login_times,
+    flush_interval=LOGIN_FLUSH_SECONDS,
+    max_pending=LOGIN_FLUSH_MAX_PENDING
+)
+
+
+class CompletionEvent(NamedTuple):
+    user_id: int
+    activity_id: int
+    plan_id: Optional[int]
+    xp_awarded: int
+    completed_at: Any
+
+
+def _write_completions(events: List[CompletionEvent]) -> None:
+    """
+    Insert a batch of completion events and fold them into the aggregates
+
+    One transaction: a multi-row INSERT into Activity_completion, one
+    executemany UPDATE adding each (plan, activity)'s count to
+    Activity_in_plan.success_count, and one version bump for the touched plans.
+    """
+    success_counts = Counter((event.plan_id, event.activity_id) for event in events if event.plan_id is not None)
+    db = SessionLocal()
+    try:
+        db.execute(insert(ActivityCompletion), [event._asdict() for event in events])
+        if success_counts:
+            table = ActivityInPlan.__table__
+            db.execute(
+                update(table)
+                .where(table.c.plan_id == bindparam("p_plan_id"), table.c.activity_id == bindparam("p_activity_id"))
+                .values(success_count=func.coalesce(table.c.success_count, 0) + bindparam("p_count")),
+                [
+                    {"p_plan_id": plan_id, "p_activity_id": activity_id, "p_count": count}
+                    for (plan_id, activity_id), count in success_counts.items()
+                ]
+            )
+            plan_ids = sorted({plan_id for plan_id, _ in success_counts})
+            db.execute(
+                update(ActivityPlan)
+                .where(ActivityPlan.id.in_(plan_ids))
+                .values(version=ActivityPlan.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# ledger ของ completion: insert เป็น batch และนับ success_count ตอน flush
+completion_ledger = AppendBuffer(
+    "completion",
+    _write_completions,
+    flush_interval=COMPLETION_FLUSH_SECONDS,
+    max_pending=COMPLETION_FLUSH_MAX_PENDING
+)
+
+# buffer ทั้งหมดที่ lifespan ต้อง flush เป็นระยะและตอน shutdown
+write_behind_buffers = (login_time_buffer, completion_ledger)
+
+
+def current_login_time(user_id: int, stored: Optional[Any]) -> Optional[Any]:
+    """login_time as it will be once pending writes are flushed"""
+    return login_time_buffer.get(user_id, stored)